@@ -0,0 +1,155 @@
+# bench/fixtures.py
+
+import io
+import os
+import gzip
+import json
+import lzma
+import random
+import hashlib
+import tarfile
+import zipfile
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+from core.manifest import PACKAGE_MANIFEST_NAME, PROTECTED_FOLDER, normalize_path
+
+# Tamaño de los archivos de la carpeta 'Data' sintética
+DATA_FILE_SIZE = 64 * 1024 * 1024
+
+
+def _content(rng: random.Random, size: int) -> bytes:
+    """
+    Contenido parecido a un binario real: mitad bytes aleatorios (incompresibles)
+    y mitad bloques repetidos (muy compresibles).
+    """
+    random_part = rng.randbytes(size // 2)
+    pattern = rng.randbytes(256)
+    repeated = (pattern * (size // 512 + 1))[:size - len(random_part)]
+    return random_part + repeated
+
+
+def make_tree(folder: str, files: int, total_bytes: int, data_bytes: int = 0, seed: int = 1) -> Dict:
+    """
+    Genera un árbol de despliegue sintético del ERP:
+    - 'files' archivos de la aplicación repartidos en subcarpetas, con tamaños
+      desiguales (unos pocos grandes y muchos pequeños) que suman 'total_bytes'.
+    - Una carpeta 'Data' con 'data_bytes' de base de datos que ninguna fase debe copiar.
+    Retorna un resumen con el número de archivos y bytes generados.
+    """
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.2) for _ in range(files)]
+    scale = total_bytes / sum(weights) if weights else 0
+
+    written = 0
+    for index, weight in enumerate(weights):
+        size = max(1, int(weight * scale))
+        path = os.path.join(folder, f"modulo{index % 16:02d}", f"archivo{index:05d}.bin")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_content(rng, size))
+        written += size
+
+    data_folder = os.path.join(folder, PROTECTED_FOLDER)
+    os.makedirs(data_folder, exist_ok=True)
+    remaining, index = data_bytes, 0
+    while remaining > 0:
+        size = min(DATA_FILE_SIZE, remaining)
+        with open(os.path.join(data_folder, f"base{index:03d}.mdb"), 'wb') as f:
+            f.write(_content(rng, size))
+        remaining -= size
+        index += 1
+
+    return {"files": files, "bytes": written, "data_bytes": data_bytes}
+
+
+def mutate_tree(folder: str, ratio: float, seed: int = 2) -> int:
+    """
+    Modifica una fracción 'ratio' de los archivos de la aplicación (fuera de 'Data'),
+    simulando una nueva versión. Retorna el número de archivos modificados.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if d != PROTECTED_FOLDER]
+        paths.extend(os.path.join(root, name) for name in files)
+    paths.sort()
+
+    changed = rng.sample(paths, int(len(paths) * ratio)) if paths else []
+    for path in changed:
+        size = os.path.getsize(path)
+        with open(path, 'wb') as f:
+            f.write(_content(rng, size))
+    return len(changed)
+
+
+def _package_members(folder: str, version: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Miembros del paquete (ruta, contenido) sin la carpeta 'Data', seguidos de su 'manifest.json'.
+    """
+    files = {}
+    for root, dirs, names in os.walk(folder):
+        if os.path.normpath(root) == os.path.normpath(folder):
+            dirs[:] = [d for d in dirs if d != PROTECTED_FOLDER]
+        dirs.sort()
+        for name in sorted(names):
+            source = os.path.join(root, name)
+            path = normalize_path(os.path.relpath(source, folder))
+            with open(source, 'rb') as f:
+                content = f.read()
+            files[path] = {"size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+            yield path, content
+    yield PACKAGE_MANIFEST_NAME, json.dumps({"version": version, "files": files}).encode('utf-8')
+
+
+def _write_tar(target: BinaryIO, members: Iterator[Tuple[str, bytes]]) -> None:
+    with tarfile.open(fileobj=target, mode="w|", format=tarfile.PAX_FORMAT) as tar_ref:
+        for path, content in members:
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            info.mode = 0o644
+            tar_ref.addfile(info, io.BytesIO(content))
+
+
+def make_package(folder: str, package_path: str, version: str,
+                 compression: int = zipfile.ZIP_DEFLATED, package_format: str = "zip",
+                 level: Optional[int] = None) -> Dict:
+    """
+    Empaqueta un árbol como paquete de actualización, con su 'manifest.json':
+    - package_format: "zip" (con 'compression'), "tar.zst" (zstd multihilo), "tar.xz" o "tar.gz".
+    - level: nivel de compresión (por defecto 19 en zstd, 6 en xz y gzip).
+    La carpeta 'Data' nunca se incluye. Retorna el tamaño del paquete y su SHA-256.
+    """
+    members = _package_members(folder, version)
+    if package_format == "zip":
+        with zipfile.ZipFile(package_path, 'w', compression) as zip_ref:
+            for path, content in members:
+                zip_ref.writestr(path, content)
+    elif package_format == "tar.zst":
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=19 if level is None else level, threads=-1)
+        with open(package_path, 'wb') as raw, compressor.stream_writer(raw, closefd=False) as writer:
+            _write_tar(writer, members)
+    elif package_format == "tar.xz":
+        with lzma.open(package_path, 'wb', preset=6 if level is None else level) as writer:
+            _write_tar(writer, members)
+    elif package_format == "tar.gz":
+        with gzip.open(package_path, 'wb', compresslevel=6 if level is None else level) as writer:
+            _write_tar(writer, members)
+    else:
+        raise ValueError(f"Formato de paquete desconocido: {package_format}")
+
+    sha256 = hashlib.sha256()
+    with open(package_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return {"bytes": os.path.getsize(package_path), "sha256": sha256.hexdigest()}
+
+
+if __name__ == "__main__":
+    # Prueba manual: generar un árbol pequeño y su paquete
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as workdir:
+        tree = os.path.join(workdir, "ERP")
+        print(make_tree(tree, files=50, total_bytes=5 * 1024 * 1024, data_bytes=1024 * 1024))
+        print(make_package(tree, os.path.join(workdir, "erp_1.0.zip"), "1.0"))
@@ -0,0 +1,137 @@
+# bench/formats.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from typing import Dict, List
+
+from bench.fixtures import make_tree, make_package
+from core.installer import Installer
+from lib.archive import detect_file_format, iter_package_stream
+
+FORMATS = ("zip", "tar.gz", "tar.xz", "tar.zst")
+
+
+def _extensions(package_format: str) -> str:
+    return ".zip" if package_format == "zip" else "." + package_format
+
+
+def _decompress(package_path: str) -> int:
+    """
+    Recorre el paquete como flujo descomprimiendo todos los miembros, sin escribir a disco.
+    """
+    total = 0
+    with open(package_path, 'rb') as f:
+        for entry in iter_package_stream(f):
+            for chunk in entry.chunks():
+                total += len(chunk)
+    return total
+
+
+def _median_rate(samples: List[float], size: int) -> Dict:
+    median = statistics.median(samples)
+    return {"median_s": round(median, 6), "min_s": round(min(samples), 6),
+            "throughput_mb_s": round(size / median / (1024 * 1024), 3)}
+
+
+def measure_format(root: str, tree: str, tree_bytes: int, package_format: str, args: argparse.Namespace) -> Dict:
+    """
+    Empaqueta el árbol en un formato y mide tamaño, descompresión en flujo e instalación
+    completa sobre una carpeta vacía (throughput sobre los bytes descomprimidos).
+    """
+    package_path = os.path.join(root, "erp_1.0" + _extensions(package_format))
+    level = {"tar.zst": args.zstd_level, "tar.xz": args.xz_preset}.get(package_format)
+    started = time.perf_counter()
+    package = make_package(tree, package_path, "1.0", package_format=package_format, level=level)
+    compress_seconds = time.perf_counter() - started
+
+    if detect_file_format(package_path) != package_format:
+        raise RuntimeError(f"Formato detectado incorrecto para {package_path}")
+
+    decompress, install = [], []
+    for attempt in range(args.warmup + args.repeat):
+        started = time.perf_counter()
+        _decompress(package_path)
+        elapsed = time.perf_counter() - started
+        if attempt >= args.warmup:
+            decompress.append(elapsed)
+
+        target = os.path.join(root, f"install-{package_format}-{attempt}")
+        installer = Installer(os.path.join(target, "ERP"), os.path.join(target, "version.txt"), args.workers)
+        started = time.perf_counter()
+        if not installer.install_update(package_path, "1.0"):
+            raise RuntimeError(f"Instalación fallida con el paquete {package_format}")
+        elapsed = time.perf_counter() - started
+        if attempt >= args.warmup:
+            install.append(elapsed)
+        shutil.rmtree(target)
+
+    os.remove(package_path)
+    return {
+        "package_bytes": package["bytes"],
+        "ratio": round(tree_bytes / package["bytes"], 3),
+        "compress_s": round(compress_seconds, 3),
+        "decompress": _median_rate(decompress, tree_bytes),
+        "install": _median_rate(install, tree_bytes),
+    }
+
+
+def main(argv=None) -> int:
+    """
+    Compara los formatos de paquete (tamaño, descompresión e instalación) y escribe el resultado en JSON.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de paquete")
+    parser.add_argument("--files", type=int, default=500, help="Archivos de la aplicación")
+    parser.add_argument("--size-mb", type=float, default=200, help="Tamaño total de la aplicación (MiB)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["zip", "tar.xz", "tar.zst"],
+                        help="Formatos a comparar")
+    parser.add_argument("--zstd-level", type=int, default=19, help="Nivel de compresión zstd")
+    parser.add_argument("--xz-preset", type=int, default=6, help="Nivel de compresión xz")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones medidas por formato")
+    parser.add_argument("--warmup", type=int, default=1, help="Repeticiones de calentamiento descartadas")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos de extracción (ZIP)")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="erp_bench_formats_")
+    try:
+        tree = os.path.join(root, "source")
+        print(f"[Bench] Generando datos sintéticos en: {root}", file=sys.stderr)
+        summary = make_tree(tree, args.files, int(args.size_mb * 1024 * 1024))
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "params": {"files": args.files, "bytes": summary["bytes"], "repeat": args.repeat,
+                           "warmup": args.warmup, "workers": args.workers, "zstd_level": args.zstd_level,
+                           "xz_preset": args.xz_preset},
+            },
+            "formats": {},
+        }
+        for package_format in args.formats:
+            print(f"[Bench] Midiendo formato: {package_format}", file=sys.stderr)
+            results["formats"][package_format] = measure_format(root, tree, summary["bytes"], package_format, args)
+
+        output = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+        return 0
+
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
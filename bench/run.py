@@ -0,0 +1,325 @@
+# bench/run.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from typing import Callable, Dict, List, Optional
+
+from bench.server import BenchServer
+from bench.fixtures import make_tree, mutate_tree, make_package
+from core.updater import Updater
+from core.downloader import Downloader
+from core.installer import Installer
+from core.manifest import PROTECTED_FOLDER
+from lib.ratelimit import configure_rate_limiter
+from lib.utils import calculate_sha256
+
+OLD_VERSION = "1.0"
+NEW_VERSION = "2.0"
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class Workspace:
+    """
+    Entorno de benchmark: árbol desplegado con la versión antigua (con su carpeta 'Data'),
+    paquete de la versión nueva publicado por un servidor HTTP local y carpetas de trabajo.
+    """
+
+    def __init__(self, root: str, files: int, total_bytes: int, data_bytes: int, changed: float):
+        self.root = root
+        self.public = os.path.join(root, "public")
+        self.base = os.path.join(root, "base", "ERP")
+        self.version_file = os.path.join(root, "base", "version.txt")
+        self.package_path = os.path.join(self.public, f"erp_{NEW_VERSION}.zip")
+        self.params = {"files": files, "total_bytes": total_bytes, "data_bytes": data_bytes, "changed": changed}
+        self.package: Dict = {}
+        self.server: Optional[BenchServer] = None
+        self._runs = 0
+
+    def prepare(self) -> None:
+        """
+        Genera los árboles y paquetes sintéticos y arranca el servidor local.
+        """
+        source = os.path.join(self.root, "source")
+        os.makedirs(self.public, exist_ok=True)
+        tree = make_tree(source, self.params["files"], self.params["total_bytes"], self.params["data_bytes"])
+
+        # Instalación base con su manifiesto instalado, como tras una actualización real
+        old_package = os.path.join(self.root, f"erp_{OLD_VERSION}.zip")
+        make_package(source, old_package, OLD_VERSION)
+        if not Installer(self.base, self.version_file, swap=False).install_update(old_package, OLD_VERSION):
+            raise RuntimeError("No se pudo preparar la instalación base.")
+        shutil.move(os.path.join(source, PROTECTED_FOLDER), os.path.join(self.base, PROTECTED_FOLDER))
+        os.remove(old_package)
+
+        tree["changed_files"] = mutate_tree(source, self.params["changed"])
+        self.package = make_package(source, self.package_path, NEW_VERSION)
+        self.package["tree"] = tree
+        shutil.rmtree(source)
+
+        with open(self.package_path + ".sha256", 'w', encoding='utf-8') as f:
+            f.write(f"{self.package['sha256']}  {os.path.basename(self.package_path)}\n")
+        with open(os.path.join(self.public, "version.txt"), 'w', encoding='utf-8') as f:
+            f.write(NEW_VERSION)
+
+        self.server = BenchServer(self.public).start()
+
+    def scratch(self, name: str) -> str:
+        """
+        Carpeta de trabajo nueva (y vacía) para una repetición.
+        """
+        self._runs += 1
+        path = os.path.join(self.root, "runs", f"{name}-{self._runs}")
+        os.makedirs(path)
+        return path
+
+    def deploy_copy(self) -> Dict[str, str]:
+        """
+        Copia de la instalación base (con enlaces duros para que la preparación sea rápida;
+        las fases nunca modifican un archivo en su sitio).
+        """
+        folder = self.scratch("deploy")
+        deploy = os.path.join(folder, "ERP")
+        shutil.copytree(self.base, deploy, copy_function=_link_or_copy)
+        version_file = os.path.join(folder, "version.txt")
+        shutil.copy2(self.version_file, version_file)
+        return {"deploy": deploy, "version_file": version_file}
+
+    def cleanup(self) -> None:
+        if self.server:
+            self.server.stop()
+        shutil.rmtree(os.path.join(self.root, "runs"), ignore_errors=True)
+
+
+# Cada fase recibe el entorno y una carpeta de preparación, y retorna una función
+# que ejecuta la operación medida y devuelve los bytes procesados.
+Phase = Callable[[Workspace, argparse.Namespace], Callable[[], int]]
+
+
+def phase_version_check(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+    def run() -> int:
+        updater = Updater(f"{ws.server.url}/version.txt", ws.version_file)
+        if updater.get_remote_version() != NEW_VERSION:
+            raise RuntimeError("Versión remota inesperada.")
+        return 0
+    return run
+
+
+def phase_version_check_304(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+    cache_file = os.path.join(ws.scratch("http_cache"), "http_cache.json")
+    Updater(f"{ws.server.url}/version.txt", ws.version_file, http_cache_file=cache_file).get_remote_version()
+
+    def run() -> int:
+        updater = Updater(f"{ws.server.url}/version.txt", ws.version_file, http_cache_file=cache_file)
+        if updater.get_remote_version() != NEW_VERSION:
+            raise RuntimeError("Versión remota inesperada.")
+        return 0
+    return run
+
+
+def phase_download(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+    downloader = Downloader(f"{ws.server.url}/erp_{{}}.zip", ws.scratch("download"),
+                            connections=args.connections,
+                            checksum_url_template=f"{ws.server.url}/erp_{{}}.zip.sha256",
+                            require_checksum=True,
+                            rate_limiter=configure_rate_limiter(args.rate_limit) if args.rate_limit else None)
+
+    def run() -> int:
+        if not downloader.download_package(NEW_VERSION):
+            raise RuntimeError("Descarga fallida.")
+        return ws.package["bytes"]
+    return run
+
+
+def phase_backup(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+    installer = Installer(ws.base, ws.version_file)
+    backup_folder = os.path.join(ws.scratch("backup"), "store")
+
+    def run() -> int:
+        if not installer.backup_current_version(backup_folder):
+            raise RuntimeError("Respaldo fallido.")
+        return ws.package["tree"]["bytes"]
+    return run
+
+
+def phase_backup_incremental(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+    installer = Installer(ws.base, ws.version_file)
+    backup_folder = os.path.join(ws.scratch("backup"), "store")
+    installer.backup_current_version(backup_folder)
+
+    def run() -> int:
+        if not installer.backup_current_version(backup_folder):
+            raise RuntimeError("Respaldo fallido.")
+        return ws.package["tree"]["bytes"]
+    return run
+
+
+def _install(swap: bool) -> Phase:
+    def phase(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+        target = ws.deploy_copy()
+        installer = Installer(target["deploy"], target["version_file"], args.workers, swap=swap)
+
+        def run() -> int:
+            if not installer.install_update(ws.package_path, NEW_VERSION):
+                raise RuntimeError("Instalación fallida.")
+            return ws.package["tree"]["bytes"]
+        return run
+    return phase
+
+
+def phase_hash(ws: Workspace, args: argparse.Namespace) -> Callable[[], int]:
+    def run() -> int:
+        if calculate_sha256(ws.package_path) != ws.package["sha256"]:
+            raise RuntimeError("Hash incorrecto.")
+        return ws.package["bytes"]
+    return run
+
+
+PHASES: Dict[str, Phase] = {
+    "version_check": phase_version_check,
+    "version_check_304": phase_version_check_304,
+    "download": phase_download,
+    "backup": phase_backup,
+    "backup_incremental": phase_backup_incremental,
+    "install": _install(swap=False),
+    "install_swap": _install(swap=True),
+    "hash": phase_hash,
+}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(ws: Workspace, name: str, args: argparse.Namespace) -> Dict:
+    """
+    Ejecuta una fase 'repeat' veces (más 'warmup' repeticiones descartadas), cada una
+    con su propia preparación fuera del tiempo medido. El logging del agente no se
+    configura, por lo que solo las advertencias llegan a la consola.
+    """
+    latencies, processed = [], 0
+    for attempt in range(args.warmup + args.repeat):
+        run = PHASES[name](ws, args)
+        started = time.perf_counter()
+        processed = run()
+        elapsed = time.perf_counter() - started
+        if attempt >= args.warmup:
+            latencies.append(elapsed)
+
+    median = statistics.median(latencies)
+    result = {
+        "runs": len(latencies),
+        "latency_s": {
+            "min": round(min(latencies), 6),
+            "median": round(median, 6),
+            "p95": round(_percentile(latencies, 0.95), 6),
+            "max": round(max(latencies), 6),
+            "mean": round(statistics.fmean(latencies), 6),
+        },
+        "bytes": processed,
+    }
+    if processed:
+        result["throughput_mb_s"] = round(processed / median / (1024 * 1024), 3)
+    return result
+
+
+def compare(results: Dict, baseline_path: str, tolerance: float) -> List[Dict]:
+    """
+    Compara la mediana de cada fase contra un resultado anterior.
+    Retorna las fases cuya latencia empeoró más que la tolerancia.
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, current in results["phases"].items():
+        previous = baseline.get("phases", {}).get(name)
+        if not previous:
+            continue
+        before, after = previous["latency_s"]["median"], current["latency_s"]["median"]
+        if before and after > before * (1 + tolerance):
+            regressions.append({"phase": name, "baseline_s": before, "current_s": after,
+                                "ratio": round(after / before, 3)})
+    return regressions
+
+
+def main(argv=None) -> int:
+    """
+    Ejecuta el benchmark y escribe el resultado en JSON (stdout o --output).
+    Retorna 1 si se indicó --baseline y alguna fase empeoró más de la tolerancia.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de las fases del agente de actualización")
+    parser.add_argument("--files", type=int, default=500, help="Archivos de la aplicación")
+    parser.add_argument("--size-mb", type=float, default=200, help="Tamaño total de la aplicación (MiB)")
+    parser.add_argument("--data-mb", type=float, default=512, help="Tamaño de la carpeta 'Data' (MiB)")
+    parser.add_argument("--changed", type=float, default=0.1, help="Fracción de archivos que cambian")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones medidas por fase")
+    parser.add_argument("--warmup", type=int, default=1, help="Repeticiones de calentamiento descartadas")
+    parser.add_argument("--connections", type=int, default=4, help="Conexiones de descarga")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos de extracción")
+    parser.add_argument("--rate-limit", help="Límite de ancho de banda de la descarga (p. ej. 8M)")
+    parser.add_argument("--phases", nargs="+", choices=sorted(PHASES), default=list(PHASES),
+                        help="Fases a medir")
+    parser.add_argument("--workdir", help="Carpeta de trabajo (por defecto una temporal)")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultado anterior contra el que detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento admitido (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    root = args.workdir or tempfile.mkdtemp(prefix="erp_bench_")
+    ws = Workspace(root, args.files, int(args.size_mb * 1024 * 1024),
+                   int(args.data_mb * 1024 * 1024), args.changed)
+    try:
+        print(f"[Bench] Generando datos sintéticos en: {root}", file=sys.stderr)
+        ws.prepare()
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "params": dict(ws.params, repeat=args.repeat, warmup=args.warmup,
+                               connections=args.connections, workers=args.workers,
+                               rate_limit=args.rate_limit),
+                "package": ws.package,
+            },
+            "phases": {},
+        }
+        for name in args.phases:
+            print(f"[Bench] Midiendo fase: {name}", file=sys.stderr)
+            results["phases"][name] = measure(ws, name, args)
+
+        if args.baseline:
+            results["regressions"] = compare(results, args.baseline, args.tolerance)
+
+        output = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output + "\n")
+        else:
+            print(output)
+        return 1 if results.get("regressions") else 0
+
+    finally:
+        ws.cleanup()
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
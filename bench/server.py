@@ -0,0 +1,138 @@
+# bench/server.py
+
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Sirve archivos estáticos de la carpeta raíz con soporte de:
+    - HEAD, Range / If-Range (descargas segmentadas y reanudables).
+    - ETag / If-None-Match (consultas condicionales de versión).
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Sin Nagle: cabeceras y cuerpo van en escrituras separadas y las respuestas
+    # pequeñas sufrirían el retardo del ACK diferido (~40 ms por consulta)
+    disable_nagle_algorithm = True
+    root = "."
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _resolve(self) -> Optional[str]:
+        relative = self.path.split("?", 1)[0].lstrip("/")
+        path = os.path.normpath(os.path.join(self.root, relative))
+        if not path.startswith(os.path.normpath(self.root)) or not os.path.isfile(path):
+            return None
+        return path
+
+    def _empty(self, status: int, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self) -> None:
+        self._serve(body=False)
+
+    def do_GET(self) -> None:
+        self._serve(body=True)
+
+    def _serve(self, body: bool) -> None:
+        path = self._resolve()
+        if path is None:
+            self._empty(404)
+            return
+
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._empty(304, {"ETag": etag})
+            return
+
+        start, end = 0, size - 1
+        status = 200
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self._empty(416, {"Content-Range": f"bytes */{size}"})
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not body:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                chunk = f.read(min(1024 * 1024, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+class BenchServer:
+    """
+    Servidor HTTP local que sustituye al servidor de actualizaciones durante los benchmarks.
+    Se ejecuta en un hilo de fondo y escucha en un puerto libre de 127.0.0.1.
+    """
+
+    def __init__(self, root: str, port: int = 0):
+        """
+        Inicializa el servidor con:
+        - root: carpeta cuyos archivos se publican (versión, paquetes, checksums).
+        - port: puerto de escucha; 0 para elegir uno libre.
+        """
+        handler = type("BenchHandler", (_Handler,), {"root": os.path.abspath(root)})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "BenchServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "BenchServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    # Prueba manual: publicar la carpeta actual hasta pulsar Ctrl+C
+    import time
+
+    with BenchServer(".") as server:
+        print(f"[BenchServer] Sirviendo {os.getcwd()} en {server.url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("[BenchServer] Detenido.")
@@ -0,0 +1,135 @@
+# bench/startup.py
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List
+
+from core import validator as validator_module
+from core.validator import Validator
+
+# Raíz del repositorio: los subprocesos importan 'main' desde aquí
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos cuyo coste de importación se informa por separado
+TRACKED_MODULES = ("main", "core.validator", "core.agent", "core.updater", "core.downloader",
+                   "core.installer", "core.notifier", "requests", "pydantic", "plyer")
+
+
+def _median(values: List[float]) -> float:
+    return round(statistics.median(values), 6)
+
+
+def import_times(statement: str, repeat: int) -> Dict:
+    """
+    Ejecuta 'statement' en procesos nuevos con '-X importtime' y retorna, por módulo
+    seguido, la mediana del tiempo acumulado de importación (en segundos) y el número
+    de módulos cargados. Un módulo ausente no se importó en ese arranque.
+    """
+    samples: Dict[str, List[float]] = {}
+    counts = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stderr
+        count = 0
+        for line in output.splitlines():
+            match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", line)
+            if not match:
+                continue
+            count += 1
+            if match.group(3) in TRACKED_MODULES:
+                samples.setdefault(match.group(3), []).append(int(match.group(1)) / 1e6)
+        counts.append(count)
+
+    return {
+        "modules_loaded": int(statistics.median(counts)),
+        "cumulative_s": {name: _median(values) for name, values in sorted(samples.items())},
+    }
+
+
+def wall_time(statement: str, repeat: int) -> float:
+    """
+    Mediana del tiempo total de un proceso nuevo que ejecuta 'statement'.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=REPO_ROOT, check=True, capture_output=True)
+        samples.append(time.perf_counter() - started)
+    return _median(samples)
+
+
+def settings_load(repeat: int) -> Dict:
+    """
+    Compara la carga de la configuración validando con pydantic, reutilizando la
+    caché en disco (proceso nuevo) y reutilizando la memoria del proceso.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, "settings.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version_file": os.path.join(workdir, "version.txt"),
+                "remote_version_url": "http://127.0.0.1/version.txt",
+                "download_url_template": "http://127.0.0.1/erp_{}.zip",
+                "download_folder": os.path.join(workdir, "downloads"),
+                "deploy_folder": os.path.join(workdir, "ERP"),
+                "notify_type": "desktop",
+            }, f)
+
+        results: Dict[str, List[float]] = {"validated": [], "disk_cache": [], "memory_cache": []}
+        for _ in range(repeat):
+            for name, use_cache, clear_memo in (("validated", False, True), ("disk_cache", True, True),
+                                                ("memory_cache", True, False)):
+                if clear_memo:
+                    validator_module._settings_memo.clear()
+                started = time.perf_counter()
+                if not Validator(config_path, use_cache=use_cache).load_settings():
+                    raise RuntimeError("No se pudo cargar la configuración de prueba.")
+                results[name].append(time.perf_counter() - started)
+
+        # La primera carga con caché la crea: se descarta la primera repetición
+        return {name: _median(values[1:] or values) for name, values in results.items()}
+
+
+def main(argv=None) -> int:
+    """
+    Mide el coste de arranque del agente y escribe el resultado en JSON.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del agente de actualización")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por medición")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "interpreter_s": wall_time("pass", args.repeat),
+        "import_main_s": wall_time("import main", args.repeat),
+        "import_main": import_times("import main", args.repeat),
+        "import_agent_update_path": import_times("import core.agent, core.downloader, core.installer",
+                                                 args.repeat),
+        "settings_load_s": settings_load(args.repeat),
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+# core/agent.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+from core.validator import Settings
+from core.updater import Updater
+from lib.metrics import RunMetrics
+
+# Descarga e instalación solo se importan cuando hay una actualización que aplicar
+if TYPE_CHECKING:
+    from core.cache import PackageCache
+    from core.components import Component
+    from core.downloader import Downloader
+    from core.installer import Installer
+    from core.mirrors import MirrorSet
+    from lib.ratelimit import RateLimiter
+
+# Función que obtiene un paquete: (descripción, función de descarga) -> ruta local
+PackageProvider = Callable[[str, Callable[[], str]], str]
+
+
+class UpdateResult:
+    """
+    Resultado de ejecutar el proceso de actualización sobre un destino.
+    - status: "updated", "up_to_date" o "failed".
+    """
+
+    UPDATED = "updated"
+    UP_TO_DATE = "up_to_date"
+    FAILED = "failed"
+
+    def __init__(self, target: str, status: str, version: str = "", message: str = "",
+                 elapsed: float = 0.0):
+        self.target = target
+        self.status = status
+        self.version = version
+        self.message = message
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.status != self.FAILED
+
+    def to_dict(self) -> dict:
+        return {
+            "target": self.target,
+            "status": self.status,
+            "version": self.version,
+            "message": self.message,
+            "elapsed": round(self.elapsed, 3),
+        }
+
+
+class UpdateAgent:
+    """
+    Ejecuta el proceso de actualización del ERP sobre un único destino ya validado:
+    - Detecta actualizaciones
+    - Realiza snapshot de la instalación actual
+    - Descarga la nueva versión (delta o paquete completo) e instala
+    - Con components_url, actualiza solo los componentes con versión nueva
+    Lo utilizan tanto la ejecución simple de main() como el modo flota.
+    """
+
+    def __init__(self, settings: Settings, logger, notifier=None, name: str = "Main",
+                 package_provider: Optional[PackageProvider] = None, notify_up_to_date: bool = True,
+                 metrics: Optional[RunMetrics] = None, rate_limiter: Optional["RateLimiter"] = None):
+        """
+        Inicializa el agente con:
+        - settings: configuración validada del destino.
+        - logger: logger donde registrar el progreso.
+        - notifier: notificador opcional (None para no enviar notificaciones).
+        - name: nombre del destino usado en los mensajes de log.
+        - package_provider: permite compartir descargas entre destinos (modo flota).
+        - notify_up_to_date: notificar también cuando no hay actualizaciones.
+        - metrics: métricas de la ejecución (p. ej. con la fase de validación ya medida).
+        - rate_limiter: limitador de ancho de banda del proceso, configurado una sola vez
+          en el punto de entrada (None = sin límite). El agente no lo reconfigura.
+        """
+        self.settings = settings
+        self.logger = logger
+        self.notifier = notifier
+        self.name = name
+        self.package_provider = package_provider or (lambda key, download: download())
+        self.notify_up_to_date = notify_up_to_date
+        self.metrics = metrics or RunMetrics(name)
+        self.rate_limiter = rate_limiter
+
+    def _cache(self) -> Optional["PackageCache"]:
+        if not self.settings.cache_folder:
+            return None
+        from core.cache import PackageCache
+        return PackageCache(self.settings.cache_folder, self.settings.cache_max_bytes)
+
+    def _mirrors(self) -> Optional["MirrorSet"]:
+        if not self.settings.download_mirrors:
+            return None
+        from core.mirrors import MirrorSet
+        return MirrorSet(self.settings.download_mirrors, self.settings.get_mirror_health_file(),
+                         self.settings.mirror_probe_ttl)
+
+    def _notify(self, message: str) -> None:
+        if self.notifier:
+            self.notifier.send_notification("ERP Update", message)
+
+    def _fail(self, message: str, version: str, started: float) -> UpdateResult:
+        self.logger.error(f"[{self.name}] {message}")
+        self._notify(message)
+        return UpdateResult(self.name, UpdateResult.FAILED, version, message, time.monotonic() - started)
+
+    def _rollback(self, installer: "Installer", snapshot_id: str) -> str:
+        """
+        Devuelve la instalación al estado del snapshot previo tras una instalación fallida.
+        Retorna el texto a añadir al mensaje de error.
+        """
+        self.logger.info(f"[{self.name}] Volviendo a la versión anterior (snapshot {snapshot_id})...")
+        if installer.restore_snapshot(self.settings.get_backup_folder(), snapshot_id):
+            return " Se restauró la versión anterior."
+        return " No se pudo restaurar la versión anterior."
+
+    @staticmethod
+    def _install_from_stream(downloader: "Downloader", installer: "Installer", new_version: str) -> bool:
+        """
+        Prepara la instalación mientras se descarga y solo la confirma si el paquete
+        completo superó la verificación de integridad.
+        """
+        staged = []
+
+        def handler(stream) -> bool:
+            result = installer.stage_stream(stream, new_version)
+            if result:
+                staged.append(result)
+            return result is not None
+
+        if downloader.stream_package(new_version, handler):
+            return installer.commit_staged(staged[0])
+
+        for result in staged:
+            installer.discard_staged(result)
+        return False
+
+    def _record_download(self, downloader: "Downloader") -> None:
+        stats = downloader.last_stats
+        self.metrics.add("download", bytes=stats.get("bytes", 0), retries=stats.get("retries", 0),
+                         cache_hits=stats.get("cache_hits", 0), failovers=stats.get("failovers", 0),
+                         throttled_seconds=stats.get("throttled_seconds", 0.0))
+        self.metrics.add("hash", seconds=stats.get("hash_seconds", 0.0))
+
+    def _record_install(self, installer: "Installer") -> None:
+        stats = dict(installer.last_stats)
+        self.metrics.add("hash", seconds=stats.pop("plan_seconds", 0.0))
+        self.metrics.add("install", **stats)
+
+    def run(self) -> UpdateResult:
+        """
+        Ejecuta el proceso completo y retorna su resultado; nunca lanza excepciones.
+        Si hay carpeta de métricas configurada, escribe el registro de la ejecución.
+        """
+        result = self._run()
+        download = self.metrics.phases.get("download")
+        if download and download.get("seconds"):
+            download["bytes_per_second"] = round(download.get("bytes", 0) / download["seconds"], 1)
+        self.metrics.finish(result.status, result.version)
+        if self.settings.metrics_folder:
+            self.metrics.write(self.settings.metrics_folder)
+        return result
+
+    def _run(self) -> UpdateResult:
+        started = time.monotonic()
+        settings = self.settings
+        metrics = self.metrics
+        new_version = ""
+
+        try:
+            if settings.components_url:
+                return self._run_components(started)
+
+            with metrics.phase("version_check"):
+                updater = Updater(settings.remote_version_url, settings.version_file,
+                                  http_cache_file=settings.get_http_cache_file())
+                remote_version = updater.get_remote_version()
+                update_available = remote_version != "0.0.0" and updater.is_update_available()
+
+            if remote_version == "0.0.0":
+                return self._fail("No se pudo consultar la versión remota.", new_version, started)
+
+            if not update_available:
+                self.logger.info(f"[{self.name}] No hay actualizaciones disponibles.")
+                if self.notify_up_to_date:
+                    self._notify("No hay actualizaciones disponibles.")
+                return UpdateResult(self.name, UpdateResult.UP_TO_DATE, updater.get_local_version(),
+                                    "Sin cambios", time.monotonic() - started)
+
+            new_version = remote_version
+            self.logger.info(f"[{self.name}] Nueva versión detectada: {new_version}")
+
+            from core.downloader import Downloader
+            from core.installer import Installer
+
+            # Realizar snapshot incremental de la carpeta de despliegue actual
+            installer = Installer(settings.deploy_folder, settings.version_file, settings.extract_workers,
+                                  swap=settings.swap_install)
+            with metrics.phase("backup"):
+                snapshot_id = installer.backup_current_version(settings.get_backup_folder(),
+                                                               settings.backup_retention)
+            if not snapshot_id:
+                return self._fail("Error al respaldar la instalación actual.", new_version, started)
+            self.logger.info(f"[{self.name}] Respaldo exitoso en: {settings.get_backup_folder()} ({snapshot_id})")
+
+            downloader = Downloader(settings.download_url_template, settings.download_folder,
+                                    connections=settings.download_connections,
+                                    segment_size=settings.download_segment_size,
+                                    retries=settings.download_retries,
+                                    backoff_base=settings.download_backoff,
+                                    checksum_url_template=settings.checksum_url_template,
+                                    require_checksum=settings.require_checksum,
+                                    delta_url_template=settings.delta_url_template,
+                                    cache=self._cache(), rate_limiter=self.rate_limiter,
+                                    mirrors=self._mirrors(),
+                                    checksum_from_mirrors=settings.checksum_from_mirrors)
+
+            # Intentar primero con un paquete delta desde la versión instalada
+            installed = False
+            if settings.delta_url_template:
+                local_version = updater.get_local_version()
+                with metrics.phase("download"):
+                    delta_path = self.package_provider(
+                        settings.delta_url_template.format(local_version, new_version),
+                        lambda: downloader.download_delta(local_version, new_version))
+                self._record_download(downloader)
+                if delta_path:
+                    self.logger.info(f"[{self.name}] Paquete delta {local_version} -> {new_version} "
+                                     f"descargado en: {delta_path}")
+                    with metrics.phase("install"):
+                        installed = installer.install_delta(delta_path, new_version)
+                    self._record_install(installer)
+                if not installed:
+                    self.logger.info(f"[{self.name}] Delta no disponible o no aplicable, se usará el paquete completo.")
+
+            # Instalar directamente desde el flujo de descarga, sin escribir el paquete a disco
+            if not installed and settings.stream_install:
+                with metrics.phase("install"):
+                    installed = self._install_from_stream(downloader, installer, new_version)
+                self._record_download(downloader)
+                self._record_install(installer)
+                if not installed and installer.partially_applied:
+                    message = "Error al confirmar la instalación desde el flujo."
+                    return self._fail(message + self._rollback(installer, snapshot_id), new_version, started)
+                if not installed:
+                    self.logger.info(f"[{self.name}] Instalación en modo flujo no completada, "
+                                     f"se descargará el paquete completo.")
+
+            if not installed:
+                # Descargar nuevo paquete
+                with metrics.phase("download"):
+                    package_path = self.package_provider(
+                        settings.download_url_template.format(new_version),
+                        lambda: downloader.download_package(new_version))
+                self._record_download(downloader)
+
+                if not package_path:
+                    message = "Error al descargar el paquete de actualización."
+                    if installer.partially_applied:
+                        message += self._rollback(installer, snapshot_id)
+                    return self._fail(message, new_version, started)
+
+                self.logger.info(f"[{self.name}] Paquete descargado en: {package_path}")
+
+                # Aplicar el paquete sobre la carpeta de despliegue
+                with metrics.phase("install"):
+                    installed = installer.install_update(package_path, new_version)
+                self._record_install(installer)
+                if not installed:
+                    message = "Error al instalar el paquete de actualización."
+                    if installer.partially_applied:
+                        message += self._rollback(installer, snapshot_id)
+                    return self._fail(message, new_version, started)
+
+            self.logger.info(f"[{self.name}] Actualización a versión {new_version} completada exitosamente.")
+            self._notify(f"Actualización {new_version} instalada correctamente.")
+            return UpdateResult(self.name, UpdateResult.UPDATED, new_version, "Actualizado",
+                                time.monotonic() - started)
+
+        except Exception as e:
+            self.logger.exception(f"[{self.name}] Error inesperado durante la actualización: {e}")
+            self._notify("Fallo inesperado en la actualización.")
+            return UpdateResult(self.name, UpdateResult.FAILED, new_version, str(e), time.monotonic() - started)
+
+    def _download_components(self, plan: List["Component"]) -> List[Tuple["Component", str]]:
+        """
+        Descarga a la vez los paquetes de los componentes a actualizar. Las conexiones
+        configuradas se reparten entre las descargas simultáneas.
+        Retorna (componente, ruta local) por componente; la ruta es "" si su descarga falló.
+        """
+        from core.downloader import Downloader
+
+        settings = self.settings
+        workers = max(1, min(len(plan), settings.download_connections))
+        connections = max(1, settings.download_connections // workers)
+        mirrors = self._mirrors()
+
+        def fetch(component: "Component") -> Tuple["Downloader", str]:
+            downloader = Downloader(component.url, settings.download_folder, connections=connections,
+                                    segment_size=settings.download_segment_size,
+                                    retries=settings.download_retries,
+                                    backoff_base=settings.download_backoff,
+                                    require_checksum=settings.require_checksum,
+                                    cache=self._cache(), rate_limiter=self.rate_limiter, mirrors=mirrors,
+                                    checksum_from_mirrors=settings.checksum_from_mirrors)
+            path = self.package_provider(
+                component.url,
+                lambda: downloader.download_url(component.url, component.expected_digests,
+                                                f"{component.name} {component.version}", component.filename))
+            return downloader, path
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="component-download") as pool:
+            results = list(pool.map(fetch, plan))
+
+        for downloader, _ in results:
+            self._record_download(downloader)
+        return [(component, path) for component, (_, path) in zip(plan, results)]
+
+    def _run_components(self, started: float) -> UpdateResult:
+        """
+        Actualización por componentes (manifiesto JSON en components_url): solo se
+        descargan, a la vez, los componentes con una versión publicada mayor que la
+        registrada en el índice local, y se instalan todos en una sola pasada.
+        """
+        from core.components import ComponentInstaller, ComponentManifest, plan_updates
+
+        settings = self.settings
+        metrics = self.metrics
+        with metrics.phase("version_check"):
+            updater = Updater(settings.remote_version_url, settings.version_file,
+                              http_cache_file=settings.get_http_cache_file())
+            data = updater.get_component_manifest(settings.components_url)
+            if data is None:
+                return self._fail("No se pudo consultar el manifiesto de componentes.", "", started)
+            try:
+                manifest = ComponentManifest.from_dict(data)
+            except ValueError as e:
+                return self._fail(f"Manifiesto de componentes inválido: {e}", "", started)
+
+            installer = ComponentInstaller(settings.deploy_folder, settings.version_file, settings.extract_workers)
+            index = installer.load_index()
+            plan = plan_updates(manifest, index)
+
+        if not plan:
+            self.logger.info(f"[{self.name}] No hay actualizaciones disponibles.")
+            if self.notify_up_to_date:
+                self._notify("No hay actualizaciones disponibles.")
+            return UpdateResult(self.name, UpdateResult.UP_TO_DATE, index.version or manifest.label,
+                                "Sin cambios", time.monotonic() - started)
+
+        new_version = manifest.label
+        sizes = [component.size for component in plan if component.size is not None]
+        self.logger.info(f"[{self.name}] Componentes a actualizar ({len(plan)} de {len(manifest.components)}"
+                         + (f", {sum(sizes) / (1024 * 1024):.1f} MiB" if sizes else "") + "): "
+                         + ", ".join(f"{component.name} {index.version_of(component.name) or '-'} -> "
+                                     f"{component.version}" for component in plan))
+
+        with metrics.phase("backup"):
+            snapshot_id = installer.backup_current_version(settings.get_backup_folder(), settings.backup_retention)
+        if not snapshot_id:
+            return self._fail("Error al respaldar la instalación actual.", new_version, started)
+
+        with metrics.phase("download"):
+            packages = self._download_components(plan)
+        failed = [component.name for component, path in packages if not path]
+        if failed:
+            return self._fail(f"Error al descargar los componentes: {', '.join(failed)}.", new_version, started)
+
+        with metrics.phase("install"):
+            installed = installer.install_components(packages, manifest)
+        self._record_install(installer)
+        if not installed:
+            message = "Error al instalar los componentes."
+            if installer.partially_applied:
+                message += self._rollback(installer, snapshot_id)
+            return self._fail(message, new_version, started)
+
+        self.logger.info(f"[{self.name}] Actualización de componentes a {new_version} completada exitosamente.")
+        self._notify(f"Actualización {new_version} instalada correctamente.")
+        return UpdateResult(self.name, UpdateResult.UPDATED, new_version, "Actualizado",
+                            time.monotonic() - started)
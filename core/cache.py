@@ -0,0 +1,179 @@
+# core/cache.py
+
+import os
+import json
+import time
+import shutil
+from typing import Dict, Optional
+
+from lib.filelock import FileLock
+from lib.utils import calculate_sha256
+from lib.logger import get_logger
+
+logger = get_logger("Cache")
+
+
+class PackageCache:
+    """
+    Caché de paquetes compartida y direccionada por contenido.
+    - Cada paquete se guarda una vez en 'objects/<sha256>' y se indexa por su URL
+      (que identifica la versión) y por su hash.
+    - Un acierto evita por completo el acceso a la red.
+    - El índice se protege con un candado de archivo, por lo que varios agentes
+      (procesos o máquinas sobre una carpeta compartida) pueden usarla a la vez.
+    - Al superar el tamaño máximo se eliminan las entradas menos usadas recientemente (LRU).
+    """
+
+    def __init__(self, root: str, max_bytes: int = 10 * 1024 ** 3):
+        """
+        Inicializa la caché con:
+        - root: carpeta de la caché.
+        - max_bytes: tamaño máximo total de los paquetes almacenados.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_folder = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = FileLock(os.path.join(root, ".lock"))
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_folder, sha256)
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("entries", {})
+        index.setdefault("keys", {})
+        index.setdefault("stats", {"hits": 0, "misses": 0, "evictions": 0})
+        return index
+
+    def _save_index(self, index: Dict) -> None:
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _materialize(source: str, destination: str) -> None:
+        """
+        Deja una copia del archivo en 'destination' mediante hardlink si es posible
+        (mismo volumen) o copia en otro caso.
+        """
+        tmp_path = destination + ".tmp_cache"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def fetch(self, key: str, destination: str, sha256: Optional[str] = None) -> Optional[str]:
+        """
+        Busca un paquete por hash o, si no se conoce, por clave (URL) y, si está en caché,
+        lo deja en 'destination'. El contenido se vuelve a hashear antes de darlo por bueno:
+        un objeto dañado o sustituido se expulsa y cuenta como fallo.
+        Retorna el SHA-256 del paquete en caso de acierto, o None si no está.
+        """
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with self.lock:
+                index = self._load_index()
+                found = sha256 if sha256 else index["keys"].get(key)
+                if (not found or found not in index["entries"]
+                        or not os.path.isfile(self._object_path(found))):
+                    index["stats"]["misses"] += 1
+                    self._save_index(index)
+                    return None
+
+                os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+                self._materialize(self._object_path(found), destination)
+
+            # Verificación fuera del candado para no bloquear a otros agentes mientras se lee
+            if calculate_sha256(destination) != found:
+                logger.warning(f"Paquete en caché dañado, se expulsa: {found[:12]}")
+                os.remove(destination)
+                with self.lock:
+                    index = self._load_index()
+                    self._remove_entry(index, found)
+                    index["stats"]["misses"] += 1
+                    self._save_index(index)
+                return None
+
+            with self.lock:
+                index = self._load_index()
+                if found in index["entries"]:
+                    index["entries"][found]["last_used"] = time.time()
+                index["stats"]["hits"] += 1
+                self._save_index(index)
+
+            logger.info(f"Paquete encontrado en caché: {key}")
+            return found
+
+        except Exception as e:
+            logger.error(f"Error consultando la caché: {e}")
+            return None
+
+    def _remove_entry(self, index: Dict, sha256: str) -> None:
+        """
+        Elimina un paquete del índice y del disco. Debe llamarse con el candado tomado.
+        """
+        if os.path.exists(self._object_path(sha256)):
+            os.remove(self._object_path(sha256))
+        index["entries"].pop(sha256, None)
+        index["keys"] = {k: v for k, v in index["keys"].items() if v != sha256}
+
+    def store(self, key: str, path: str, sha256: str, version: str = "") -> None:
+        """
+        Agrega un paquete ya verificado a la caché y aplica la política de tamaño (LRU).
+        """
+        try:
+            os.makedirs(self.objects_folder, exist_ok=True)
+            with self.lock:
+                index = self._load_index()
+                if not os.path.isfile(self._object_path(sha256)):
+                    self._materialize(path, self._object_path(sha256))
+
+                entry = index["entries"].setdefault(sha256, {"size": os.path.getsize(path), "versions": []})
+                if version and version not in entry["versions"]:
+                    entry["versions"].append(version)
+                entry["last_used"] = time.time()
+                index["keys"][key] = sha256
+
+                self._evict(index, keep=sha256)
+                self._save_index(index)
+
+            logger.info(f"Paquete almacenado en caché: {key}")
+
+        except Exception as e:
+            logger.error(f"Error almacenando en la caché: {e}")
+
+    def _evict(self, index: Dict, keep: str) -> None:
+        """
+        Elimina las entradas menos usadas hasta respetar el tamaño máximo.
+        Debe llamarse con el candado tomado.
+        """
+        total = sum(entry["size"] for entry in index["entries"].values())
+        for sha256, entry in sorted(index["entries"].items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if sha256 == keep:
+                continue
+            self._remove_entry(index, sha256)
+            index["stats"]["evictions"] += 1
+            total -= entry["size"]
+            logger.info(f"Paquete expulsado por tamaño (LRU): {sha256[:12]} ({entry['size']} bytes)")
+
+    def stats(self) -> Dict:
+        """
+        Retorna los contadores de aciertos, fallos y expulsiones junto al uso actual.
+        """
+        with self.lock:
+            index = self._load_index()
+        return dict(index["stats"],
+                    entries=len(index["entries"]),
+                    bytes=sum(entry["size"] for entry in index["entries"].values()),
+                    max_bytes=self.max_bytes)
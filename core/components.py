@@ -0,0 +1,308 @@
+# core/components.py
+
+import os
+import re
+import posixpath
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from core.installer import Installer, StagedInstall
+from core.manifest import INSTALLED_MANIFEST_NAME, normalize_path, is_protected, is_safe_path
+from lib.semver import parse_version
+from lib.logger import get_logger
+
+logger = get_logger("Components")
+
+# Índice de componentes instalados, dentro de la carpeta de despliegue (viaja con los snapshots)
+COMPONENTS_INDEX_NAME = ".erp_components.json"
+
+
+def download_filename(name: str, version: str, url: str) -> str:
+    """
+    Nombre local del paquete de un componente: '<nombre>-<versión>-<archivo>'. Así dos
+    componentes cuyas URL terminan igual (p. ej. '.../core/package.tar.zst' y
+    '.../ui/package.tar.zst') no comparten destino, '.part' ni diario al descargarse a la vez.
+    """
+    basename = url.rsplit("/", 1)[-1].split("?", 1)[0] or "package"
+    return re.sub(r"[^A-Za-z0-9._-]", "_", f"{name}-{version}-{basename}")
+
+
+class Component:
+    """
+    Componente del ERP con versión propia, publicado en el manifiesto de componentes.
+    - path: subcarpeta de la carpeta de despliegue donde se instala (por defecto su nombre).
+    """
+
+    def __init__(self, name: str, version: str, url: str, size: Optional[int] = None,
+                 sha256: str = "", path: Optional[str] = None):
+        self.name = name
+        self.version = version
+        self.url = url
+        self.size = size
+        self.sha256 = sha256.lower()
+        # "a/./b/" y "a/b" son la misma carpeta; "", "." o "a/.." quedan como "."
+        self.path = normalize_path(posixpath.normpath(normalize_path(path if path is not None else name)))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Component":
+        """
+        Lanza ValueError si faltan campos o la versión no es válida.
+        """
+        try:
+            component = cls(str(data["name"]), str(data["version"]), str(data["url"]),
+                            int(data["size"]) if data.get("size") is not None else None,
+                            str(data.get("sha256") or ""), data.get("path"))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Componente inválido en el manifiesto: {data!r} ({e})")
+        parse_version(component.version)
+        return component
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "version": self.version, "url": self.url,
+                "size": self.size, "sha256": self.sha256, "path": self.path}
+
+    @property
+    def expected_digests(self) -> Optional[Dict[str, str]]:
+        return {"sha256": self.sha256} if self.sha256 else None
+
+    @property
+    def filename(self) -> str:
+        return download_filename(self.name, self.version, self.url)
+
+
+class ComponentManifest:
+    """
+    Manifiesto de componentes publicado por el servidor:
+        {"version": "2024.3", "components": [{"name": "core", "version": "1.10.0",
+         "url": "https://.../core-1.10.0.tar.zst", "size": 123, "sha256": "...", "path": "Core"}]}
+    'version' (opcional) identifica el conjunto publicado y es la que se guarda en el
+    archivo de versión (si falta, se guarda la mayor de los componentes). Cada
+    componente se instala en su propia subcarpeta.
+    """
+
+    def __init__(self, version: str = "", components: Optional[List[Component]] = None):
+        self.version = version
+        self.components: List[Component] = components or []
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ComponentManifest":
+        """
+        Valida el manifiesto. Lanza ValueError si algún componente es inválido, hay
+        nombres repetidos o sus carpetas se solapan, salen de la carpeta de despliegue
+        o caen en la carpeta protegida.
+        """
+        if not isinstance(data.get("components"), list):
+            raise ValueError("El manifiesto de componentes no incluye la lista 'components'.")
+        components = [Component.from_dict(entry) for entry in data["components"]]
+
+        names, paths = set(), []
+        for component in components:
+            if component.name in names:
+                raise ValueError(f"Componente repetido en el manifiesto: {component.name}")
+            names.add(component.name)
+            if (component.path in ("", ".") or not is_safe_path(component.path) or is_protected(component.path)
+                    or component.path in (INSTALLED_MANIFEST_NAME, COMPONENTS_INDEX_NAME)):
+                raise ValueError(f"Carpeta inválida para el componente {component.name}: {component.path!r}")
+            # Sin distinguir mayúsculas: en Windows "Core" y "core" son la misma carpeta
+            paths.append(component.path.lower())
+
+        # Carpetas disjuntas: la instalación de un componente nunca toca los archivos de otro
+        for path in paths:
+            for other in paths:
+                if path != other and other.startswith(path + "/"):
+                    raise ValueError(f"Las carpetas de componentes se solapan: {path} y {other}")
+        if len(set(paths)) != len(paths):
+            raise ValueError("Dos componentes comparten la misma carpeta de instalación.")
+
+        return cls(str(data.get("version") or ""), components)
+
+    @property
+    def label(self) -> str:
+        """
+        Versión del conjunto: la publicada o, si no hay, las de cada componente.
+        """
+        if self.version:
+            return self.version
+        return ",".join(f"{component.name}={component.version}" for component in self.components)
+
+    @property
+    def file_version(self) -> str:
+        """
+        Versión a guardar en el archivo de versión: la publicada o, si no hay, la mayor
+        de los componentes. El archivo debe contener una versión comparable, no la etiqueta.
+        """
+        if self.version or not self.components:
+            return self.version
+        return max(self.components, key=lambda component: parse_version(component.version)).version
+
+
+class ComponentIndex:
+    """
+    Índice local de los componentes instalados (nombre -> versión, hash y carpeta).
+    Reemplaza al archivo de versión único como referencia para decidir qué actualizar.
+    """
+
+    def __init__(self, path: str, version: str = "", components: Optional[Dict[str, Dict]] = None):
+        self.path = path
+        self.version = version
+        self.components: Dict[str, Dict] = components or {}
+
+    @classmethod
+    def load(cls, path: str) -> "ComponentIndex":
+        """
+        Carga el índice. Si no existe o no puede leerse se considera que no hay
+        componentes instalados (se instalarán todos).
+        """
+        try:
+            if not os.path.isfile(path):
+                return cls(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(path, str(data.get("version", "")), dict(data.get("components") or {}))
+        except Exception as e:
+            logger.error(f"Error leyendo el índice de componentes {path}: {e}")
+            return cls(path)
+
+    def version_of(self, name: str) -> Optional[str]:
+        entry = self.components.get(name)
+        return entry.get("version") if entry else None
+
+    def record(self, component: Component) -> None:
+        self.components[component.name] = {"version": component.version, "sha256": component.sha256,
+                                           "path": component.path, "url": component.url,
+                                           "installed": time.time()}
+
+    def save(self) -> None:
+        """
+        Guarda el índice de forma atómica (archivo temporal + reemplazo).
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.version, "components": self.components}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def plan_updates(manifest: ComponentManifest, index: ComponentIndex) -> List[Component]:
+    """
+    Conjunto mínimo de componentes a instalar: los que no están instalados, cambiaron
+    de carpeta o tienen una versión publicada mayor que la instalada (orden semántico).
+    Un componente instalado con versión mayor que la publicada no se degrada.
+    """
+    plan = []
+    for component in manifest.components:
+        entry = index.components.get(component.name)
+        if not entry or entry.get("path", component.path) != component.path:
+            plan.append(component)
+            continue
+        try:
+            installed = parse_version(str(entry.get("version", "")))
+        except ValueError:
+            logger.warning(f"Versión instalada no reconocida para {component.name}: {entry.get('version')!r}")
+            plan.append(component)
+            continue
+        published = parse_version(component.version)
+        if published > installed:
+            plan.append(component)
+        elif published < installed:
+            logger.warning(f"{component.name}: la versión instalada ({entry['version']}) es posterior "
+                           f"a la publicada ({component.version}), no se modifica.")
+
+    removed = sorted(set(index.components) - {component.name for component in manifest.components})
+    if removed:
+        logger.warning(f"Componentes instalados que ya no se publican (se conservan): {', '.join(removed)}")
+    return plan
+
+
+class ComponentInstaller(Installer):
+    """
+    Instala un conjunto de componentes en una sola pasada sobre la carpeta de despliegue:
+    - Prepara todos los paquetes (en paralelo, cada uno en su subcarpeta) escribiendo
+      solo los archivos que cambiaron como temporales junto a su destino.
+    - Solo si todos se prepararon bien, confirma los renombrados y actualiza una única
+      vez el índice de componentes y el archivo de versión.
+    Respaldo, restauración y vuelta atrás son los de Installer sobre toda la carpeta.
+    """
+
+    def __init__(self, deploy_folder: str, version_file: str, workers: int = 4):
+        super().__init__(deploy_folder, version_file, workers)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.deploy_folder, COMPONENTS_INDEX_NAME)
+
+    def load_index(self) -> ComponentIndex:
+        return ComponentIndex.load(self.index_path)
+
+    def _component_installer(self, component: Component) -> Installer:
+        # Sin archivo de versión propio: la versión de cada componente queda en el índice
+        return Installer(os.path.join(self.deploy_folder, *component.path.split("/")), "", self.workers)
+
+    def _stage(self, component: Component, package_path: str) -> Tuple[Installer, Optional[StagedInstall]]:
+        installer = self._component_installer(component)
+        logger.info(f"Preparando componente {component.name} {component.version} en: {installer.deploy_folder}")
+        try:
+            os.makedirs(installer.deploy_folder, exist_ok=True)
+            with open(package_path, 'rb') as f:
+                return installer, installer.stage_stream(f, component.version)
+        except OSError as e:
+            logger.error(f"Error abriendo el paquete del componente {component.name}: {e}")
+            return installer, None
+
+    def install_components(self, packages: List[Tuple[Component, str]], manifest: ComponentManifest) -> bool:
+        """
+        Instala los paquetes descargados (componente, ruta local) de una sola vez.
+        Si algún paquete no puede prepararse no se modifica nada; si el fallo ocurre
+        al confirmar, partially_applied indica que hay que restaurar el respaldo.
+        """
+        self.last_stats = {}
+        started = time.monotonic()
+        workers = max(1, min(self.workers, len(packages)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            staged = list(pool.map(lambda item: self._stage(*item), packages))
+
+        failed = [component.name for (component, _), (_, result) in zip(packages, staged) if result is None]
+        if failed:
+            logger.error(f"No se pudieron preparar los componentes: {', '.join(failed)}")
+            for _, result in staged:
+                if result is not None:
+                    self.discard_staged(result)
+            return False
+
+        for installer, _ in staged:
+            for key, value in installer.last_stats.items():
+                self.last_stats[key] = self.last_stats.get(key, 0) + value
+
+        try:
+            self._discard_previous()
+            self.partially_applied = True
+            for installer, result in staged:
+                if not installer.commit_staged(result):
+                    return False
+
+            index = self.load_index()
+            for component, _ in packages:
+                index.record(component)
+            index.version = manifest.label
+            index.save()
+            self._write_version(manifest.file_version)
+            logger.info(f"Componentes instalados en {time.monotonic() - started:.1f} s: "
+                        + ", ".join(f"{component.name} {component.version}" for component, _ in packages))
+            return True
+
+        except Exception as e:
+            logger.error(f"Error inesperado confirmando la instalación de componentes: {e}")
+            return False
+
+
+if __name__ == "__main__":
+    # Prueba manual: qué componentes de un manifiesto local habría que actualizar
+    import sys
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        manifest = ComponentManifest.from_dict(json.load(f))
+    index = ComponentIndex.load(os.path.join(sys.argv[2], COMPONENTS_INDEX_NAME))
+    for component in plan_updates(manifest, index):
+        print(f"[Components] {component.name}: {index.version_of(component.name) or '-'} -> {component.version}")
@@ -0,0 +1,191 @@
+# core/daemon.py
+
+import os
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from core.agent import UpdateAgent, UpdateResult
+from core.preflight import Preflight, clear_cache
+from core.validator import Validator
+from lib.logger import set_run_id
+from lib.ratelimit import build_schedule
+from lib.utils import in_window, parse_window
+
+if TYPE_CHECKING:
+    from lib.ratelimit import RateLimiter
+
+# Cada cuántos segundos se revisa el archivo de configuración mientras se espera
+CONFIG_CHECK_INTERVAL = 30
+
+
+def seconds_until_window(window: Optional[Tuple[int, int]], moment: datetime) -> float:
+    """
+    Segundos que faltan para el próximo inicio de la ventana (0 si ya se está dentro).
+    """
+    if in_window(window, moment):
+        return 0.0
+    start = moment.replace(hour=window[0] // 60, minute=window[0] % 60, second=0, microsecond=0)
+    if start <= moment:
+        start += timedelta(days=1)
+    return (start - moment).total_seconds()
+
+
+class UpdateDaemon:
+    """
+    Modo servicio residente del agente.
+    - Mantiene en memoria la configuración validada y la sesión HTTP (conexiones keep-alive).
+    - Consulta actualizaciones cada 'poll_interval' segundos con un jitter aleatorio,
+      para que miles de equipos no consulten el servidor en el mismo minuto.
+    - Ante errores aplica backoff exponencial hasta 'poll_max_backoff'.
+    - Solo actualiza dentro de la ventana de mantenimiento configurada.
+    - Recarga la configuración cuando el archivo cambia, sin reiniciar el proceso.
+    """
+
+    def __init__(self, config_path: str, logger, notifier=None, rate_limiter: Optional["RateLimiter"] = None):
+        """
+        Inicializa el servicio con:
+        - config_path: ruta del archivo de configuración.
+        - logger: logger del proceso.
+        - notifier: notificador opcional.
+        - rate_limiter: limitador del proceso; se reconfigura solo al (re)cargar la configuración.
+        """
+        self.config_path = config_path
+        self.logger = logger
+        self.notifier = notifier
+        self.rate_limiter = rate_limiter
+        self.settings = None
+        self.config_mtime = 0.0
+        self.failures = 0
+        self.stop_event = threading.Event()
+
+    def _config_changed(self) -> bool:
+        try:
+            return os.path.getmtime(self.config_path) != self.config_mtime
+        except OSError:
+            return False
+
+    def load_config(self) -> bool:
+        """
+        Carga y valida la configuración. Si la nueva configuración es inválida
+        se conserva la anterior.
+        Solo se comprueban el archivo y las carpetas: las comprobaciones de entorno
+        (red, servidor, espacio) las repite poll_once, así el servicio arranca y acepta
+        cambios de configuración aunque el servidor no esté disponible.
+        """
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            mtime = 0.0
+
+        clear_cache()
+        validator = Validator(self.config_path)
+        loaded = validator.load_settings()
+        if not loaded or not validator.check_folders():
+            # Un archivo inválido se vuelve a leer cuando cambie; un fallo de carpetas
+            # (p. ej. una unidad de red no montada) se reintenta en la próxima comprobación
+            if not loaded:
+                self.config_mtime = mtime
+            if self.settings:
+                self.logger.error("[Daemon] Configuración nueva inválida, se mantiene la anterior.")
+            return self.settings is not None
+
+        if self.settings is not None:
+            self.logger.info("[Daemon] Configuración recargada.")
+        self.settings = validator.settings
+        self.config_mtime = mtime
+        if self.notifier is not None:
+            self.notifier.configure(self.settings)
+        if self.rate_limiter is not None:
+            self.rate_limiter.configure(build_schedule(self.settings.download_rate_limit,
+                                                       self.settings.download_rate_profiles))
+        return True
+
+    def next_delay(self) -> float:
+        """
+        Calcula la espera hasta la próxima consulta: intervalo con jitter, backoff
+        exponencial tras errores consecutivos y ajuste a la ventana de mantenimiento.
+        """
+        settings = self.settings
+        interval = settings.poll_interval
+        if self.failures:
+            interval = min(settings.poll_max_backoff, interval * (2 ** self.failures))
+        delay = interval + random.uniform(-settings.poll_jitter, settings.poll_jitter) * interval
+
+        window = parse_window(settings.maintenance_window)
+        moment = datetime.now() + timedelta(seconds=delay)
+        wait_window = seconds_until_window(window, moment)
+        if wait_window:
+            # Repartir a los equipos dentro de la ventana en lugar de todos al inicio
+            delay += wait_window + random.uniform(0, min(settings.poll_interval, 3600) * settings.poll_jitter)
+        return max(1.0, delay)
+
+    def _wait(self, delay: float) -> None:
+        """
+        Espera 'delay' segundos despertando periódicamente para detectar cambios de configuración.
+        """
+        deadline = time.monotonic() + delay
+        while not self.stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.stop_event.wait(min(remaining, CONFIG_CHECK_INTERVAL))
+            if self._config_changed():
+                self.logger.info("[Daemon] Cambio detectado en la configuración.")
+                self.load_config()
+
+    def poll_once(self) -> Optional[UpdateResult]:
+        """
+        Ejecuta una consulta/actualización si se está dentro de la ventana de mantenimiento.
+        """
+        if not in_window(parse_window(self.settings.maintenance_window), datetime.now()):
+            self.logger.info("[Daemon] Fuera de la ventana de mantenimiento, se pospone la consulta.")
+            return None
+
+        set_run_id()
+        # Las comprobaciones superadas hace menos de 'preflight_ttl' segundos no se repiten
+        failed = [check for check in Preflight(self.settings).run() if not check.ok]
+        if failed:
+            self.failures += 1
+            reasons = "; ".join(f"{check.name}: {check.reason}" for check in failed)
+            return UpdateResult("Daemon", UpdateResult.FAILED, message=f"Comprobaciones previas fallidas: {reasons}")
+
+        limiter = self.rate_limiter
+        result = UpdateAgent(self.settings, self.logger, self.notifier, name="Daemon",
+                             notify_up_to_date=False,
+                             rate_limiter=None if limiter is None or limiter.unlimited else limiter).run()
+        self.failures = self.failures + 1 if not result.ok else 0
+        return result
+
+    def stop(self, *args) -> None:
+        self.logger.info("[Daemon] Deteniendo servicio...")
+        self.stop_event.set()
+
+    def run(self) -> None:
+        """
+        Bucle principal del servicio hasta recibir SIGINT/SIGTERM.
+        """
+        if not self.load_config():
+            self.logger.error("[Daemon] Configuración inválida. No se puede iniciar el servicio.")
+            return
+
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        # Desfase inicial aleatorio para repartir la carga sobre el servidor de versiones
+        initial = random.uniform(0, self.settings.poll_interval * self.settings.poll_jitter)
+        self.logger.info(f"[Daemon] Servicio iniciado. Intervalo {self.settings.poll_interval} s, "
+                         f"primera consulta en {initial:.0f} s.")
+        self._wait(initial)
+
+        while not self.stop_event.is_set():
+            self.poll_once()
+            delay = self.next_delay()
+            if self.failures:
+                self.logger.info(f"[Daemon] {self.failures} errores consecutivos, próxima consulta en {delay:.0f} s.")
+            self._wait(delay)
+
+        self.logger.info("[Daemon] Servicio detenido.")
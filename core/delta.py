@@ -0,0 +1,100 @@
+# core/delta.py
+
+import os
+import json
+import hashlib
+import zipfile
+from typing import Dict
+
+from core.manifest import Manifest, normalize_path
+
+# Índice del paquete delta con el manifiesto de la versión objetivo y los parches
+DELTA_INDEX_NAME = "delta.json"
+
+
+class DeltaError(Exception):
+    """
+    El paquete delta no puede aplicarse sobre la instalación actual.
+    """
+
+
+class DeltaPackage:
+    """
+    Paquete delta entre dos versiones del ERP (ZIP con un índice 'delta.json').
+
+    Formato del índice:
+    {
+        "from": "1.2.2",
+        "to": "1.2.3",
+        "manifest": {"files": {ruta: {"size": int, "sha256": str}}},
+        "patches": {ruta: {"source_sha256": str, "member": "patches/ruta.bsdiff"}},
+        "files": {ruta: "files/ruta"}
+    }
+    - manifest: manifiesto completo de la versión objetivo.
+    - patches: parches binarios bsdiff por archivo, aplicables sobre el archivo instalado.
+    - files: archivos nuevos incluidos completos dentro del delta.
+    Los archivos eliminados se deducen comparando manifiestos.
+    """
+
+    def __init__(self, zip_ref: zipfile.ZipFile):
+        """
+        Inicializa el delta a partir de un ZIP abierto y lee su índice.
+        """
+        self.zip_ref = zip_ref
+        try:
+            with zip_ref.open(DELTA_INDEX_NAME) as f:
+                index = json.loads(f.read().decode('utf-8'))
+        except KeyError:
+            raise DeltaError(f"El paquete delta no contiene {DELTA_INDEX_NAME}")
+
+        self.from_version = str(index.get("from", ""))
+        self.to_version = str(index.get("to", ""))
+        self.manifest = Manifest.from_dict(dict(index.get("manifest", {}), version=self.to_version))
+        self.patches: Dict[str, Dict] = {normalize_path(k): v for k, v in index.get("patches", {}).items()}
+        self.files: Dict[str, str] = {normalize_path(k): v for k, v in index.get("files", {}).items()}
+
+    def build_file(self, path: str, source_path: str, destination: str) -> None:
+        """
+        Reconstruye la nueva versión de 'path' en 'destination':
+        - copiando el archivo completo incluido en el delta, o
+        - aplicando el parche binario sobre el archivo instalado 'source_path'.
+        El resultado se verifica contra el SHA-256 del manifiesto objetivo.
+        """
+        expected = self.manifest.files[path]["sha256"]
+
+        if path in self.files:
+            with self.zip_ref.open(self.files[path]) as f:
+                data = f.read()
+        elif path in self.patches:
+            patch = self.patches[path]
+            if not os.path.isfile(source_path):
+                raise DeltaError(f"Archivo base ausente para aplicar parche: {path}")
+            with open(source_path, 'rb') as f:
+                source = f.read()
+            if hashlib.sha256(source).hexdigest() != patch["source_sha256"]:
+                raise DeltaError(f"El archivo instalado no corresponde a la versión base del parche: {path}")
+            with self.zip_ref.open(patch["member"]) as f:
+                data = _apply_patch(source, f.read())
+        else:
+            raise DeltaError(f"El delta no contiene datos para: {path}")
+
+        if hashlib.sha256(data).hexdigest() != expected:
+            raise DeltaError(f"El archivo reconstruido no coincide con el hash esperado: {path}")
+
+        with open(destination, 'wb') as f:
+            f.write(data)
+
+
+def _apply_patch(source: bytes, patch: bytes) -> bytes:
+    """
+    Aplica un parche bsdiff. La dependencia 'bsdiff4' es opcional: si no está
+    instalada, el delta no puede aplicarse y se usa el paquete completo.
+    """
+    try:
+        import bsdiff4
+    except ImportError:
+        raise DeltaError("El módulo 'bsdiff4' no está instalado; no es posible aplicar parches binarios")
+    try:
+        return bsdiff4.patch(source, patch)
+    except Exception as e:
+        raise DeltaError(f"Parche binario inválido: {e}")
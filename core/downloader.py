@@ -1,70 +1,668 @@
 # core/downloader.py
 
 import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
 import requests
 
+from core.cache import PackageCache
+from core.journal import TransferJournal
+from core.mirrors import MirrorSet, is_local, local_path, mirror_base
+from lib.http_session import get_session
+from lib.ratelimit import RateLimiter
+from lib.utils import InlineDigest, calculate_hashes
+from lib.logger import get_logger
+
+logger = get_logger("Downloader")
+
+# Tamaño de bloque usado al leer la respuesta HTTP
+CHUNK_SIZE = 64 * 1024
+
+# Cada cuántos bytes se persiste el progreso de un rango en el diario
+JOURNAL_INTERVAL = 4 * 1024 * 1024
+
+
+class RemoteFile:
+    """
+    Metadatos del paquete remoto obtenidos mediante una petición HEAD.
+    """
+
+    def __init__(self, size: Optional[int] = None, accept_ranges: bool = False,
+                 etag: str = "", last_modified: str = ""):
+        self.size = size
+        self.accept_ranges = accept_ranges
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def validator(self) -> str:
+        """
+        Valor para la cabecera 'If-Range': ETag fuerte si existe, si no Last-Modified.
+        """
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+
+class _DigestReader:
+    """
+    Envoltorio de lectura que alimenta un InlineDigest con los bytes entregados
+    (y los somete al limitador de ancho de banda, si lo hay).
+    """
+
+    def __init__(self, stream: BinaryIO, digest: InlineDigest, throttle: Optional[Callable[[int], None]] = None):
+        self.stream = stream
+        self.digest = digest
+        self.throttle = throttle
+        self.position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        if data:
+            if self.throttle:
+                self.throttle(len(data))
+            self.digest.feed(self.position, data)
+            self.position += len(data)
+        return data
+
 
 class Downloader:
     """
     Clase encargada de descargar el paquete de actualización del ERP
     desde un servidor remoto utilizando HTTP.
+    Las descargas se escriben en un archivo '.part' acompañado de un diario
+    de rangos completados, de modo que una transferencia interrumpida se
+    reanuda desde donde quedó en el siguiente intento o ejecución.
     """
 
-    def __init__(self, download_url_template: str, download_folder: str):
+    def __init__(self, download_url_template: str, download_folder: str,
+                 connections: int = 1, segment_size: int = 8 * 1024 * 1024,
+                 retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 checksum_url_template: Optional[str] = None, require_checksum: bool = False,
+                 digest_algorithms: Tuple[str, ...] = ("sha256",), delta_url_template: Optional[str] = None,
+                 cache: Optional[PackageCache] = None, session: Optional[requests.Session] = None,
+                 rate_limiter: Optional[RateLimiter] = None, mirrors: Optional[MirrorSet] = None,
+                 checksum_from_mirrors: bool = False):
         """
         Inicializa el Downloader con:
         - download_url_template: plantilla de URL donde descargar, e.g., "https://servidor/erp_{version}.zip"
         - download_folder: carpeta local donde guardar el paquete descargado
+        - connections: cantidad de conexiones simultáneas (1 = descarga en un solo flujo)
+        - segment_size: tamaño en bytes de cada rango descargado en modo multi-conexión
+        - retries: cantidad máxima de reintentos ante errores transitorios
+        - backoff_base / backoff_max: espera inicial y máxima (segundos) entre reintentos
+        - checksum_url_template: plantilla de URL del checksum publicado; por defecto '<paquete>.sha256'
+        - require_checksum: rechazar el paquete si el servidor no publica checksum
+        - digest_algorithms: digests calculados durante la descarga (disponibles en last_digests)
+        - delta_url_template: plantilla de URL de paquetes delta, e.g., "https://servidor/erp_{0}_to_{1}.zip"
+        - cache: caché compartida de paquetes; un acierto evita la descarga
+        - session: sesión HTTP a utilizar; por defecto la sesión compartida del proceso
+        - rate_limiter: limitador de ancho de banda compartido por todas las conexiones (None = sin límite)
+        - mirrors: espejos del servidor de descargas; se usa el más rápido y, si falla a mitad
+          de la transferencia, se continúa en el siguiente conservando los bytes ya descargados
+        - checksum_from_mirrors: si la URL de checksum configurada no lo publica, buscarlo en los
+          espejos; el espejo que lo entrega queda excluido de la descarga del paquete
         """
         self.download_url_template = download_url_template
         self.download_folder = download_folder
+        self.connections = max(1, connections)
+        self.segment_size = max(1024 * 1024, segment_size)
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.checksum_url_template = checksum_url_template
+        self.require_checksum = require_checksum
+        self.digest_algorithms = tuple(digest_algorithms)
+        self.delta_url_template = delta_url_template
+        self.cache = cache
+        self.session = session or get_session()
+        self.rate_limiter = rate_limiter
+        self.mirrors = mirrors
+        self.checksum_from_mirrors = checksum_from_mirrors
+        # Espejo del que se obtuvo el checksum en la descarga actual (no puede servir el paquete)
+        self._checksum_mirror: Optional[str] = None
+        self.last_digests: Dict[str, str] = {}
+        # Estadísticas de la última descarga: bytes recibidos, reintentos, aciertos de caché,
+        # segundos dedicados a completar y verificar los digests y segundos de espera impuestos
+        # por el límite de ancho de banda
+        self.last_stats: Dict[str, float] = {}
+        self._stats_lock = threading.Lock()
 
-    def download_package(self, version: str) -> str:
+    def download_package(self, version: str, expected_digests: Optional[Dict[str, str]] = None) -> str:
         """
         Descarga el paquete de actualización correspondiente a una versión específica.
+        - Reanuda una descarga parcial previa si el recurso remoto no cambió.
+        - Si hay más de una conexión configurada y el servidor acepta rangos HTTP,
+          el archivo se divide en segmentos que se descargan en paralelo.
+        - Reintenta los errores transitorios con backoff exponencial y jitter.
+        - Calcula los digests mientras escribe y los compara contra expected_digests
+          (p. ej. del manifiesto de versión) o, si no se indican, contra el checksum
+          publicado junto al paquete. Un paquete que no coincide se descarta.
         Retorna la ruta local del archivo descargado o una cadena vacía si falla.
         """
+        # Construir URL final reemplazando {0} por el número de versión
+        download_url = self.download_url_template.format(version)
+
+        if self.checksum_url_template:
+            checksum_url = self.checksum_url_template.format(version)
+        else:
+            checksum_url = download_url + ".sha256"
+
+        return self._download(download_url, checksum_url, expected_digests, version)
+
+    def stream_package(self, version: str, handler: Callable[[BinaryIO], bool],
+                       expected_digests: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Descarga el paquete como flujo y lo entrega a 'handler' sin escribirlo a disco
+        (p. ej. para instalarlo directamente). Los digests se calculan sobre los bytes
+        leídos y se verifican al final, por lo que quien consuma el flujo no debe
+        aplicar cambios definitivos hasta que este método retorne True.
+        No admite reanudación ni caché: ante un fallo conviene usar download_package().
+        """
+        download_url = self.download_url_template.format(version)
+        if self.checksum_url_template:
+            checksum_url = self.checksum_url_template.format(version)
+        else:
+            checksum_url = download_url + ".sha256"
+
+        self._reset_stats()
         try:
-            # Construir URL final reemplazando {0} por el número de versión
-            download_url = self.download_url_template.format(version)
+            if expected_digests is None:
+                expected_digests = self._fetch_published_checksum(checksum_url)
+            if not expected_digests and self.require_checksum:
+                logger.warning("El servidor no publica checksum del paquete y es obligatorio. Abortando.")
+                return False
+
+            logger.info(f"Descargando en modo flujo desde: {download_url}")
+            digest = InlineDigest(sorted(set(self.digest_algorithms) | set(expected_digests)))
+            with self.session.get(download_url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                reader = _DigestReader(response.raw, digest, self._throttle if self.rate_limiter else None)
+                if not handler(reader):
+                    return False
+                # Consumir el resto (directorio central) para que el digest cubra el paquete completo
+                while reader.read(CHUNK_SIZE):
+                    pass
+                self._count("bytes", reader.position)
+
+            self.last_digests = digest.hexdigests()
+            for algorithm, expected in expected_digests.items():
+                if self.last_digests[algorithm] != expected.lower():
+                    logger.warning(f"Checksum {algorithm} no coincide (esperado {expected}, "
+                                   f"obtenido {self.last_digests[algorithm]}). Paquete rechazado.")
+                    return False
+
+            logger.info("Descarga en modo flujo completada y verificada.")
+            return True
 
+        except requests.RequestException as e:
+            logger.error(f"Error de red durante la descarga en modo flujo: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Error inesperado durante la descarga en modo flujo: {e}")
+            return False
+
+    def download_delta(self, from_version: str, to_version: str) -> str:
+        """
+        Descarga el paquete delta que lleva de 'from_version' a 'to_version'.
+        Retorna cadena vacía si no hay plantilla de delta configurada o el servidor no lo ofrece.
+        """
+        if not self.delta_url_template:
+            return ""
+
+        download_url = self.delta_url_template.format(from_version, to_version)
+        return self._download(download_url, download_url + ".sha256", None, f"{from_version}->{to_version}")
+
+    def download_url(self, download_url: str, expected_digests: Optional[Dict[str, str]] = None,
+                     label: str = "", filename: Optional[str] = None) -> str:
+        """
+        Descarga un paquete desde una URL completa (p. ej. un componente del manifiesto
+        de componentes) con la misma reanudación, reintentos, caché y verificación que
+        download_package(). Sin expected_digests se usa el checksum publicado '<url>.sha256'.
+        - filename: nombre local del archivo (por defecto, el último tramo de la URL); las
+          descargas simultáneas deben usar nombres distintos porque de él salen el .part y el diario.
+        """
+        return self._download(download_url, download_url + ".sha256", expected_digests, label, filename)
+
+    def _reset_stats(self) -> None:
+        self._checksum_mirror = None
+        self.last_stats = {"bytes": 0, "retries": 0, "cache_hits": 0, "hash_seconds": 0.0, "throttled_seconds": 0.0,
+                           "failovers": 0}
+
+    def _count(self, key: str, value: float) -> None:
+        with self._stats_lock:
+            self.last_stats[key] = self.last_stats.get(key, 0) + value
+
+    def _throttle(self, amount: int) -> None:
+        """
+        Espera lo que indique el limitador de ancho de banda antes de seguir leyendo.
+        """
+        if self.rate_limiter:
+            self._count("throttled_seconds", self.rate_limiter.throttle(amount))
+
+    def _log_throughput(self, seconds: float) -> None:
+        stats = self.last_stats
+        if not seconds or not stats.get("bytes"):
+            return
+        message = (f"{stats['bytes'] / (1024 * 1024):.1f} MiB en {seconds:.1f} s "
+                   f"({stats['bytes'] / seconds / (1024 * 1024):.2f} MiB/s")
+        if self.rate_limiter and stats.get("throttled_seconds"):
+            message += f", {stats['throttled_seconds']:.1f} s de espera por el límite de ancho de banda"
+        logger.info(f"Caudal efectivo de la descarga: {message}).")
+
+    def _download(self, download_url: str, checksum_url: str,
+                  expected_digests: Optional[Dict[str, str]], version: str = "",
+                  filename: Optional[str] = None) -> str:
+        """
+        Descarga una URL a la carpeta de descarga aplicando reanudación, reintentos y verificación.
+        Si hay caché configurada, primero se consulta por URL o hash y, tras una descarga
+        verificada, el paquete se agrega a ella.
+        Retorna la ruta local del archivo descargado o una cadena vacía si falla.
+        """
+        self._reset_stats()
+        try:
             # Extraer el nombre de archivo de la URL
-            filename = download_url.split("/")[-1]
+            filename = filename or download_url.split("/")[-1]
 
             # Construir la ruta de destino completa
             destination = os.path.join(self.download_folder, filename)
-
-            print(f"[Downloader] Descargando desde: {download_url}")
-            print(f"[Downloader] Guardando en: {destination}")
+            part_path = destination + ".part"
 
             # Verificar que la carpeta de descarga exista
             os.makedirs(self.download_folder, exist_ok=True)
 
-            # Iniciar descarga segura con requests
-            with requests.get(download_url, stream=True, timeout=30) as response:
-                response.raise_for_status()  # Lanzar excepción si respuesta HTTP no es 2xx
+            # El checksum se obtiene antes de consultar la caché: un acierto se busca por ese
+            # hash, así un paquete recompilado bajo la misma URL no reutiliza la copia anterior
+            if expected_digests is None:
+                expected_digests = self._fetch_published_checksum(checksum_url)
+            if not expected_digests and self.require_checksum:
+                logger.warning("El servidor no publica checksum del paquete y es obligatorio. Abortando.")
+                return ""
 
-                with open(destination, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+            if self.cache and self._fetch_cached(download_url, destination, expected_digests):
+                return destination
 
-            print("[Downloader] Descarga completada exitosamente.")
+            logger.info(f"Descargando desde: {download_url}")
+            logger.info(f"Guardando en: {destination}")
+            started = time.monotonic()
+
+            journal = TransferJournal.load(part_path + ".json")
+            algorithms = set(self.digest_algorithms) | set(expected_digests)
+            if self.cache:
+                algorithms.add("sha256")
+            digest = InlineDigest(sorted(algorithms))
+            self._transfer_with_failover(download_url, part_path, journal, digest, bool(expected_digests))
+
+            self.last_digests = digest.hexdigests()
+            for algorithm, expected in expected_digests.items():
+                if self.last_digests[algorithm] != expected.lower():
+                    logger.warning(f"Checksum {algorithm} no coincide (esperado {expected}, "
+                                   f"obtenido {self.last_digests[algorithm]}). Paquete rechazado.")
+                    os.remove(part_path)
+                    journal.delete()
+                    return ""
+            if expected_digests:
+                logger.info("Integridad del paquete verificada.")
+
+            os.replace(part_path, destination)
+            journal.delete()
+            self._log_throughput(time.monotonic() - started)
+
+            if self.cache:
+                self.cache.store(download_url, destination, self.last_digests["sha256"], version)
+
+            logger.info("Descarga completada exitosamente.")
             return destination
 
         except requests.HTTPError as e:
-            print(f"[Downloader] Error HTTP durante descarga: {e}")
+            logger.error(f"Error HTTP durante descarga: {e}")
             return ""
         except requests.ConnectionError as e:
-            print(f"[Downloader] Error de conexión al servidor: {e}")
+            logger.error(f"Error de conexión al servidor: {e}")
             return ""
         except requests.Timeout as e:
-            print(f"[Downloader] Tiempo de espera agotado durante descarga: {e}")
+            logger.error(f"Tiempo de espera agotado durante descarga: {e}")
             return ""
         except Exception as e:
-            print(f"[Downloader] Error inesperado durante descarga: {e}")
+            logger.error(f"Error inesperado durante descarga: {e}")
             return ""
 
+    def _fetch_cached(self, download_url: str, destination: str, expected_digests: Dict[str, str]) -> bool:
+        """
+        Deja el paquete de la caché en 'destination' si está y coincide con los digests
+        esperados (la caché ya comprueba el SHA-256 de su copia).
+        """
+        cached_sha256 = self.cache.fetch(download_url, destination, (expected_digests.get("sha256") or "").lower())
+        if not cached_sha256:
+            return False
+
+        others = sorted(algorithm for algorithm in expected_digests if algorithm != "sha256")
+        digests = calculate_hashes(destination, others) if others else {}
+        for algorithm in others:
+            if digests.get(algorithm) != expected_digests[algorithm].lower():
+                logger.warning(f"El paquete en caché no coincide con el checksum {algorithm} publicado; "
+                               f"se descarga de nuevo.")
+                os.remove(destination)
+                return False
+
+        self.last_digests = dict(digests, sha256=cached_sha256)
+        self._count("cache_hits", 1)
+        logger.info(f"Paquete obtenido de la caché: {destination}")
+        return True
+
+    def _transfer_with_failover(self, download_url: str, part_path: str, journal: TransferJournal,
+                                digest: InlineDigest, verified: bool) -> None:
+        """
+        Ejecuta la transferencia reintentando los errores transitorios con backoff.
+        Con espejos, ante cualquier error se pasa de inmediato al siguiente espejo
+        (del más rápido al más lento) y la espera solo se aplica tras fallar todos.
+        El diario se identifica por la URL principal, de modo que el siguiente espejo
+        continúa desde los bytes ya descargados.
+        """
+        candidates = self.mirrors.candidates(download_url) if self.mirrors else [download_url]
+        if self._checksum_mirror:
+            candidates = [url for url in candidates if mirror_base(url) != self._checksum_mirror]
+            if not candidates:
+                raise IOError("Solo el espejo que publicó el checksum ofrece el paquete; no se descarga de él.")
+        attempt, position, failed = 0, 0, set()
+        while True:
+            url = candidates[position]
+            started, received = time.monotonic(), self.last_stats.get("bytes", 0)
+            try:
+                self._transfer(url, part_path, journal, digest, download_url, verified)
+                if self.mirrors:
+                    self.mirrors.record_success(url, self.last_stats.get("bytes", 0) - received,
+                                                time.monotonic() - started)
+                return
+            except Exception as e:
+                failed.add(position)
+                if self.mirrors:
+                    self.mirrors.record_failure(url)
+                remaining = [index for index in range(len(candidates)) if index not in failed]
+                if remaining:
+                    position = remaining[0]
+                    self._count("failovers", 1)
+                    logger.warning(f"Error descargando desde {mirror_base(url)} ({e}). Se continúa desde "
+                                   f"{mirror_base(candidates[position])}; {journal.completed_bytes()} bytes "
+                                   f"ya descargados.")
+                    continue
+                if attempt >= self.retries or not self._is_retryable(e):
+                    raise
+                attempt += 1
+                self._count("retries", 1)
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Error transitorio ({e}). Reintento {attempt}/{self.retries} "
+                               f"en {delay:.1f} s; {journal.completed_bytes()} bytes ya descargados.")
+                time.sleep(delay)
+                position, failed = 0, set()
+
+    def _fetch_published_checksum(self, checksum_url: str) -> Dict[str, str]:
+        """
+        Obtiene el SHA-256 publicado junto al paquete (formato 'sha256sum': '<hex>  <archivo>').
+        Siempre se consulta primero la URL configurada; los espejos solo se usan con
+        checksum_from_mirrors y el que lo entrega ya no podrá servir el paquete.
+        Retorna un diccionario vacío si no se publica.
+        """
+        urls = [checksum_url]
+        if self.mirrors and self.checksum_from_mirrors:
+            urls += [url for url in self.mirrors.urls_for(checksum_url) if url != checksum_url]
+        for url in urls:
+            try:
+                if is_local(url):
+                    with open(local_path(url), 'r', encoding='utf-8') as f:
+                        text = f.read().strip()
+                else:
+                    response = self.session.get(url, timeout=10)
+                    if response.status_code == 404:
+                        logger.warning(f"No hay checksum publicado en: {url}")
+                        continue
+                    response.raise_for_status()
+                    text = response.text.strip()
+            except FileNotFoundError:
+                logger.warning(f"No hay checksum publicado en: {url}")
+                continue
+            except (requests.RequestException, OSError) as e:
+                logger.warning(f"No se pudo obtener el checksum publicado: {e}")
+                continue
+
+            value = text.split()[0].lower() if text else ""
+            if len(value) != 64 or any(c not in "0123456789abcdef" for c in value):
+                logger.warning(f"Checksum publicado con formato inválido en: {url}")
+                continue
+            if url != checksum_url:
+                self._checksum_mirror = mirror_base(url)
+                logger.warning(f"Checksum obtenido del espejo {self._checksum_mirror}; "
+                               f"el paquete se descargará de otra fuente.")
+            return {"sha256": value}
+        return {}
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """
+        Espera exponencial con jitter: entre la mitad y el total del valor exponencial.
+        """
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """
+        Los errores de red, timeouts, respuestas 5xx/429 y transferencias incompletas se reintentan;
+        los errores de cliente (404, 403, ...) no.
+        """
+        if isinstance(error, requests.HTTPError):
+            status = error.response.status_code if error.response is not None else 0
+            return status >= 500 or status == 429
+        if isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              requests.exceptions.ChunkedEncodingError)):
+            return True
+        if isinstance(error, requests.RequestException):
+            return False
+        return isinstance(error, IOError)
+
+    def _probe(self, url: str) -> RemoteFile:
+        """
+        Consulta las cabeceras del paquete (HEAD): tamaño, soporte de rangos y validador.
+        Si el servidor no admite HEAD se retorna un RemoteFile vacío (descarga sin reanudación).
+        Un espejo local siempre admite rangos; su validador es la fecha de modificación.
+        """
+        if is_local(url):
+            stat = os.stat(local_path(url))
+            return RemoteFile(size=stat.st_size, accept_ranges=True, last_modified=str(stat.st_mtime_ns))
+
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=10)
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code in (405, 501):
+                return RemoteFile()
+            raise
+
+        try:
+            size = int(response.headers.get("Content-Length", "")) or None
+        except ValueError:
+            size = None
+        return RemoteFile(
+            size=size,
+            accept_ranges=response.headers.get("Accept-Ranges", "").lower() == "bytes",
+            etag=response.headers.get("ETag", ""),
+            last_modified=response.headers.get("Last-Modified", ""),
+        )
+
+    def _transfer(self, url: str, part_path: str, journal: TransferJournal, digest: InlineDigest,
+                  key: Optional[str] = None, verified: bool = False) -> None:
+        """
+        Realiza (o continúa) la transferencia hacia el archivo '.part'.
+        - key: identidad del paquete en el diario (la URL principal si 'url' es un espejo).
+        - verified: el resultado se comprobará contra un digest conocido, por lo que los
+          bytes descargados de otro espejo se conservan aunque su validador sea distinto.
+        Al terminar, el digest queda calculado sobre el archivo completo.
+        """
+        key = key or url
+        remote = self._probe(url)
+        resumable = remote.accept_ranges and remote.size is not None and bool(remote.validator)
+
+        if not resumable:
+            logger.warning("El servidor no permite reanudar, se usará una sola conexión.")
+            journal.reset(key, remote.size, remote.etag, remote.last_modified)
+            digest.reset()
+            self._download_stream(url, part_path, journal, digest)
+            return
+
+        same_package = journal.matches(key, remote.size, remote.etag, remote.last_modified)
+        if not same_package and verified and journal.url == key and journal.size == remote.size:
+            journal.rebind(remote.etag, remote.last_modified)
+            same_package = True
+        if os.path.exists(part_path) and same_package:
+            if journal.completed_bytes():
+                logger.info(f"Reanudando descarga: {journal.completed_bytes()} de {remote.size} bytes ya presentes.")
+        else:
+            journal.reset(key, remote.size, remote.etag, remote.last_modified)
+            digest.reset()
+            with open(part_path, 'wb'):
+                pass
+
+        # Preasignar el archivo destino con el tamaño final
+        if os.path.getsize(part_path) != remote.size:
+            with open(part_path, 'r+b') as f:
+                f.truncate(remote.size)
+
+        pieces = []
+        for start, end in journal.missing():
+            if self.connections > 1:
+                pieces.extend((s, min(s + self.segment_size, end)) for s in range(start, end, self.segment_size))
+            else:
+                pieces.append((start, end))
+
+        self._catch_up(digest, part_path, journal.prefix_end())
+        if self.connections == 1 or len(pieces) <= 1:
+            for start, end in pieces:
+                digest.catch_up(part_path, start)
+                self._download_range(url, part_path, start, end, remote.validator, journal, digest)
+        else:
+            self._download_segmented(url, part_path, pieces, remote.validator, journal, digest)
+
+        # Completar el digest con los bytes que no pudieron procesarse en orden
+        self._catch_up(digest, part_path, remote.size)
+
+    def _catch_up(self, digest: InlineDigest, part_path: str, end: int) -> None:
+        """
+        Avanza el digest leyendo del disco, contabilizando el tiempo como tiempo de hash.
+        """
+        started = time.perf_counter()
+        digest.catch_up(part_path, end)
+        self._count("hash_seconds", time.perf_counter() - started)
+
+    def _download_stream(self, url: str, destination: str, journal: TransferJournal,
+                         digest: InlineDigest) -> None:
+        """
+        Descarga el archivo completo en un único flujo HTTP.
+        """
+        with self.session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()  # Lanzar excepción si respuesta HTTP no es 2xx
+
+            written = 0
+            with open(destination, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        self._throttle(len(chunk))
+                        f.write(chunk)
+                        digest.feed(written, chunk)
+                        written += len(chunk)
+
+        self._count("bytes", written)
+        if journal.size is not None and written != journal.size:
+            raise IOError(f"Descarga incompleta: {written} de {journal.size} bytes recibidos")
+
+    def _download_segmented(self, url: str, destination: str, pieces: List[Tuple[int, int]],
+                            validator: str, journal: TransferJournal, digest: InlineDigest) -> None:
+        """
+        Descarga los segmentos pendientes de forma concurrente sobre el archivo preasignado.
+        Si un segmento falla se cancelan los demás y se propaga la excepción;
+        lo ya descargado queda registrado en el diario.
+        A medida que se completan segmentos, el digest avanza sobre el prefijo contiguo ya escrito.
+        """
+        logger.info(f"Descarga segmentada: {len(pieces)} segmentos, "
+                    f"{min(self.connections, len(pieces))} conexiones.")
+
+        abort = threading.Event()
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            futures = [executor.submit(self._download_range, url, destination, start, end,
+                                       validator, journal, digest, abort)
+                       for start, end in pieces]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    digest.catch_up(destination, journal.prefix_end())
+            except BaseException:
+                abort.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+    @contextmanager
+    def _range_chunks(self, url: str, start: int, end: int, validator: str) -> Iterator[Iterator[bytes]]:
+        """
+        Bloques del rango [start, end) del paquete, desde HTTP o desde un espejo local.
+        """
+        if is_local(url):
+            with open(local_path(url), 'rb') as source:
+                source.seek(start)
+                yield iter(lambda: source.read(min(CHUNK_SIZE, end - source.tell())), b"")
+            return
+
+        headers = {"Range": f"bytes={start}-{end - 1}", "If-Range": validator}
+        with self.session.get(url, headers=headers, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"El paquete remoto cambió o el servidor ignoró el rango {start}-{end - 1}")
+            yield response.iter_content(chunk_size=CHUNK_SIZE)
+
+    def _download_range(self, url: str, destination: str, start: int, end: int, validator: str,
+                        journal: TransferJournal, digest: InlineDigest,
+                        abort: Optional[threading.Event] = None) -> None:
+        """
+        Descarga el rango [start, end) y lo escribe en su posición dentro del archivo destino.
+        El progreso se registra en el diario cada JOURNAL_INTERVAL bytes.
+        """
+        if abort and abort.is_set():
+            return
+
+        position = recorded = start
+        try:
+            with self._range_chunks(url, start, end, validator) as chunks:
+                with open(destination, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in chunks:
+                        if abort and abort.is_set():
+                            break
+                        if chunk:
+                            chunk = chunk[:end - position]
+                            self._throttle(len(chunk))
+                            f.write(chunk)
+                            digest.feed(position, chunk)
+                            position += len(chunk)
+                            if position - recorded >= JOURNAL_INTERVAL:
+                                f.flush()
+                                journal.add_range(recorded, position)
+                                journal.save()
+                                recorded = position
+                        if position >= end:
+                            break
+        finally:
+            self._count("bytes", position - start)
+            if position > recorded:
+                journal.add_range(recorded, position)
+                journal.save()
+
+        if position < end and not (abort and abort.is_set()):
+            raise IOError(f"Segmento incompleto {start}-{end - 1}: {position - start} bytes recibidos")
+
 
 if __name__ == "__main__":
     # Simulación manual de descarga para pruebas locales
@@ -0,0 +1,181 @@
+# core/fleet.py
+
+import os
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from core.agent import UpdateAgent, UpdateResult
+from core.validator import Validator, validate_settings
+from lib.logger import get_logger
+
+if TYPE_CHECKING:
+    from lib.ratelimit import RateLimiter
+
+logger = get_logger("Fleet")
+
+# Claves de configuración que solo tienen efecto a nivel de proceso
+RATE_KEYS = {"download_rate_limit", "download_rate_profiles"}
+
+
+class SharedDownloads:
+    """
+    Coordina las descargas del modo flota: cada paquete (identificado por su URL)
+    se descarga una sola vez y el resto de los destinos espera el mismo resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+
+    def fetch(self, key: str, download: Callable[[], str]) -> str:
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+
+        if not owner:
+            logger.info(f"Reutilizando descarga compartida: {key}")
+            return future.result()
+
+        try:
+            result = download()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+
+class FleetRunner:
+    """
+    Actualiza varios destinos de despliegue en paralelo desde un único proceso.
+    - Los destinos se leen de varios archivos de configuración o de una sección 'targets'.
+    - Validación, verificación de versión, respaldo e instalación corren en un pool acotado.
+    - Cada versión de paquete se descarga una sola vez.
+    - Los fallos de un destino no afectan a los demás.
+    - Todos los destinos comparten el limitador de ancho de banda del proceso.
+    """
+
+    def __init__(self, config_paths: List[str], logger, workers: int = 4,
+                 rate_limiter: Optional["RateLimiter"] = None):
+        """
+        Inicializa la flota con:
+        - config_paths: archivos de configuración (simples o con sección 'targets').
+        - logger: logger compartido por todos los destinos.
+        - workers: cantidad máxima de destinos procesados a la vez.
+        - rate_limiter: limitador del proceso, compartido por todos los destinos (None = sin límite).
+        """
+        self.config_paths = config_paths
+        self.logger = logger
+        self.workers = max(1, workers)
+        self.downloads = SharedDownloads()
+        self.rate_limiter = rate_limiter
+
+    def load_targets(self) -> Tuple[List[Tuple[str, Validator]], List[UpdateResult]]:
+        """
+        Construye la lista de destinos. Un archivo con sección 'targets' aporta un destino
+        por entrada, combinando sus valores con el resto de claves del archivo (valores por defecto).
+        Retorna los destinos cargados y los resultados fallidos de los que no pudieron cargarse.
+        """
+        targets: List[Tuple[str, Validator]] = []
+        failures: List[UpdateResult] = []
+
+        for path in self.config_paths:
+            base_name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+
+                if "targets" not in data:
+                    validator = Validator(path)
+                    validator.settings = validate_settings(data)
+                    targets.append((base_name, validator))
+                    continue
+
+                defaults = {key: value for key, value in data.items() if key != "targets"}
+                for index, entry in enumerate(data["targets"]):
+                    name = entry.get("name") or f"{base_name}#{index}"
+                    if RATE_KEYS & entry.keys():
+                        logger.warning(f"[{name}] El límite de ancho de banda es del proceso; "
+                                       f"se ignora el del destino.")
+                    validator = Validator(path)
+                    validator.settings = validate_settings(dict(defaults, **entry))
+                    targets.append((name, validator))
+
+            except Exception as e:
+                logger.error(f"Error cargando destinos desde {path}: {e}")
+                failures.append(UpdateResult(base_name, UpdateResult.FAILED, message=f"Configuración inválida: {e}"))
+
+        # Dos destinos sobre la misma carpeta no pueden actualizarse a la vez
+        seen: Dict[str, str] = {}
+        unique = []
+        for name, validator in targets:
+            folder = os.path.normcase(os.path.abspath(validator.settings.deploy_folder))
+            if folder in seen:
+                failures.append(UpdateResult(name, UpdateResult.FAILED,
+                                             message=f"Carpeta de despliegue duplicada con '{seen[folder]}'"))
+                continue
+            seen[folder] = name
+            unique.append((name, validator))
+
+        return unique, failures
+
+    def _run_target(self, name: str, validator: Validator) -> UpdateResult:
+        started = time.monotonic()
+        try:
+            if not validator.validate_environment():
+                reasons = "; ".join(f"{check.name}: {check.reason}" for check in validator.preflight if not check.ok)
+                return UpdateResult(name, UpdateResult.FAILED,
+                                    message=f"Falló la validación del entorno{': ' + reasons if reasons else ''}",
+                                    elapsed=time.monotonic() - started)
+            agent = UpdateAgent(validator.settings, self.logger, notifier=None, name=name,
+                                package_provider=self.downloads.fetch, rate_limiter=self.rate_limiter)
+            return agent.run()
+        except Exception as e:
+            self.logger.exception(f"[{name}] Error inesperado en modo flota: {e}")
+            return UpdateResult(name, UpdateResult.FAILED, message=str(e), elapsed=time.monotonic() - started)
+
+    def run(self) -> List[UpdateResult]:
+        """
+        Ejecuta la actualización de todos los destinos y retorna un resultado por destino.
+        """
+        targets, results = self.load_targets()
+        logger.info(f"Actualizando {len(targets)} destinos con {self.workers} workers...")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._run_target, name, validator) for name, validator in targets]
+            results.extend(future.result() for future in futures)
+
+        return results
+
+    @staticmethod
+    def summary(results: List[UpdateResult], report_path: Optional[str] = None) -> Dict:
+        """
+        Genera (y opcionalmente guarda en JSON) el resumen de la ejecución de la flota.
+        """
+        report = {
+            "total": len(results),
+            "updated": sum(1 for r in results if r.status == UpdateResult.UPDATED),
+            "up_to_date": sum(1 for r in results if r.status == UpdateResult.UP_TO_DATE),
+            "failed": sum(1 for r in results if r.status == UpdateResult.FAILED),
+            "targets": [r.to_dict() for r in results],
+        }
+
+        logger.info(f"Resumen: {report['updated']} actualizados, {report['up_to_date']} sin cambios, "
+                    f"{report['failed']} fallidos de {report['total']} destinos.")
+        for result in results:
+            logger.info(f"  {result.target:<30} {result.status:<11} {result.version:<12} "
+                        f"{result.elapsed:8.1f}s  {result.message}")
+
+        if report_path:
+            os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            logger.info(f"Informe guardado en: {report_path}")
+
+        return report
@@ -2,86 +2,765 @@
 
 import os
 import shutil
+import hashlib
+import tempfile
+import threading
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from core.manifest import (
+    Manifest, INSTALLED_MANIFEST_NAME, PACKAGE_MANIFEST_NAME, PROTECTED_FOLDER,
+    normalize_path, is_protected, is_safe_path
+)
+from core.snapshots import SnapshotStore
+from core.delta import DeltaPackage, DeltaError
+from lib.utils import calculate_sha256
+from lib.archive import FORMAT_ZIP, ArchiveError, detect_file_format, iter_package_stream
+from lib.zipstream import ZipStreamError
+from lib.logger import get_logger
+
+logger = get_logger("Installer")
+
+# Tamaño máximo que un archivo se mantiene en memoria al instalar desde un flujo
+STREAM_SPOOL_SIZE = 16 * 1024 * 1024
+
+# Sufijos de las carpetas hermanas usadas en la instalación con intercambio de directorio
+STAGING_SUFFIX = ".staging"
+PREVIOUS_SUFFIX = ".previous"
+ROLLBACK_SUFFIX = ".rollback"
+
+# Archivos sin cambios que se enlazan (hardlink) en la preparación en lugar de copiarse.
+# Un enlace comparte inodo con '<deploy>.previous': una escritura en el sitio sobre la
+# versión nueva modificaría también la copia de vuelta atrás. Solo se enlazan binarios
+# y recursos que el ERP reemplaza pero nunca edita; el resto (configuración, plantillas,
+# bases de datos locales) se copia.
+LINKABLE_SUFFIXES = (
+    ".exe", ".dll", ".so", ".dylib", ".pyd", ".bpl", ".ocx", ".jar", ".class", ".pyc",
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".ttf", ".otf", ".woff", ".woff2", ".chm", ".pdf",
+)
+
+
+class StagedInstall:
+    """
+    Instalación preparada desde un flujo: los archivos nuevos o modificados ya están
+    escritos como temporales junto a su destino y solo falta confirmarlos.
+    """
+
+    def __init__(self, manifest: Manifest, pending: List[Tuple[str, str]], to_delete: List[str]):
+        self.manifest = manifest
+        self.pending = pending
+        self.to_delete = to_delete
 
 
 class Installer:
     """
     Clase encargada de aplicar el paquete de actualización del ERP:
-    - Realiza un respaldo (backup) de la versión actual.
-    - Instala la nueva versión extraída desde un archivo comprimido.
+    - Realiza un respaldo (snapshot deduplicado) de la versión actual.
+    - Instala la nueva versión extraída desde un archivo comprimido (ZIP, o tar con
+      zstd, xz o gzip), escribiendo solo los archivos que cambiaron.
     - Actualiza el archivo de versión local.
     - Protege la carpeta 'Data' para preservar la base de datos del cliente.
+    - Opcionalmente construye la nueva versión en una carpeta hermana y la activa
+      intercambiando directorios, de modo que el ERP solo queda detenido durante
+      los renombrados.
     """
 
-    def __init__(self, deploy_folder: str, version_file: str):
+    def __init__(self, deploy_folder: str, version_file: str, workers: int = 4, swap: bool = False):
         """
         Inicializa el instalador con:
         - deploy_folder: carpeta donde se encuentra el ERP instalado.
         - version_file: archivo donde se guarda la versión instalada.
+        - workers: hilos usados para descomprimir los miembros del paquete en paralelo.
+        - swap: construir la nueva versión en '<deploy>.staging' e intercambiarla con la
+          instalación en vivo, en lugar de escribir sobre ella.
         """
         self.deploy_folder = deploy_folder
         self.version_file = version_file
+        self.workers = max(1, workers)
+        self.swap = swap
+        # Indica si alguna operación llegó a modificar la instalación en vivo
+        self.partially_applied = False
+        # Estadísticas de la última instalación (archivos escritos, omitidos, eliminados...)
+        self.last_stats: Dict[str, float] = {}
 
-    def backup_current_version(self, backup_folder: str) -> bool:
+    @property
+    def staging_folder(self) -> str:
+        return os.path.normpath(self.deploy_folder) + STAGING_SUFFIX
+
+    @property
+    def previous_folder(self) -> str:
+        return os.path.normpath(self.deploy_folder) + PREVIOUS_SUFFIX
+
+    def backup_current_version(self, backup_folder: str, retention: int = 3) -> Optional[str]:
         """
-        Realiza una copia de respaldo de la instalación actual.
-        Elimina cualquier backup previo existente.
-        Retorna True si el backup fue exitoso, False en caso de error.
+        Realiza un snapshot deduplicado de la instalación actual en el almacén de respaldos.
+        Solo se copian los archivos que cambiaron desde el snapshot anterior y se conservan
+        las últimas 'retention' generaciones.
+        Un respaldo completo heredado (copia plana de versiones anteriores) se elimina.
+        Retorna el identificador del snapshot, o None en caso de error.
         """
         try:
             if not os.path.exists(self.deploy_folder):
-                print(f"[Installer] Carpeta de despliegue no encontrada: {self.deploy_folder}")
-                return False
+                logger.error(f"Carpeta de despliegue no encontrada: {self.deploy_folder}")
+                return None
 
-            if os.path.exists(backup_folder):
-                print(f"[Installer] Eliminando respaldo anterior: {backup_folder}")
+            if os.path.exists(backup_folder) and not SnapshotStore.is_store(backup_folder):
+                logger.info(f"Eliminando respaldo anterior: {backup_folder}")
                 shutil.rmtree(backup_folder)
 
-            shutil.copytree(self.deploy_folder, backup_folder)
-            print(f"[Installer] Respaldo realizado exitosamente en: {backup_folder}")
-            return True
+            store = SnapshotStore(backup_folder, retention)
+            snapshot_id = store.create(self.deploy_folder, self._read_version())
+            if snapshot_id:
+                logger.info(f"Respaldo realizado exitosamente en: {backup_folder} ({snapshot_id})")
+            return snapshot_id
+
+        except Exception as e:
+            logger.error(f"Error durante el respaldo: {e}")
+            return None
+
+    def restore_snapshot(self, backup_folder: str, snapshot_id: str) -> bool:
+        """
+        Restaura un snapshot del almacén de respaldos sobre la carpeta de despliegue
+        y vuelve a escribir el archivo de versión correspondiente.
+        """
+        store = SnapshotStore(backup_folder)
+        self._discard_previous()
+        if not store.restore(snapshot_id, self.deploy_folder):
+            return False
+
+        version = store.get_version(snapshot_id)
+        if version:
+            self._write_version(version)
+        logger.info(f"Snapshot {snapshot_id} restaurado (versión {version or 'desconocida'}).")
+        return True
+
+    def rollback(self, backup_folder: str, snapshot_id: Optional[str] = None) -> bool:
+        """
+        Vuelve a la versión anterior a la última actualización:
+        - Si existe '<deploy>.previous' (instalación por intercambio), se reactiva
+          renombrando directorios; el tiempo no depende del tamaño de la instalación.
+        - En otro caso se restaura el snapshot indicado o, por defecto, el más reciente
+          con una versión distinta de la instalada (solo se reescriben los archivos que difieren).
+        En ambos casos se restaura también el archivo de versión.
+        """
+        try:
+            if snapshot_id is None and os.path.isdir(self.previous_folder):
+                return self._swap_back(backup_folder)
+
+            if snapshot_id is None:
+                current = self._read_version()
+                candidates = [snapshot for snapshot in SnapshotStore(backup_folder).list_snapshots()
+                              if snapshot["version"] != current]
+                if not candidates:
+                    logger.warning(f"No hay una versión anterior disponible para volver atrás.")
+                    return False
+                snapshot_id = candidates[-1]["id"]
+
+            logger.info(f"Volviendo atrás mediante el snapshot: {snapshot_id}")
+            return self.restore_snapshot(backup_folder, snapshot_id)
 
         except Exception as e:
-            print(f"[Installer] Error durante el respaldo: {e}")
+            logger.error(f"Error inesperado volviendo a la versión anterior: {e}")
+            return False
+
+    def _previous_version(self, backup_folder: Optional[str]) -> str:
+        """
+        Versión de '<deploy>.previous': la de su manifiesto instalado, la de su propio
+        archivo de versión (si este vive dentro de la carpeta de despliegue) o, en último
+        caso, la del snapshot más reciente con una versión distinta de la instalada.
+        """
+        manifest = Manifest.load(os.path.join(self.previous_folder, INSTALLED_MANIFEST_NAME))
+        if manifest and manifest.version:
+            return manifest.version
+
+        if self.version_file:
+            relative = os.path.relpath(os.path.abspath(self.version_file), os.path.abspath(self.deploy_folder))
+            if not relative.startswith(os.pardir):
+                try:
+                    with open(os.path.join(self.previous_folder, relative), 'r', encoding='utf-8') as f:
+                        version = f.read().strip()
+                    if version:
+                        return version
+                except OSError:
+                    pass
+
+        if backup_folder and os.path.isdir(backup_folder):
+            current = self._read_version()
+            versions = [snapshot["version"] for snapshot in SnapshotStore(backup_folder).list_snapshots()
+                        if snapshot["version"] and snapshot["version"] != current]
+            if versions:
+                return versions[-1]
+        return ""
+
+    def _swap_back(self, backup_folder: Optional[str] = None) -> bool:
+        """
+        Reactiva '<deploy>.previous' como instalación en vivo trasladando 'Data' por
+        renombrado. La versión deshecha se elimina una vez completado el intercambio.
+        """
+        live, previous = self.deploy_folder, self.previous_folder
+        discarded = os.path.normpath(live) + ROLLBACK_SUFFIX
+        version = self._previous_version(backup_folder)
+
+        if os.path.exists(discarded):
+            shutil.rmtree(discarded)
+
+        live_data = os.path.join(live, PROTECTED_FOLDER)
+        previous_data = os.path.join(previous, PROTECTED_FOLDER)
+        has_data = os.path.isdir(live_data)
+        if has_data and os.path.exists(previous_data):
+            logger.error(f"La versión anterior contiene una carpeta '{PROTECTED_FOLDER}'; "
+                         f"no se puede volver atrás por intercambio.")
             return False
 
+        if has_data:
+            os.rename(live_data, previous_data)
+        try:
+            if os.path.exists(live):
+                os.rename(live, discarded)
+        except OSError:
+            if has_data:
+                os.rename(previous_data, live_data)
+            raise
+
+        try:
+            os.rename(previous, live)
+        except OSError:
+            os.rename(discarded, live)
+            if has_data:
+                os.rename(previous_data, live_data)
+            raise
+
+        if version:
+            self._write_version(version)
+        else:
+            logger.warning("No se pudo determinar la versión reactivada; el archivo de versión no se modifica.")
+        logger.info(f"Versión anterior reactivada ({version or 'desconocida'}).")
+        shutil.rmtree(discarded, ignore_errors=True)
+        return True
+
+    def _discard_previous(self) -> None:
+        """
+        Elimina '<deploy>.previous' antes de modificar la instalación en vivo en el sitio:
+        dejaría de corresponder a la versión inmediatamente anterior.
+        """
+        if os.path.isdir(self.previous_folder):
+            shutil.rmtree(self.previous_folder, ignore_errors=True)
+
+    def _read_version(self) -> str:
+        try:
+            with open(self.version_file, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
+    def _write_version(self, version: str) -> None:
+        # Sin archivo de versión (componentes) la versión la registra quien coordina la instalación
+        if not self.version_file:
+            return
+        # Reemplazo atómico: el archivo puede compartir inodo con la instalación anterior
+        os.makedirs(os.path.dirname(self.version_file), exist_ok=True)
+        tmp_path = self.version_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, self.version_file)
+
     def install_update(self, package_path: str, new_version: str) -> bool:
         """
-        Aplica el paquete de actualización descargado:
-        - Extrae el contenido del ZIP evitando sobrescribir la carpeta 'Data'.
-        - Actualiza el archivo de versión local.
+        Aplica el paquete de actualización descargado de forma incremental:
+        - Compara el manifiesto del paquete contra el árbol desplegado.
+        - Extrae solo los archivos nuevos o modificados, evitando la carpeta 'Data',
+          repartiendo los miembros entre varios hilos.
+        - Elimina los archivos de la versión anterior que ya no forman parte del paquete.
+        - Actualiza el archivo de versión local y el manifiesto instalado.
+        En modo intercambio (swap) todo esto ocurre en la carpeta de preparación y la
+        instalación en vivo no se modifica hasta el intercambio final.
+        El formato se detecta por la cabecera del paquete; los paquetes tar se leen
+        como flujo (ver install_stream_package).
         Retorna True si todo fue exitoso, False en caso de error.
         """
         try:
             if not os.path.isfile(package_path):
-                print(f"[Installer] Paquete de actualización no encontrado: {package_path}")
+                logger.warning(f"Paquete de actualización no encontrado: {package_path}")
                 return False
 
-            print(f"[Installer] Iniciando extracción del paquete en: {self.deploy_folder}")
+            package_format = detect_file_format(package_path)
+            if package_format != FORMAT_ZIP:
+                return self.install_stream_package(package_path, new_version, package_format)
+
+            if self.swap:
+                logger.info(f"Preparando nueva versión en: {self.staging_folder}")
+            else:
+                logger.info(f"Iniciando instalación incremental en: {self.deploy_folder}")
+                os.makedirs(self.deploy_folder, exist_ok=True)
 
             with zipfile.ZipFile(package_path, 'r') as zip_ref:
-                for member in zip_ref.namelist():
-                    # Ignorar cualquier archivo o carpeta dentro de 'Data/'
-                    if member.startswith("Data/") or member.startswith("Data\\"):
-                        print(f"[Installer] Ignorando carpeta protegida durante actualización: {member}")
-                        continue
-                    zip_ref.extract(member, self.deploy_folder)
+                target = Manifest.from_zip(zip_ref, new_version)
+                installed = Manifest.load(self.installed_manifest_path)
+                started = time.perf_counter()
+                plan = target.diff(self.deploy_folder, installed)
+                self._plan_stats(plan, time.perf_counter() - started)
+
+                logger.info(f"Archivos a escribir: {len(plan.to_write)}, "
+                            f"sin cambios: {len(plan.unchanged)}, a eliminar: {len(plan.to_delete)}")
+
+                # Índice de miembros calculado una sola vez, sin la carpeta protegida
+                members = {
+                    normalize_path(info.filename): info
+                    for info in zip_ref.infolist()
+                    if not is_protected(info.filename)
+                }
+                work = []
+                for path in plan.to_write:
+                    if path not in members:
+                        raise ValueError(f"El manifiesto referencia un archivo ausente en el paquete: {path}")
+                    work.append((path, members[path]))
+                self.last_stats["bytes_written"] = sum(info.file_size for _, info in work)
+
+            if self.swap:
+                self._build_staging(package_path, target, installed, work)
+                self._swap_in()
+                self.partially_applied = True
+                self._write_version(new_version)
+                logger.info(f"Versión actualizada correctamente a: {new_version}")
+                return True
+
+            self._discard_previous()
+            self.partially_applied = True
+            self._create_folders(path for path, _ in work)
+            self._extract_all(package_path, work)
+
+            for path in plan.to_delete:
+                self._remove_file(path)
+
+            self._save_installed_manifest(target)
 
             # Actualizar archivo de versión
-            os.makedirs(os.path.dirname(self.version_file), exist_ok=True)
-            with open(self.version_file, 'w', encoding='utf-8') as f:
-                f.write(new_version)
+            self._write_version(new_version)
 
-            print(f"[Installer] Versión actualizada correctamente a: {new_version}")
+            logger.info(f"Versión actualizada correctamente a: {new_version}")
             return True
 
         except zipfile.BadZipFile:
-            print(f"[Installer] Error: el archivo ZIP está corrupto o no es válido.")
+            logger.error(f"Error: el archivo ZIP está corrupto o no es válido.")
+            return False
+        except ArchiveError as e:
+            logger.error(f"Error: {e}")
             return False
         except Exception as e:
-            print(f"[Installer] Error inesperado durante la instalación: {e}")
+            logger.error(f"Error inesperado durante la instalación: {e}")
             return False
+        finally:
+            if self.swap and os.path.exists(self.staging_folder):
+                if os.path.exists(os.path.join(self.staging_folder, PROTECTED_FOLDER)):
+                    # No pudo devolverse 'Data' a su sitio: nunca borrar los datos del cliente
+                    logger.error(f"La carpeta '{PROTECTED_FOLDER}' quedó en {self.staging_folder}; "
+                                 f"se conserva la preparación para su recuperación manual.")
+                else:
+                    shutil.rmtree(self.staging_folder, ignore_errors=True)
+
+    def _build_staging(self, package_path: str, target: Manifest, installed: Optional[Manifest],
+                       work: List[Tuple[str, zipfile.ZipInfo]]) -> None:
+        """
+        Construye la nueva versión completa en la carpeta de preparación:
+        - Los binarios del paquete que no cambiaron (LINKABLE_SUFFIXES) se enlazan
+          (hardlink) desde la instalación en vivo; si el sistema de archivos no lo
+          permite, se copian. El resto de archivos sin cambios se copia, para que una
+          edición en el sitio no alcance a '<deploy>.previous'.
+        - Los archivos que no pertenecen a ningún paquete (configuración local) se copian.
+        - Los archivos nuevos o modificados se extraen del paquete.
+        La carpeta 'Data' no se toca aquí: se traslada por renombrado en el intercambio.
+        """
+        if os.path.exists(self.staging_folder):
+            logger.warning(f"Eliminando preparación anterior incompleta: {self.staging_folder}")
+            shutil.rmtree(self.staging_folder)
+        os.makedirs(self.staging_folder)
+
+        stage = Installer(self.staging_folder, self.version_file, self.workers)
+        changed = {path for path, _ in work}
+        installed_files = installed.files if installed else {}
+        linked = copied = 0
+
+        if os.path.isdir(self.deploy_folder):
+            for root, dirs, files in os.walk(self.deploy_folder):
+                relative_root = os.path.relpath(root, self.deploy_folder)
+                if relative_root == ".":
+                    dirs[:] = [d for d in dirs if not is_protected(d)]
+                relative_root = "" if relative_root == "." else normalize_path(relative_root) + "/"
+
+                for name in dirs:
+                    os.makedirs(stage._local_path(relative_root + name), exist_ok=True)
+
+                for name in files:
+                    path = relative_root + name
+                    if path == INSTALLED_MANIFEST_NAME or name.endswith(".tmp_update"):
+                        continue
+                    source = os.path.join(root, name)
+                    if path in target.files:
+                        if path in changed:
+                            continue
+                        if name.lower().endswith(LINKABLE_SUFFIXES):
+                            self._link_or_copy(source, stage._local_path(path))
+                            linked += 1
+                        else:
+                            shutil.copy2(source, stage._local_path(path))
+                            copied += 1
+                    elif path not in installed_files:
+                        # Archivo local ajeno al paquete: se copia para no compartir inodo
+                        shutil.copy2(source, stage._local_path(path))
+                        copied += 1
+
+        stage._create_folders(path for path, _ in work)
+        stage._extract_all(package_path, work)
+        stage._save_installed_manifest(target)
+        logger.info(f"Preparación lista: {len(work)} extraídos, {linked} enlazados, "
+                    f"{copied} copiados.")
+
+    @staticmethod
+    def _link_or_copy(source: str, destination: str) -> None:
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+
+    def _swap_in(self) -> None:
+        """
+        Activa la carpeta de preparación como instalación en vivo:
+        1. Traslada 'Data' a la preparación (renombrado, sin copiar).
+        2. Renombra la instalación en vivo a '<deploy>.previous'.
+        3. Renombra la preparación a la carpeta de despliegue.
+        Si algún paso falla (p. ej. archivos bloqueados por el ERP en ejecución)
+        se deshacen los pasos anteriores y la instalación en vivo queda intacta.
+        """
+        live, staging, previous = self.deploy_folder, self.staging_folder, self.previous_folder
+
+        if not os.path.exists(live):
+            os.rename(staging, live)
+            return
+
+        if os.path.exists(previous):
+            shutil.rmtree(previous)
+
+        live_data = os.path.join(live, PROTECTED_FOLDER)
+        staged_data = os.path.join(staging, PROTECTED_FOLDER)
+        has_data = os.path.isdir(live_data)
+
+        if has_data:
+            os.rename(live_data, staged_data)
+        try:
+            os.rename(live, previous)
+        except OSError:
+            if has_data:
+                os.rename(staged_data, live_data)
+            raise
+
+        try:
+            os.rename(staging, live)
+        except OSError:
+            os.rename(previous, live)
+            if has_data:
+                os.rename(staged_data, live_data)
+            raise
+
+        logger.info(f"Nueva versión activada; la anterior queda en: {previous}")
+
+    def install_delta(self, delta_path: str, new_version: str) -> bool:
+        """
+        Aplica un paquete delta (parches binarios por archivo) sobre la instalación actual:
+        - Reconstruye cada archivo nuevo o modificado junto a su destino y verifica su hash.
+        - Solo si todos los archivos se reconstruyen correctamente se reemplazan en la
+          carpeta de despliegue; si algo falla la instalación queda intacta.
+        Retorna True si el delta se aplicó, False si debe usarse el paquete completo.
+        """
+        built = []
+        try:
+            if not os.path.isfile(delta_path):
+                logger.warning(f"Paquete delta no encontrado: {delta_path}")
+                return False
+
+            logger.info(f"Aplicando paquete delta en: {self.deploy_folder}")
+
+            with zipfile.ZipFile(delta_path, 'r') as zip_ref:
+                delta = DeltaPackage(zip_ref)
+                delta.manifest.version = new_version
+                installed = Manifest.load(self.installed_manifest_path)
+                started = time.perf_counter()
+                plan = delta.manifest.diff(self.deploy_folder, installed)
+                self._plan_stats(plan, time.perf_counter() - started)
+
+                logger.info(f"Archivos a reconstruir: {len(plan.to_write)}, "
+                            f"sin cambios: {len(plan.unchanged)}, a eliminar: {len(plan.to_delete)}")
+
+                for path in plan.to_write:
+                    destination = self._local_path(path)
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    tmp_path = destination + ".tmp_update"
+                    built.append((tmp_path, destination))
+                    delta.build_file(path, destination, tmp_path)
+
+            self._discard_previous()
+            self.partially_applied = True
+            for tmp_path, destination in built:
+                os.replace(tmp_path, destination)
+            built = []
+
+            for path in plan.to_delete:
+                self._remove_file(path)
+
+            self._save_installed_manifest(delta.manifest)
+            self._write_version(new_version)
+
+            logger.info(f"Delta aplicado. Versión actualizada correctamente a: {new_version}")
+            return True
+
+        except DeltaError as e:
+            logger.warning(f"El paquete delta no es aplicable: {e}")
+            return False
+        except zipfile.BadZipFile:
+            logger.error(f"Error: el paquete delta está corrupto o no es válido.")
+            return False
+        except Exception as e:
+            logger.error(f"Error inesperado aplicando el paquete delta: {e}")
+            return False
+        finally:
+            for tmp_path, _ in built:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def install_stream_package(self, package_path: str, new_version: str, package_format: str = "") -> bool:
+        """
+        Instala un paquete sin acceso aleatorio (tar comprimido) en una única pasada:
+        cada miembro se descomprime, se compara y, si cambió, se escribe como temporal
+        junto a su destino; la instalación solo se confirma al terminar el paquete completo.
+        Como las instalaciones delta o desde flujo, se aplica sobre la carpeta en vivo
+        con un renombrado por archivo (no usa la carpeta de preparación).
+        """
+        logger.info(f"Paquete {package_format or 'en flujo'}: instalación secuencial en: {self.deploy_folder}")
+        os.makedirs(self.deploy_folder, exist_ok=True)
+        with open(package_path, 'rb') as f:
+            staged = self.stage_stream(f, new_version)
+        if staged is None:
+            return False
+        return self.commit_staged(staged)
+
+    def stage_stream(self, stream: BinaryIO, new_version: str) -> Optional[StagedInstall]:
+        """
+        Prepara la instalación leyendo el paquete directamente desde un flujo (p. ej. la
+        respuesta HTTP), sin que el paquete completo se escriba a disco. El formato
+        (ZIP o tar con zstd, xz o gzip) se detecta por la cabecera del flujo.
+        - Los archivos que probablemente no cambiaron (mismo tamaño) se mantienen en
+          memoria hasta comparar su hash; solo se escriben si difieren.
+        - Los archivos nuevos o modificados se escriben como temporales junto a su destino.
+        La instalación no se aplica hasta llamar a commit_staged().
+        Retorna None si el flujo no puede procesarse.
+        """
+        installed = Manifest.load(self.installed_manifest_path)
+        files: Dict[str, Dict] = {}
+        pending: List[Tuple[str, str]] = []
+
+        try:
+            logger.info(f"Instalando desde flujo en: {self.deploy_folder}")
+            for entry in iter_package_stream(stream):
+                path = normalize_path(entry.name)
+                if entry.is_dir or is_protected(path) or path == PACKAGE_MANIFEST_NAME:
+                    entry.skip()
+                    continue
+                if entry.is_special:
+                    logger.warning(f"Miembro del paquete que no es un archivo regular, se omite: {path}")
+                    entry.skip()
+                    continue
+
+                destination = self._local_path(path)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                known = self._current_hash(path, destination, installed, entry.file_size)
+                sha256, size = hashlib.sha256(), 0
+                tmp_path = destination + ".tmp_update"
+
+                if known is None:
+                    # Registrado antes de escribir para que un fallo a mitad lo elimine
+                    pending.append((tmp_path, destination))
+                    with open(tmp_path, 'wb') as target:
+                        for chunk in entry.chunks():
+                            target.write(chunk)
+                            sha256.update(chunk)
+                            size += len(chunk)
+                else:
+                    with tempfile.SpooledTemporaryFile(STREAM_SPOOL_SIZE, dir=os.path.dirname(destination)) as spool:
+                        for chunk in entry.chunks():
+                            spool.write(chunk)
+                            sha256.update(chunk)
+                            size += len(chunk)
+                        if sha256.hexdigest() != known:
+                            spool.seek(0)
+                            pending.append((tmp_path, destination))
+                            with open(tmp_path, 'wb') as target:
+                                shutil.copyfileobj(spool, target, 1024 * 1024)
+
+                files[path] = {"size": size, "sha256": sha256.hexdigest()}
+
+            installed_files = installed.files if installed else {}
+            to_delete = [path for path in installed_files if path not in files and not is_protected(path)]
+            self.last_stats = {"files_written": len(pending), "files_unchanged": len(files) - len(pending),
+                               "files_deleted": len(to_delete),
+                               "bytes_written": sum(os.path.getsize(tmp) for tmp, _ in pending)}
+            logger.info(f"Archivos preparados: {len(pending)}, sin cambios: {len(files) - len(pending)}, "
+                        f"a eliminar: {len(to_delete)}")
+            return StagedInstall(Manifest(new_version, files), pending, to_delete)
+
+        except (ZipStreamError, ArchiveError, zipfile.BadZipFile, ValueError, OSError) as e:
+            logger.error(f"Error procesando el paquete desde el flujo: {e}")
+            self.discard_staged(StagedInstall(Manifest(new_version), pending, []))
+            return None
+
+    def commit_staged(self, staged: StagedInstall) -> bool:
+        """
+        Confirma una instalación preparada con stage_stream().
+        """
+        try:
+            self._discard_previous()
+            self.partially_applied = True
+            for tmp_path, destination in staged.pending:
+                os.replace(tmp_path, destination)
+            for path in staged.to_delete:
+                self._remove_file(path)
+
+            self._save_installed_manifest(staged.manifest)
+            self._write_version(staged.manifest.version)
+            logger.info(f"Versión actualizada correctamente a: {staged.manifest.version}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error inesperado confirmando la instalación: {e}")
+            return False
+
+    @staticmethod
+    def discard_staged(staged: StagedInstall) -> None:
+        """
+        Elimina los temporales de una instalación preparada que no se confirmará.
+        """
+        for tmp_path, _ in staged.pending:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _current_hash(path: str, destination: str, installed: Optional[Manifest],
+                      declared_size: Optional[int]) -> Optional[str]:
+        """
+        Hash del archivo instalado si podría coincidir con el nuevo (mismo tamaño declarado);
+        None si no existe o su tamaño ya indica que cambió.
+        """
+        try:
+            stat = os.stat(destination)
+        except OSError:
+            return None
+        if declared_size is not None and stat.st_size != declared_size:
+            return None
+
+        known = installed.files.get(path) if installed else None
+        if known and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+            return known["sha256"]
+        return calculate_sha256(destination) or None
+
+    def _plan_stats(self, plan, seconds: float) -> None:
+        self.last_stats = {"files_written": len(plan.to_write), "files_unchanged": len(plan.unchanged),
+                           "files_deleted": len(plan.to_delete), "plan_seconds": seconds}
+
+    @property
+    def installed_manifest_path(self) -> str:
+        return os.path.join(self.deploy_folder, INSTALLED_MANIFEST_NAME)
+
+    def _local_path(self, path: str) -> str:
+        if not is_safe_path(path):
+            raise ValueError(f"Ruta no permitida en el paquete: {path}")
+        return os.path.join(self.deploy_folder, *path.split("/"))
+
+    def _create_folders(self, paths) -> None:
+        """
+        Crea de una sola vez todas las carpetas necesarias para los archivos a escribir.
+        """
+        folders = {os.path.dirname(self._local_path(path)) for path in paths}
+        for folder in sorted(folders):
+            os.makedirs(folder, exist_ok=True)
+
+    def _extract_all(self, package_path: str, work: List[Tuple[str, zipfile.ZipInfo]]) -> None:
+        """
+        Extrae los miembros indicados. Con más de un worker, cada hilo abre su propio
+        manejador del ZIP y descomprime miembros en paralelo (zlib libera el GIL).
+        """
+        if self.workers == 1 or len(work) < 2:
+            with zipfile.ZipFile(package_path, 'r') as zip_ref:
+                for path, info in work:
+                    self._extract_member(zip_ref, info, path)
+            return
+
+        local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
+
+        def extract(path: str, info: zipfile.ZipInfo) -> None:
+            if not hasattr(local, "zip_ref"):
+                local.zip_ref = zipfile.ZipFile(package_path, 'r')
+                with handles_lock:
+                    handles.append(local.zip_ref)
+            self._extract_member(local.zip_ref, info, path)
+
+        # Los miembros más grandes primero para equilibrar la carga entre hilos
+        work = sorted(work, key=lambda item: item[1].file_size, reverse=True)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for future in [executor.submit(extract, path, info) for path, info in work]:
+                    future.result()
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def _extract_member(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, path: str) -> None:
+        """
+        Extrae un miembro del ZIP a un archivo temporal y lo reemplaza atómicamente,
+        de modo que nunca queda un archivo a medio escribir ni se modifica un inodo compartido.
+        La carpeta destino debe existir (ver _create_folders).
+        """
+        destination = self._local_path(path)
+        tmp_path = destination + ".tmp_update"
+        with zip_ref.open(info) as source, open(tmp_path, 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.replace(tmp_path, destination)
+
+    def _remove_file(self, path: str) -> None:
+        """
+        Elimina un archivo que ya no forma parte de la nueva versión
+        y las carpetas que queden vacías.
+        """
+        destination = self._local_path(path)
+        if os.path.isfile(destination):
+            os.remove(destination)
+            logger.info(f"Archivo eliminado (ya no forma parte del paquete): {path}")
+
+        root = os.path.normcase(os.path.normpath(self.deploy_folder))
+        folder = os.path.normpath(os.path.dirname(destination))
+        while os.path.normcase(folder) != root:
+            try:
+                os.rmdir(folder)
+            except OSError:
+                break
+            folder = os.path.dirname(folder)
+
+    def _save_installed_manifest(self, target: Manifest) -> None:
+        """
+        Guarda el manifiesto instalado incluyendo el mtime de cada archivo,
+        lo que permite omitir el cálculo de hashes en la siguiente actualización.
+        """
+        files = {}
+        for path, entry in target.files.items():
+            if is_protected(path):
+                continue
+            try:
+                stat = os.stat(self._local_path(path))
+            except OSError:
+                continue
+            files[path] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        Manifest(target.version, files).save(self.installed_manifest_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+# core/journal.py
+
+import os
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from lib.logger import get_logger
+
+logger = get_logger("Journal")
+
+
+class TransferJournal:
+    """
+    Diario en disco de una descarga parcial (archivo '.part').
+    Registra la URL, el tamaño, el validador del servidor (ETag / Last-Modified)
+    y los rangos de bytes ya escritos, para poder reanudar la transferencia
+    incluso si el proceso fue terminado abruptamente.
+    """
+
+    def __init__(self, path: str):
+        """
+        Inicializa el diario con la ruta del archivo JSON donde se persiste.
+        """
+        self.path = path
+        self.url = ""
+        self.size: Optional[int] = None
+        self.etag = ""
+        self.last_modified = ""
+        self.ranges: List[List[int]] = []  # Rangos completados [inicio, fin) ordenados
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "TransferJournal":
+        """
+        Carga el diario desde disco; si no existe o está dañado retorna uno vacío.
+        """
+        journal = cls(path)
+        try:
+            if os.path.isfile(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                journal.url = data.get("url", "")
+                journal.size = data.get("size")
+                journal.etag = data.get("etag", "")
+                journal.last_modified = data.get("last_modified", "")
+                journal.ranges = [list(r) for r in data.get("ranges", [])]
+        except Exception as e:
+            logger.warning(f"Diario de descarga ilegible, se descarta: {e}")
+            journal = cls(path)
+        return journal
+
+    def matches(self, url: str, size: Optional[int], etag: str, last_modified: str) -> bool:
+        """
+        Indica si la descarga parcial corresponde al mismo recurso remoto.
+        Sin validador (ETag o Last-Modified) no es seguro reanudar.
+        """
+        if self.url != url or self.size != size or size is None:
+            return False
+        if etag:
+            return self.etag == etag
+        if last_modified:
+            return self.last_modified == last_modified
+        return False
+
+    def reset(self, url: str, size: Optional[int], etag: str, last_modified: str) -> None:
+        """
+        Reinicia el diario para una nueva transferencia desde cero.
+        """
+        with self._lock:
+            self.url, self.size = url, size
+            self.etag, self.last_modified = etag, last_modified
+            self.ranges = []
+        self.save()
+
+    def rebind(self, etag: str, last_modified: str) -> None:
+        """
+        Conserva los rangos descargados pero adopta el validador de otro espejo del
+        mismo paquete (solo cuando el contenido final se verificará contra su digest).
+        """
+        with self._lock:
+            self.etag, self.last_modified = etag, last_modified
+        self.save()
+
+    def add_range(self, start: int, end: int) -> None:
+        """
+        Marca como completado el rango [start, end) fusionándolo con los existentes.
+        """
+        if end <= start:
+            return
+        with self._lock:
+            merged: List[List[int]] = []
+            for current in sorted(self.ranges + [[start, end]]):
+                if merged and current[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], current[1])
+                else:
+                    merged.append(list(current))
+            self.ranges = merged
+
+    def missing(self) -> List[Tuple[int, int]]:
+        """
+        Retorna los rangos [inicio, fin) que aún faltan por descargar.
+        """
+        if self.size is None:
+            return []
+        gaps, position = [], 0
+        with self._lock:
+            for start, end in self.ranges:
+                if start > position:
+                    gaps.append((position, start))
+                position = max(position, end)
+        if position < self.size:
+            gaps.append((position, self.size))
+        return gaps
+
+    def prefix_end(self) -> int:
+        """
+        Retorna el final del prefijo contiguo ya descargado desde el byte 0.
+        """
+        with self._lock:
+            if self.ranges and self.ranges[0][0] == 0:
+                return self.ranges[0][1]
+            return 0
+
+    def completed_bytes(self) -> int:
+        with self._lock:
+            return sum(end - start for start, end in self.ranges)
+
+    def save(self) -> None:
+        """
+        Persiste el diario de forma atómica.
+        """
+        with self._lock:
+            data: Dict = {
+                "url": self.url,
+                "size": self.size,
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "ranges": self.ranges,
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def delete(self) -> None:
+        """
+        Elimina el diario una vez completada la descarga.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
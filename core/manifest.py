@@ -0,0 +1,185 @@
+# core/manifest.py
+
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional
+
+from lib.utils import calculate_sha256
+from lib.logger import get_logger
+
+logger = get_logger("Manifest")
+
+# Nombre del manifiesto que puede viajar dentro del paquete de actualización
+PACKAGE_MANIFEST_NAME = "manifest.json"
+
+# Nombre del manifiesto que se guarda en la carpeta de despliegue tras cada instalación
+INSTALLED_MANIFEST_NAME = ".erp_manifest.json"
+
+# Carpeta protegida que nunca se modifica durante una actualización
+PROTECTED_FOLDER = "Data"
+
+# Temporales que pueden quedar de una instalación, restauración o reparación interrumpida
+TEMP_SUFFIXES = (".tmp_update", ".tmp_restore", ".tmp_repair")
+
+
+def normalize_path(name: str) -> str:
+    """
+    Normaliza una ruta relativa del paquete a separadores '/' sin barra inicial.
+    """
+    return name.replace("\\", "/").lstrip("/")
+
+
+def is_protected(name: str) -> bool:
+    """
+    Indica si la ruta pertenece a la carpeta protegida 'Data'.
+    """
+    path = normalize_path(name)
+    return path == PROTECTED_FOLDER or path.startswith(PROTECTED_FOLDER + "/")
+
+
+def is_safe_path(name: str) -> bool:
+    """
+    Rechaza rutas absolutas o con componentes '..' que podrían escapar de la carpeta destino.
+    """
+    path = normalize_path(name)
+    if not path or os.path.isabs(path) or ":" in path.split("/")[0]:
+        return False
+    return ".." not in path.split("/")
+
+
+class ManifestDiff:
+    """
+    Resultado de comparar el manifiesto objetivo contra la instalación actual.
+    - to_write: archivos nuevos o modificados que deben escribirse.
+    - to_delete: archivos instalados previamente que ya no forman parte del paquete.
+    - unchanged: archivos idénticos que no requieren ninguna acción.
+    """
+
+    def __init__(self):
+        self.to_write: List[str] = []
+        self.to_delete: List[str] = []
+        self.unchanged: List[str] = []
+
+
+class Manifest:
+    """
+    Manifiesto por archivo (tamaño y SHA-256) de una versión del ERP.
+    Permite aplicar actualizaciones incrementales escribiendo solo lo que cambió.
+    """
+
+    def __init__(self, version: str = "", files: Optional[Dict[str, Dict]] = None):
+        """
+        Inicializa el manifiesto con:
+        - version: versión a la que corresponde el manifiesto.
+        - files: diccionario ruta -> {"size": int, "sha256": str, ["mtime_ns": int]}.
+        """
+        self.version = version
+        self.files: Dict[str, Dict] = files or {}
+
+    def to_dict(self) -> Dict:
+        return {"version": self.version, "files": self.files}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Manifest":
+        files = {
+            normalize_path(path): entry
+            for path, entry in data.get("files", {}).items()
+        }
+        return cls(str(data.get("version", "")), files)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Manifest"]:
+        """
+        Carga un manifiesto desde disco.
+        Retorna None si no existe o no puede leerse.
+        """
+        try:
+            if not os.path.isfile(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except Exception as e:
+            logger.error(f"Error leyendo manifiesto {path}: {e}")
+            return None
+
+    def save(self, path: str) -> None:
+        """
+        Guarda el manifiesto de forma atómica (archivo temporal + reemplazo).
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_zip(cls, zip_ref, version: str = "") -> "Manifest":
+        """
+        Obtiene el manifiesto de un paquete ZIP abierto.
+        Usa el 'manifest.json' incluido en el paquete si existe; si no, lo deriva
+        calculando el SHA-256 de cada miembro en memoria (sin escribir a disco).
+        """
+        names = {normalize_path(info.filename): info for info in zip_ref.infolist()}
+
+        if PACKAGE_MANIFEST_NAME in names:
+            with zip_ref.open(names[PACKAGE_MANIFEST_NAME]) as f:
+                manifest = cls.from_dict(json.loads(f.read().decode('utf-8')))
+            if version:
+                manifest.version = version
+            return manifest
+
+        logger.info("El paquete no incluye manifiesto, derivándolo del contenido...")
+        files = {}
+        for path, info in names.items():
+            if info.is_dir() or path == PACKAGE_MANIFEST_NAME:
+                continue
+            sha256 = hashlib.sha256()
+            with zip_ref.open(info) as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(block)
+            files[path] = {"size": info.file_size, "sha256": sha256.hexdigest()}
+        return cls(version, files)
+
+    def diff(self, deploy_folder: str, installed: Optional["Manifest"] = None) -> ManifestDiff:
+        """
+        Compara este manifiesto (versión objetivo) contra el árbol desplegado.
+        - Si el archivo instalado conserva el tamaño y mtime registrados en el
+          manifiesto instalado, se confía en su hash sin volver a leerlo.
+        - Si el tamaño difiere, el archivo se considera modificado sin calcular hash.
+        - En otro caso se calcula el SHA-256 del archivo en disco.
+        La carpeta 'Data' nunca se incluye en el resultado.
+        """
+        result = ManifestDiff()
+        installed_files = installed.files if installed else {}
+
+        for path, entry in self.files.items():
+            if is_protected(path):
+                continue
+
+            local_path = os.path.join(deploy_folder, *path.split("/"))
+            try:
+                stat = os.stat(local_path)
+            except OSError:
+                result.to_write.append(path)
+                continue
+
+            if stat.st_size != entry["size"]:
+                result.to_write.append(path)
+                continue
+
+            known = installed_files.get(path)
+            if (known and known.get("sha256") == entry["sha256"]
+                    and known.get("size") == stat.st_size
+                    and known.get("mtime_ns") == stat.st_mtime_ns):
+                result.unchanged.append(path)
+            elif calculate_sha256(local_path) == entry["sha256"]:
+                result.unchanged.append(path)
+            else:
+                result.to_write.append(path)
+
+        for path in installed_files:
+            if path not in self.files and not is_protected(path):
+                result.to_delete.append(path)
+
+        return result
@@ -0,0 +1,253 @@
+# core/mirrors.py
+
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, List, Optional
+
+import requests
+
+from lib.filelock import FileLock
+from lib.http_session import get_session
+from lib.logger import get_logger
+
+logger = get_logger("Mirrors")
+
+# Bytes leídos al sondear un espejo para estimar su caudal
+PROBE_BYTES = 256 * 1024
+
+# Tamaño de referencia con el que se compara el coste de latencia frente al caudal
+REFERENCE_BYTES = 8 * 1024 * 1024
+
+# Segundos durante los que un espejo que falló pasa al final de la lista
+FAILURE_COOLDOWN = 300.0
+
+# Peso de la última medición en la media móvil del caudal
+THROUGHPUT_ALPHA = 0.3
+
+
+def is_local(url: str) -> bool:
+    """
+    Indica si la ruta es un espejo en disco o carpeta compartida (ruta local, UNC o file://).
+    """
+    return not re.match(r"^https?://", url, re.IGNORECASE)
+
+
+def local_path(url: str) -> str:
+    """
+    Ruta en disco de un espejo local; admite 'file:///srv/erp' y 'file:///C:/erp'.
+    """
+    if url.lower().startswith("file://"):
+        path = url[7:]
+        if re.match(r"^/[A-Za-z]:", path):
+            path = path[1:]
+        return path
+    return url
+
+
+def mirror_base(url: str) -> str:
+    """
+    Carpeta o URL base (sin el nombre de archivo) que identifica al espejo de una URL.
+    """
+    if is_local(url):
+        return os.path.dirname(local_path(url))
+    return url.rsplit("/", 1)[0]
+
+
+def mirror_url(mirror: str, url: str) -> str:
+    """
+    URL equivalente a 'url' en otro espejo: mismo nombre de archivo bajo su base.
+    """
+    filename = url.rsplit("/", 1)[-1].split("?", 1)[0]
+    if is_local(mirror):
+        return os.path.join(local_path(mirror), filename)
+    return mirror.rstrip("/") + "/" + filename
+
+
+class MirrorSet:
+    """
+    Lista ordenada de espejos de descarga (HTTP o carpetas locales/compartidas) que
+    replican los paquetes del servidor principal con los mismos nombres de archivo.
+    - Sondea los espejos a la vez (latencia y caudal) y ordena las URL candidatas
+      de la más rápida a la más lenta; el orden configurado desempata.
+    - Guarda en disco la salud de cada espejo (latencia, caudal medio, fallos) para
+      no volver a sondear durante 'probe_ttl' segundos; las descargas reales también
+      actualizan el caudal y los fallos.
+    """
+
+    def __init__(self, mirrors: List[str], health_file: Optional[str] = None, probe_ttl: float = 900.0,
+                 probe_timeout: float = 5.0, session: Optional[requests.Session] = None):
+        """
+        Inicializa los espejos con:
+        - mirrors: bases de los espejos en orden de preferencia (URL o carpeta).
+        - health_file: archivo JSON donde persistir la salud de los espejos (None = solo en memoria).
+        - probe_ttl: segundos durante los que se reutiliza un sondeo.
+        - probe_timeout: plazo total del sondeo de todos los espejos.
+        - session: sesión HTTP a utilizar; por defecto la sesión compartida del proceso.
+        """
+        self.mirrors = [mirror for mirror in mirrors if mirror]
+        self.health_file = health_file
+        self.probe_ttl = probe_ttl
+        self.probe_timeout = probe_timeout
+        self.session = session or get_session()
+        self._lock = threading.Lock()
+        self._health: Dict[str, Dict] = self._load_health()
+
+    def _load_health(self) -> Dict[str, Dict]:
+        if not self.health_file or not os.path.isfile(self.health_file):
+            return {}
+        try:
+            with open(self.health_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_health(self) -> None:
+        if not self.health_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.health_file) or ".", exist_ok=True)
+            with FileLock(self.health_file + ".lock", timeout=10):
+                data = self.health()
+                tmp_path = self.health_file + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.health_file)
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"No se pudo guardar la salud de los espejos: {e}")
+
+    def urls_for(self, url: str) -> List[str]:
+        """
+        URL candidatas para un archivo: la original y su equivalente en cada espejo,
+        ordenadas por la salud conocida (sin sondear).
+        """
+        urls = [url]
+        for mirror in self.mirrors:
+            candidate = mirror_url(mirror, url)
+            if candidate not in urls:
+                urls.append(candidate)
+        return sorted(urls, key=lambda candidate: (self._score(candidate), urls.index(candidate)))
+
+    def candidates(self, url: str) -> List[str]:
+        """
+        Igual que urls_for(), pero antes sondea a la vez los espejos sin medición
+        reciente para elegir el más rápido.
+        """
+        urls = self.urls_for(url)
+        now = time.time()
+        with self._lock:
+            stale = [candidate for candidate in urls
+                     if now - self._health.get(mirror_base(candidate), {}).get("probed", 0) > self.probe_ttl]
+        if stale and len(urls) > 1:
+            self.probe(stale)
+            urls = self.urls_for(url)
+        logger.info("Orden de espejos: " + ", ".join(mirror_base(candidate) for candidate in urls))
+        return urls
+
+    def _score(self, url: str) -> float:
+        """
+        Segundos estimados para descargar REFERENCE_BYTES; infinito tras un fallo reciente.
+        Sin mediciones se asume un coste medio para respetar el orden configurado.
+        """
+        with self._lock:
+            health = self._health.get(mirror_base(url))
+        if not health:
+            return 1e6
+        if time.time() - health.get("last_failure", 0) < FAILURE_COOLDOWN:
+            return float("inf")
+        throughput = health.get("throughput") or 0
+        if not throughput:
+            return 1e6
+        return health.get("latency", 0.0) + REFERENCE_BYTES / throughput
+
+    def probe(self, urls: List[str]) -> None:
+        """
+        Sondea las URL indicadas a la vez, dentro de un único plazo: tiempo hasta el
+        primer byte y caudal leyendo los primeros PROBE_BYTES del archivo.
+        Un espejo que no responde a tiempo o falla queda registrado como fallido.
+        """
+        started = time.monotonic()
+        threads = [threading.Thread(target=self._probe_one, args=(url,), name="mirror-probe", daemon=True)
+                   for url in urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0.0, self.probe_timeout - (time.monotonic() - started)))
+        for url, thread in zip(urls, threads):
+            if thread.is_alive():
+                self.record_failure(url, save=False)
+        self._save_health()
+
+    def _probe_one(self, url: str) -> None:
+        started = time.monotonic()
+        try:
+            if is_local(url):
+                with open(local_path(url), 'rb') as f:
+                    latency = time.monotonic() - started
+                    received = len(f.read(PROBE_BYTES))
+            else:
+                headers = {"Range": f"bytes=0-{PROBE_BYTES - 1}"}
+                with self.session.get(url, headers=headers, stream=True, timeout=self.probe_timeout) as response:
+                    response.raise_for_status()
+                    latency = time.monotonic() - started
+                    received = 0
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        received += len(chunk)
+                        if received >= PROBE_BYTES:
+                            break
+            elapsed = time.monotonic() - started
+            throughput = received / max(elapsed - latency, 1e-3)
+        except Exception as e:
+            logger.warning(f"Espejo no disponible: {mirror_base(url)} ({e})")
+            self.record_failure(url, save=False)
+            return
+
+        with self._lock:
+            health = self._health.setdefault(mirror_base(url), {})
+            health.update({"latency": round(latency, 4), "probed": time.time()})
+            self._update_throughput(health, throughput)
+        logger.debug(f"Sondeo de {mirror_base(url)}: {latency * 1000:.0f} ms, "
+                     f"{throughput / (1024 * 1024):.2f} MiB/s")
+
+    def record_success(self, url: str, received: int, seconds: float) -> None:
+        """
+        Registra una transferencia completada con su caudal real (media móvil).
+        """
+        with self._lock:
+            health = self._health.setdefault(mirror_base(url), {})
+            health["failures"] = 0
+            health.pop("last_failure", None)
+            if received and seconds > 0:
+                self._update_throughput(health, received / seconds)
+        self._save_health()
+
+    @staticmethod
+    def _update_throughput(health: Dict, throughput: float) -> None:
+        previous = health.get("throughput")
+        health["throughput"] = round(throughput if not previous else
+                                     previous + THROUGHPUT_ALPHA * (throughput - previous), 1)
+
+    def record_failure(self, url: str, save: bool = True) -> None:
+        with self._lock:
+            health = self._health.setdefault(mirror_base(url), {})
+            health["failures"] = health.get("failures", 0) + 1
+            health["last_failure"] = time.time()
+            health["probed"] = time.time()
+        if save:
+            self._save_health()
+
+    def health(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {base: dict(entry) for base, entry in self._health.items()}
+
+
+if __name__ == "__main__":
+    # Prueba manual: ordenar los espejos para una URL
+    import sys
+
+    mirror_set = MirrorSet(sys.argv[2:])
+    for candidate in mirror_set.candidates(sys.argv[1]):
+        print(f"[Mirrors] {candidate}")
+    print(f"[Mirrors] {json.dumps(mirror_set.health(), indent=2)}")
@@ -1,52 +1,375 @@
 # core/notifier.py
 
-from plyer import notification
+import os
+import json
+import time
+import queue
+import atexit
+import socket
+import logging
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from lib.logger import get_logger
+
+if TYPE_CHECKING:
+    from core.validator import Settings
+
+logger = get_logger("Notifier")
+
+# Notificadores con envíos pendientes que se vacían (con espera acotada) al terminar el proceso.
+# El cierre se registra en atexit con el primer envío, después de configurar el logging,
+# para que se ejecute antes de shutdown_logging y sus mensajes no se pierdan.
+_active: "weakref.WeakSet[Notifier]" = weakref.WeakSet()
+_atexit_registered = False
+
+_STOP = object()
+
+
+class NotificationSink(ABC):
+    """
+    Destino de las notificaciones. send() recibe el mensaje ya agrupado y los
+    eventos originales; lanza una excepción si el envío falla. Un destino con
+    'disabled' en True deja de recibir envíos.
+    """
+
+    name = "sink"
+    disabled = False
+
+    @abstractmethod
+    def send(self, title: str, message: str, events: List[Dict]) -> None:
+        ...
+
+
+class DesktopSink(NotificationSink):
+    """
+    Notificación de escritorio mediante 'plyer' (importado al primer envío).
+    Se desactiva solo si no hay backend (plyer no instalado o sin escritorio, que
+    plyer indica con NotImplementedError); un fallo puntual no impide los siguientes.
+    """
+
+    name = "desktop"
+
+    def __init__(self, app_name: str):
+        self.app_name = app_name
+
+    def send(self, title: str, message: str, events: List[Dict]) -> None:
+        try:
+            from plyer import notification
+            notification.notify(title=title, message=message, app_name=self.app_name,
+                                timeout=max(event.get("timeout", 10) for event in events))
+        except (ImportError, NotImplementedError):
+            self.disabled = True
+            raise
+
+
+class WebhookSink(NotificationSink):
+    """
+    POST JSON a un endpoint HTTP (p. ej. un webhook local de la mesa de ayuda).
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: Optional[str], app_name: str, timeout: float = 5.0):
+        if not url:
+            raise ValueError("notify_webhook_url no está configurada")
+        self.url = url
+        self.app_name = app_name
+        self.timeout = timeout
+
+    def send(self, title: str, message: str, events: List[Dict]) -> None:
+        from lib.http_session import get_session
+        payload = {"app": self.app_name, "host": socket.gethostname(), "title": title,
+                   "message": message, "events": events}
+        response = get_session().post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class JsonFileSink(NotificationSink):
+    """
+    Añade una línea JSON por notificación a un archivo (para monitorización o auditoría).
+    """
+
+    name = "json"
+
+    def __init__(self, path: str, app_name: str):
+        self.path = path
+        self.app_name = app_name
+
+    def send(self, title: str, message: str, events: List[Dict]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        line = json.dumps({"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                           "app": self.app_name, "title": title, "message": message,
+                           "events": len(events)}, ensure_ascii=False)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+class SyslogSink(NotificationSink):
+    """
+    Envía la notificación a syslog: socket local (/dev/log) o servidor "host:puerto" por UDP.
+    """
+
+    name = "syslog"
+
+    def __init__(self, address: Optional[str], app_name: str):
+        from logging.handlers import SysLogHandler
+
+        if not address:
+            target = "/dev/log" if os.path.exists("/dev/log") else ("localhost", 514)
+        elif ":" in address and not os.path.exists(address):
+            host, port = address.rsplit(":", 1)
+            target = (host, int(port))
+        else:
+            target = address
+        self.handler = SysLogHandler(address=target)
+        self.handler.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+        self.handler.handleError = self._raise
+        self.ident = app_name.replace(" ", "")
+
+    @staticmethod
+    def _raise(record: logging.LogRecord) -> None:
+        raise
+
+    def send(self, title: str, message: str, events: List[Dict]) -> None:
+        record = logging.makeLogRecord({"name": self.ident, "levelno": logging.INFO, "levelname": "INFO",
+                                        "msg": f"{title}: {message.replace(chr(10), ' | ')}"})
+        self.handler.emit(record)
+
+
+# Tipos de destino admitidos en notify_type: nombre -> fábrica(settings, app_name)
+SINK_FACTORIES: Dict[str, Callable[["Settings", str], NotificationSink]] = {
+    "desktop": lambda settings, app_name: DesktopSink(app_name),
+    "webhook": lambda settings, app_name: WebhookSink(settings.notify_webhook_url, app_name),
+    "json": lambda settings, app_name: JsonFileSink(settings.get_notify_json_file(), app_name),
+    "syslog": lambda settings, app_name: SyslogSink(settings.notify_syslog_address, app_name),
+}
+
+
+def register_sink(name: str, factory: Callable[["Settings", str], NotificationSink]) -> None:
+    """
+    Registra un tipo de destino adicional que podrá elegirse en notify_type.
+    """
+    SINK_FACTORIES[name] = factory
+
+
+def build_sinks(settings: "Settings", app_name: str) -> List[NotificationSink]:
+    """
+    Destinos indicados en notify_type, separados por comas (p. ej. "desktop,json");
+    "none" o vacío desactiva las notificaciones. Antes notify_type no se leía y siempre
+    se notificaba en el escritorio, por eso un tipo desconocido se trata como "desktop".
+    Los destinos sin la configuración necesaria se omiten con un aviso.
+    """
+    names = []
+    for name in [part.strip().lower() for part in (settings.notify_type or "").replace("+", ",").split(",")]:
+        if not name or name == "none":
+            continue
+        if name not in SINK_FACTORIES:
+            logger.warning(f"Tipo de notificación desconocido ({name}), se usa 'desktop'.")
+            name = "desktop"
+        if name not in names:
+            names.append(name)
+
+    sinks = []
+    for name in names:
+        factory = SINK_FACTORIES[name]
+        try:
+            sinks.append(factory(settings, app_name))
+        except Exception as e:
+            logger.warning(f"No se pudo preparar el destino de notificaciones '{name}': {e}")
+    return sinks
+
+
+def coalesce(events: List[Dict]) -> Tuple[str, str]:
+    """
+    Une una ráfaga de notificaciones en un único mensaje (sin repetir textos).
+    """
+    titles = list(dict.fromkeys(event["title"] for event in events))
+    messages = list(dict.fromkeys(event["message"] for event in events))
+    return (titles[0] if len(titles) == 1 else "ERP Update"), "\n".join(messages)
+
+
+class _SinkWorker:
+    """
+    Hilo propio de cada destino: uno lento o colgado no retrasa a los demás.
+    """
+
+    def __init__(self, sink: NotificationSink):
+        self.sink = sink
+        self.queue: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=f"notify-{sink.name}", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            title, message, events = item
+            if self.sink.disabled:
+                continue
+            try:
+                self.sink.send(title, message, events)
+                logger.info(f"Notificación enviada ({self.sink.name}): {title}")
+            except Exception as e:
+                logger.error(f"Error enviando notificación ({self.sink.name}): {e}")
 
 
 class Notifier:
     """
-    Clase encargada de enviar notificaciones visuales al usuario.
-    Utiliza la librería 'plyer' para generar popups compatibles con Windows, Linux y macOS.
+    Clase encargada de enviar notificaciones al usuario sin bloquear la actualización:
+    - send_notification() solo encola; un hilo de fondo agrupa las ráfagas (las que
+      llegan dentro de 'coalesce_seconds') en un único mensaje.
+    - Cada destino (escritorio, webhook, archivo JSON, syslog) envía desde su propio hilo.
+    - Al terminar el proceso se espera a los envíos pendientes como máximo
+      'shutdown_timeout' segundos.
+    Por defecto notifica en el escritorio; configure() elige los destinos según notify_type.
     """
 
-    def __init__(self, app_name: str = "ERP Update Agent"):
+    def __init__(self, app_name: str = "ERP Update Agent", sinks: Optional[List[NotificationSink]] = None,
+                 coalesce_seconds: float = 2.0, shutdown_timeout: float = 5.0):
         """
         Inicializa el notificador.
         - app_name: Nombre que aparecerá como remitente de la notificación.
+        - sinks: destinos de las notificaciones (por defecto, el escritorio).
+        - coalesce_seconds: ventana en la que varias notificaciones se agrupan en una.
+        - shutdown_timeout: espera máxima a los envíos pendientes al cerrar.
         """
         self.app_name = app_name
+        self.sinks = sinks if sinks is not None else [DesktopSink(app_name)]
+        self.coalesce_seconds = coalesce_seconds
+        self.shutdown_timeout = shutdown_timeout
+        self._events: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._workers: Dict[int, _SinkWorker] = {}
+        self._closed = False
+
+    def configure(self, settings: "Settings") -> None:
+        """
+        Elige los destinos y tiempos según la configuración (notify_type y notify_*).
+        """
+        sinks = build_sinks(settings, self.app_name)
+        with self._lock:
+            self.sinks = sinks
+            self.coalesce_seconds = settings.notify_coalesce_seconds
+            self.shutdown_timeout = settings.notify_shutdown_timeout
+            # Los hilos de los destinos anteriores terminan tras enviar lo que ya tenían
+            current = {id(sink) for sink in sinks}
+            stale = [worker for key, worker in self._workers.items() if key not in current]
+            self._workers = {key: worker for key, worker in self._workers.items() if key in current}
+        for worker in stale:
+            worker.queue.put(_STOP)
+        logger.info("Destinos de notificación: " + (", ".join(sink.name for sink in self.sinks) or "ninguno"))
 
     def send_notification(self, title: str, message: str, timeout: int = 10) -> bool:
         """
-        Envía una notificación de escritorio al usuario.
+        Encola una notificación para el usuario.
         - title: Título de la notificación.
         - message: Mensaje descriptivo de la notificación.
-        - timeout: Tiempo (en segundos) que permanecerá visible (default: 10).
-        Retorna True si la notificación fue enviada, False en caso de error.
+        - timeout: Tiempo (en segundos) que permanecerá visible en el escritorio (default: 10).
+        Retorna True si la notificación quedó encolada, False si no hay destinos o ya se cerró.
         """
-        try:
-            notification.notify(
-                title=title,
-                message=message,
-                app_name=self.app_name,
-                timeout=timeout
-            )
-            print(f"[Notifier] Notificación enviada: {title}")
+        with self._lock:
+            if self._closed or not self.sinks:
+                return False
+            self._events.put({"title": title, "message": message, "timeout": timeout, "time": time.time()})
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="notify-dispatch", daemon=True)
+                self._thread.start()
+                _register_close(self)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            event = self._events.get()
+            if event is _STOP:
+                break
+            batch = [event]
+            deadline = time.monotonic() + self.coalesce_seconds
+            stop = False
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stop = True
+                    break
+                batch.append(event)
+            self._dispatch(batch)
+            if stop:
+                break
+
+    def _dispatch(self, batch: List[Dict]) -> None:
+        title, message = coalesce(batch)
+        if len(batch) > 1:
+            logger.info(f"{len(batch)} notificaciones agrupadas en un único mensaje.")
+        with self._lock:
+            for sink in self.sinks:
+                worker = self._workers.get(id(sink))
+                if worker is None:
+                    worker = self._workers[id(sink)] = _SinkWorker(sink)
+                worker.queue.put((title, message, batch))
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Envía lo pendiente sin esperar la ventana de agrupación y espera a los destinos
+        como máximo 'timeout' segundos (por defecto shutdown_timeout).
+        Retorna False si algún envío quedó sin completar en el plazo.
+        """
+        with self._lock:
+            if self._closed:
+                return True
+            self._closed = True
+            thread = self._thread
+        _active.discard(self)
+        if thread is None:
             return True
 
-        except Exception as e:
-            print(f"[Notifier] Error enviando notificación: {e}")
+        deadline = time.monotonic() + (self.shutdown_timeout if timeout is None else timeout)
+        self._events.put(_STOP)
+        thread.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.queue.put(_STOP)
+        for worker in workers:
+            worker.thread.join(max(0.0, deadline - time.monotonic()))
+
+        pending = [worker.sink.name for worker in workers if worker.thread.is_alive()]
+        if thread.is_alive() or pending:
+            logger.warning("Notificaciones sin completar al cerrar: " + (", ".join(pending) or "agrupación"))
             return False
+        return True
+
+
+def _register_close(notifier: Notifier) -> None:
+    global _atexit_registered
+    _active.add(notifier)
+    if not _atexit_registered:
+        atexit.register(_close_all)
+        _atexit_registered = True
+
+
+def _close_all() -> None:
+    for notifier in list(_active):
+        notifier.close()
 
 
 if __name__ == "__main__":
-    # Prueba manual del sistema de notificaciones
+    # Prueba manual del sistema de notificaciones: tres avisos seguidos llegan como uno
     try:
         notifier = Notifier()
-        if notifier.send_notification(
-            title="Actualización Exitosa",
-            message="La actualización del ERP se ha completado correctamente."
-        ):
+        for step in ("Descarga completada.", "Instalación completada.", "Actualización Exitosa."):
+            notifier.send_notification("ERP Update", step)
+        if notifier.close():
             print("[Notifier] Prueba de notificación exitosa.")
         else:
             print("[Notifier] Fallo en la prueba de notificación.")
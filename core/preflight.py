@@ -0,0 +1,489 @@
+# core/preflight.py
+
+import os
+import time
+import socket
+import shutil
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from urllib.parse import urlparse
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, List, Optional, Tuple
+
+from core.manifest import INSTALLED_MANIFEST_NAME, Manifest, is_protected
+from core.snapshots import SnapshotStore
+from lib.logger import get_logger
+
+if TYPE_CHECKING:
+    from core.validator import Settings
+
+logger = get_logger("Preflight")
+
+# Margen de espacio libre exigido por encima de lo estimado en cada volumen
+SPACE_MARGIN_BYTES = 100 * 1024 * 1024
+
+# Comprobaciones superadas recientemente: clave -> (instante, resultado)
+_results_cache: Dict[Hashable, Tuple[float, "CheckResult"]] = {}
+_results_lock = threading.Lock()
+
+# Tamaño publicado de cada paquete: URL -> bytes (una URL versionada no cambia de contenido)
+_package_sizes: Dict[str, int] = {}
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+
+def _existing_parent(path: str) -> str:
+    """
+    La propia ruta o su ancestro más cercano que exista (donde se crearía la carpeta).
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def clear_cache() -> None:
+    """
+    Olvida las comprobaciones superadas (p. ej. tras recargar la configuración).
+    """
+    with _results_lock:
+        _results_cache.clear()
+        _package_sizes.clear()
+
+
+class CheckResult:
+    """
+    Resultado de una comprobación previa.
+    - name: "dns:<host>", "connect:<host>:<puerto>", "download_sources", "permissions",
+      "disk_space" o "version_server".
+    - reason: motivo del fallo, o detalle informativo si la comprobación se superó.
+    """
+
+    def __init__(self, name: str, ok: bool, reason: str = "", elapsed: float = 0.0, cached: bool = False):
+        self.name = name
+        self.ok = ok
+        self.reason = reason
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def kind(self) -> str:
+        return self.name.split(":", 1)[0]
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ok": self.ok,
+            "reason": self.reason,
+            "elapsed": round(self.elapsed, 3),
+            "cached": self.cached,
+        }
+
+
+class Preflight:
+    """
+    Comprobaciones previas a una actualización, ejecutadas a la vez y con un único
+    plazo total:
+    - DNS y conexión TCP (y TLS en https) con cada servidor configurado; con espejos
+      de descarga basta con que responda uno de ellos o el servidor principal.
+    - Permiso de escritura en las carpetas de despliegue, descarga y respaldo.
+    - Espacio libre frente al tamaño del paquete más el del respaldo.
+    - Respuesta del servidor de versiones.
+    Cada comprobación corre en su propio hilo (de tipo daemon: una resolución DNS
+    colgada no retrasa el fin del proceso); la que no termina dentro del plazo se
+    informa como fallida. Las comprobaciones superadas se reutilizan durante 'ttl'
+    segundos, de modo que el modo servicio o la flota no las repiten en cada consulta.
+    """
+
+    def __init__(self, settings: "Settings", timeout: Optional[float] = None, ttl: Optional[float] = None):
+        """
+        Inicializa las comprobaciones con:
+        - settings: configuración validada del destino.
+        - timeout: plazo total en segundos; por defecto settings.preflight_timeout.
+        - ttl: segundos durante los que se reutiliza una comprobación superada
+          (0 para no reutilizar); por defecto settings.preflight_ttl.
+        """
+        self.settings = settings
+        self.timeout = settings.preflight_timeout if timeout is None else timeout
+        self.ttl = settings.preflight_ttl if ttl is None else ttl
+        self.deadline = 0.0
+        self.remote_version = ""
+        self._version_done: Optional[Future] = None
+
+    def _remaining(self) -> float:
+        return max(0.1, self.deadline - time.monotonic())
+
+    @staticmethod
+    def _server(url: str) -> Optional[Tuple[str, str, int]]:
+        parsed = urlparse(url)
+        if not parsed.hostname:
+            return None
+        return parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80)
+
+    def _download_urls(self) -> List[str]:
+        settings = self.settings
+        return [url for url in (settings.download_url_template, settings.checksum_url_template,
+                                settings.delta_url_template) if url]
+
+    def _servers(self) -> List[Tuple[str, str, int]]:
+        """
+        Servidores distintos (esquema, host, puerto) de las URL configuradas.
+        Con espejos de descarga, los servidores de descarga no son obligatorios:
+        basta con que responda alguna fuente (ver _check_download_sources).
+        """
+        urls = [self.settings.remote_version_url]
+        if not self.settings.download_mirrors:
+            urls += self._download_urls()
+        servers = []
+        for url in urls:
+            server = self._server(url)
+            if server and server not in servers:
+                servers.append(server)
+        return servers
+
+    def _checks(self) -> List[Tuple[str, Hashable, Callable[[], str]]]:
+        """
+        Comprobaciones a ejecutar: (nombre, clave de caché, función). La función
+        retorna un detalle informativo o lanza una excepción con el motivo del fallo.
+        """
+        settings = self.settings
+        checks = []
+        for scheme, host, port in self._servers():
+            checks.append((f"dns:{host}", ("dns", host), lambda host=host: self._check_dns(host)))
+            checks.append((f"connect:{host}:{port}", ("connect", scheme, host, port),
+                           lambda scheme=scheme, host=host, port=port: self._check_connect(scheme, host, port)))
+
+        if settings.download_mirrors:
+            sources = tuple(self._download_urls() + list(settings.download_mirrors))
+            checks.append(("download_sources", ("download_sources", sources),
+                           lambda: self._check_download_sources(sources)))
+
+        folders = self._writable_folders()
+        checks.append(("permissions", ("permissions", tuple(folders)), lambda: self._check_permissions(folders)))
+        checks.append(("version_server", ("version_server", settings.remote_version_url), self._check_version_server))
+        # El espacio depende del tamaño del paquete (conocido tras consultar la versión); no se reutiliza
+        checks.append(("disk_space", None, self._check_disk_space))
+        return checks
+
+    def run(self, kinds: Optional[Tuple[str, ...]] = None) -> List[CheckResult]:
+        """
+        Ejecuta las comprobaciones (todas, o solo las de los tipos indicados, e.g. ("dns",))
+        y retorna un resultado por comprobación. Los fallos se registran en cuanto ocurren.
+        """
+        started = time.monotonic()
+        self.deadline = started + self.timeout
+        checks = [check for check in self._checks() if not kinds or check[0].split(":", 1)[0] in kinds]
+
+        futures: Dict[Future, str] = {}
+        results: Dict[str, CheckResult] = {}
+        for name, key, function in checks:
+            cached = self._cached(key)
+            if cached is not None:
+                results[name] = cached
+                if name == "version_server":
+                    self.remote_version = cached.reason
+                continue
+
+            future: Future = Future()
+            if name == "version_server":
+                self._version_done = future
+            futures[future] = name
+            thread = threading.Thread(target=self._execute, args=(future, name, key, function),
+                                      name=f"preflight-{name}", daemon=True)
+            thread.start()
+
+        pending = set(futures)
+        while pending:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[result.name] = result
+                if not result.ok:
+                    logger.error(f"Comprobación previa fallida: {result.name}: {result.reason}",
+                                 extra={"check": result.name, "reason": result.reason})
+
+        for future in pending:
+            name = futures[future]
+            results[name] = CheckResult(name, False, f"sin respuesta en el plazo de {self.timeout:g} s",
+                                        time.monotonic() - started)
+            logger.error(f"Comprobación previa fallida: {name}: {results[name].reason}",
+                         extra={"check": name, "reason": results[name].reason})
+
+        ordered = [results[name] for name, _, _ in checks]
+        failed = sum(1 for result in ordered if not result.ok)
+        logger.info(f"Comprobaciones previas: {len(ordered) - failed} correctas, {failed} fallidas "
+                    f"en {time.monotonic() - started:.2f} s.")
+        return ordered
+
+    def _cached(self, key: Optional[Hashable]) -> Optional[CheckResult]:
+        if key is None or self.ttl <= 0:
+            return None
+        with _results_lock:
+            entry = _results_cache.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        result = entry[1]
+        return CheckResult(result.name, True, result.reason, 0.0, cached=True)
+
+    def _execute(self, future: Future, name: str, key: Optional[Hashable], function: Callable[[], str]) -> None:
+        started = time.monotonic()
+        try:
+            result = CheckResult(name, True, function() or "", time.monotonic() - started)
+        except Exception as e:
+            result = CheckResult(name, False, str(e) or type(e).__name__, time.monotonic() - started)
+
+        if result.ok:
+            logger.debug(f"Comprobación previa correcta: {name} ({result.elapsed * 1000:.0f} ms) {result.reason}")
+            if key is not None and self.ttl > 0:
+                with _results_lock:
+                    _results_cache[key] = (time.monotonic(), result)
+        future.set_result(result)
+
+    @staticmethod
+    def _check_dns(host: str) -> str:
+        try:
+            addresses = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+        except socket.gaierror as e:
+            raise RuntimeError(f"no se puede resolver {host}: {e}")
+        return ", ".join(sorted({address[4][0] for address in addresses}))
+
+    def _check_connect(self, scheme: str, host: str, port: int) -> str:
+        try:
+            with socket.create_connection((host, port), timeout=self._remaining()) as sock:
+                if scheme != "https":
+                    return f"TCP {host}:{port}"
+                import ssl
+                context = ssl.create_default_context()
+                with context.wrap_socket(sock, server_hostname=host) as tls:
+                    return f"{tls.version()} {host}:{port}"
+        except socket.timeout:
+            raise RuntimeError(f"tiempo agotado conectando con {host}:{port}")
+        except OSError as e:
+            raise RuntimeError(f"no se puede conectar con {host}:{port}: {e}")
+
+    def _check_download_sources(self, sources: Tuple[str, ...]) -> str:
+        """
+        Con espejos basta una fuente de descarga disponible: conexión con un servidor
+        HTTP o carpeta local/compartida accesible. Se prueban todas a la vez.
+        """
+        from core.mirrors import is_local, local_path
+
+        reachable: List[str] = []
+        errors: List[str] = []
+        lock = threading.Lock()
+        finished = threading.Event()
+
+        def attempt(source: str) -> None:
+            try:
+                if is_local(source):
+                    folder = os.path.dirname(local_path(source)) if "{" in source else local_path(source)
+                    if not os.path.isdir(folder):
+                        raise RuntimeError(f"carpeta no accesible: {folder}")
+                    detail = folder
+                else:
+                    server = self._server(source)
+                    if not server:
+                        raise RuntimeError(f"URL inválida: {source}")
+                    detail = self._check_connect(*server)
+                with lock:
+                    reachable.append(detail)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            with lock:
+                # Termina con la primera fuente disponible o cuando todas fallaron
+                if reachable or len(errors) == len(sources):
+                    finished.set()
+
+        for source in sources:
+            threading.Thread(target=attempt, args=(source,), name="preflight-source", daemon=True).start()
+        finished.wait(self._remaining())
+        with lock:
+            reachable, errors = list(reachable), list(errors)
+        if not reachable:
+            raise RuntimeError("ninguna fuente de descarga disponible: " + "; ".join(errors))
+        return ", ".join(reachable)
+
+    def _writable_folders(self) -> List[str]:
+        settings = self.settings
+        folders = [settings.deploy_folder, settings.download_folder, settings.get_backup_folder()]
+        if settings.swap_install:
+            # La instalación por intercambio renombra la carpeta de despliegue dentro de su carpeta padre
+            folders.append(os.path.dirname(os.path.abspath(settings.deploy_folder)))
+        if settings.cache_folder:
+            folders.append(settings.cache_folder)
+
+        unique = []
+        for folder in folders:
+            folder = _existing_parent(folder)
+            if folder not in unique:
+                unique.append(folder)
+        return unique
+
+    @staticmethod
+    def _check_permissions(folders: List[str]) -> str:
+        """
+        Crea y elimina un archivo temporal en cada carpeta (os.access no refleja las ACL de Windows).
+        """
+        denied = []
+        for folder in folders:
+            try:
+                fd, path = tempfile.mkstemp(prefix=".preflight_", dir=folder)
+                os.close(fd)
+                os.remove(path)
+            except OSError as e:
+                denied.append(f"{folder} ({e.strerror or e})")
+        if denied:
+            raise RuntimeError("sin permiso de escritura en: " + ", ".join(denied))
+        return f"{len(folders)} carpetas con permiso de escritura"
+
+    def _check_version_server(self) -> str:
+        """
+        Consulta la versión remota (con la misma caché HTTP que el agente, que así
+        recibe un 304) y el tamaño del paquete de esa versión.
+        """
+        from core.updater import Updater
+        from lib.http_session import get_session
+
+        settings = self.settings
+        updater = Updater(settings.remote_version_url, settings.version_file,
+                          http_cache_file=settings.get_http_cache_file())
+        version = updater.get_remote_version()
+        if version == "0.0.0":
+            raise RuntimeError(f"el servidor de versiones no respondió: {settings.remote_version_url}")
+        self.remote_version = version
+
+        package_url = settings.download_url_template.format(version)
+        try:
+            response = get_session().head(package_url, allow_redirects=True, timeout=self._remaining())
+            if response.ok and response.headers.get("Content-Length"):
+                with _results_lock:
+                    _package_sizes[package_url] = int(response.headers["Content-Length"])
+        except Exception as e:
+            logger.debug(f"No se pudo obtener el tamaño del paquete {version}: {e}")
+        return version
+
+    @property
+    def package_size(self) -> Optional[int]:
+        """
+        Tamaño del paquete de la versión remota, si el servidor lo publicó.
+        """
+        if not self.remote_version:
+            return None
+        with _results_lock:
+            return _package_sizes.get(self.settings.download_url_template.format(self.remote_version))
+
+    def _installed_files(self) -> Dict[str, Dict]:
+        """
+        Archivos instalados (sin 'Data') según el manifiesto instalado; si no existe,
+        recorriendo la carpeta de despliegue.
+        """
+        deploy_folder = self.settings.deploy_folder
+        manifest = Manifest.load(os.path.join(deploy_folder, INSTALLED_MANIFEST_NAME))
+        if manifest:
+            return {path: entry for path, entry in manifest.files.items() if not is_protected(path)}
+
+        files = {}
+        for folder, dirs, names in os.walk(deploy_folder):
+            relative_folder = os.path.relpath(folder, deploy_folder)
+            if relative_folder != "." and is_protected(relative_folder):
+                dirs[:] = []
+                continue
+            for name in names:
+                try:
+                    files[os.path.join(relative_folder, name)] = {"size": os.path.getsize(os.path.join(folder, name))}
+                except OSError:
+                    continue
+        return files
+
+    def _update_pending(self) -> Optional[bool]:
+        """
+        Indica si la versión remota es posterior a la instalada; None si no se sabe
+        (versión remota sin consultar a mitad de plazo o actualización por componentes).
+        """
+        from core.updater import Updater
+        from lib.semver import is_newer
+
+        if self._version_done is not None:
+            try:
+                self._version_done.result(timeout=max(0.0, self.deadline - self.timeout / 2 - time.monotonic()))
+            except Exception:
+                pass
+        if self.settings.components_url or not self.remote_version:
+            return None
+        local_version = Updater(self.settings.remote_version_url, self.settings.version_file).get_local_version()
+        try:
+            return is_newer(self.remote_version, local_version)
+        except ValueError:
+            # El agente no actualiza a una versión que no puede comparar
+            return False
+
+    def _check_disk_space(self) -> str:
+        """
+        Estima el espacio necesario en cada volumen y lo compara con el libre:
+        - Descarga: tamaño del paquete (o de la instalación actual si no se conoce).
+        - Despliegue: tamaño de la instalación actual (la versión nueva se escribe antes
+          de retirar la anterior; estimación conservadora).
+        - Respaldo: archivos instalados que aún no están en el almacén de snapshots.
+        Solo se exige cuando hay una actualización pendiente: sin ella no se descarga
+        ni se respalda nada, y un disco casi lleno no debe hacer fallar cada consulta.
+        Si no se sabe (actualización por componentes) se estima igualmente.
+        """
+        settings = self.settings
+        pending = self._update_pending()
+        if pending is False:
+            return f"sin actualización pendiente (versión remota {self.remote_version})"
+        if pending is None and not settings.components_url:
+            return "versión remota desconocida, no se estima el espacio"
+
+        installed = self._installed_files()
+        installed_bytes = sum(entry.get("size", 0) for entry in installed.values())
+
+        # Sin tamaño publicado se estima con la instalación actual
+        package_size = self.package_size
+        package_bytes = package_size if package_size is not None else installed_bytes
+
+        backup_folder = settings.get_backup_folder()
+        backup_bytes = SnapshotStore(backup_folder).pending_bytes(installed) if SnapshotStore.is_store(
+            backup_folder) else installed_bytes
+
+        # Varias carpetas pueden compartir volumen: se suman sus necesidades
+        volumes: Dict[int, Dict] = {}
+        for folder, needed in ((settings.download_folder, package_bytes), (settings.deploy_folder, installed_bytes),
+                               (backup_folder, backup_bytes)):
+            existing = _existing_parent(folder)
+            volume = volumes.setdefault(os.stat(existing).st_dev, {"folder": existing, "needed": 0})
+            volume["needed"] += needed
+
+        short, details = [], []
+        for volume in volumes.values():
+            free = shutil.disk_usage(volume["folder"]).free
+            needed = volume["needed"] + SPACE_MARGIN_BYTES
+            details.append(f"{volume['folder']}: {_format_bytes(free)} libres")
+            if free < needed:
+                short.append(f"{volume['folder']} necesita {_format_bytes(needed)} y hay {_format_bytes(free)} libres")
+        if short:
+            raise RuntimeError("espacio insuficiente: " + "; ".join(short))
+        return ", ".join(details)
+
+
+if __name__ == "__main__":
+    # Prueba manual: comprobaciones previas con la configuración local
+    from core.validator import Validator
+
+    validator = Validator("config/settings.json")
+    if validator.load_settings():
+        for check in Preflight(validator.settings).run():
+            print(f"[Preflight] {'OK ' if check.ok else 'ERR'} {check.name:<30} {check.elapsed:6.2f}s  {check.reason}")
@@ -0,0 +1,285 @@
+# core/snapshots.py
+
+import os
+import json
+import shutil
+import time
+from typing import Dict, List, Optional
+
+from core.manifest import Manifest, INSTALLED_MANIFEST_NAME, TEMP_SUFFIXES, is_protected, normalize_path
+from lib.utils import calculate_sha256
+from lib.logger import get_logger
+
+logger = get_logger("Snapshots")
+
+
+class SnapshotStore:
+    """
+    Almacén de respaldos deduplicado por contenido.
+    - Cada archivo se guarda una sola vez en 'objects/' identificado por su SHA-256.
+    - Cada snapshot es un índice JSON en 'snapshots/' (ruta -> tamaño, hash, mtime).
+    - Un nuevo snapshot solo copia los archivos que cambiaron desde el anterior.
+    - Se conservan las últimas N generaciones según la política de retención.
+    La carpeta 'Data' queda fuera del respaldo: la actualización nunca la modifica.
+    """
+
+    def __init__(self, root: str, retention: int = 3):
+        """
+        Inicializa el almacén con:
+        - root: carpeta raíz del almacén de snapshots.
+        - retention: cantidad de snapshots a conservar (mínimo 1).
+        """
+        self.root = root
+        self.retention = max(1, retention)
+        self.objects_folder = os.path.join(root, "objects")
+        self.snapshots_folder = os.path.join(root, "snapshots")
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        """
+        Indica si la carpeta ya es un almacén de snapshots (y no un respaldo completo heredado).
+        """
+        return os.path.isdir(os.path.join(path, "snapshots"))
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_folder, sha256[:2], sha256)
+
+    def object_for(self, sha256: str) -> Optional[str]:
+        """
+        Ruta del contenido con ese SHA-256 en el almacén, o None si no está guardado.
+        """
+        path = self._object_path(sha256)
+        return path if sha256 and os.path.isfile(path) else None
+
+    def _snapshot_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshots_folder, f"{snapshot_id}.json")
+
+    def _load(self, snapshot_id: str) -> Optional[Dict]:
+        path = self._snapshot_path(snapshot_id)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _new_id(self, version: str) -> str:
+        base = time.strftime("%Y%m%d-%H%M%S")
+        if version:
+            base = f"{base}_{version}"
+        snapshot_id, counter = base, 1
+        while os.path.exists(self._snapshot_path(snapshot_id)):
+            counter += 1
+            snapshot_id = f"{base}-{counter}"
+        return snapshot_id
+
+    def _store_object(self, source: str, sha256: str) -> None:
+        destination = self._object_path(sha256)
+        if os.path.exists(destination):
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp_path = destination + ".tmp"
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, destination)
+
+    def list_snapshots(self) -> List[Dict]:
+        """
+        Retorna el resumen de los snapshots existentes ordenados del más antiguo al más reciente.
+        """
+        if not os.path.isdir(self.snapshots_folder):
+            return []
+
+        snapshots = []
+        for name in sorted(os.listdir(self.snapshots_folder)):
+            if not name.endswith(".json"):
+                continue
+            data = self._load(name[:-len(".json")])
+            if not data:
+                continue
+            snapshots.append({
+                "id": data["id"],
+                "created": data["created"],
+                "version": data.get("version", ""),
+                "files": len(data["files"]),
+                "bytes": sum(entry["size"] for entry in data["files"].values()),
+            })
+        snapshots.sort(key=lambda s: (s["created"], s["id"]))
+        return snapshots
+
+    def pending_bytes(self, files: Dict[str, Dict]) -> int:
+        """
+        Bytes que un nuevo snapshot de estos archivos (ruta -> tamaño y hash) tendría
+        que copiar: los que aún no están en el almacén. Solo se deduplican los hashes
+        conocidos; cada archivo sin hash cuenta completo.
+        """
+        pending, seen = 0, set()
+        for entry in files.values():
+            sha256 = entry.get("sha256", "")
+            if not sha256:
+                pending += entry.get("size", 0)
+                continue
+            if sha256 in seen:
+                continue
+            seen.add(sha256)
+            if not os.path.exists(self._object_path(sha256)):
+                pending += entry.get("size", 0)
+        return pending
+
+    def create(self, source_folder: str, version: str = "") -> Optional[str]:
+        """
+        Crea un snapshot de la carpeta indicada.
+        Los archivos cuyo tamaño y mtime coinciden con el snapshot anterior reutilizan
+        su hash sin leerse; solo los archivos nuevos o modificados se copian al almacén.
+        Retorna el identificador del snapshot o None si falla.
+        """
+        try:
+            if not os.path.isdir(source_folder):
+                logger.warning(f"Carpeta de origen no encontrada: {source_folder}")
+                return None
+
+            previous = self.list_snapshots()
+            previous_files = self._load(previous[-1]["id"])["files"] if previous else {}
+
+            files, copied = {}, 0
+            for folder, dirs, names in os.walk(source_folder):
+                relative_folder = os.path.relpath(folder, source_folder)
+                if relative_folder != "." and is_protected(relative_folder):
+                    dirs[:] = []
+                    continue
+
+                for name in names:
+                    local_path = os.path.join(folder, name)
+                    path = normalize_path(os.path.normpath(os.path.join(relative_folder, name)))
+                    if path == INSTALLED_MANIFEST_NAME or is_protected(path):
+                        continue
+
+                    stat = os.stat(local_path)
+                    known = previous_files.get(path)
+                    if (known and known["size"] == stat.st_size
+                            and known["mtime_ns"] == stat.st_mtime_ns
+                            and os.path.exists(self._object_path(known["sha256"]))):
+                        sha256 = known["sha256"]
+                    else:
+                        sha256 = calculate_sha256(local_path)
+                        if not sha256:
+                            raise IOError(f"No se pudo leer el archivo: {local_path}")
+                        if not os.path.exists(self._object_path(sha256)):
+                            self._store_object(local_path, sha256)
+                            copied += 1
+
+                    files[path] = {"size": stat.st_size, "sha256": sha256, "mtime_ns": stat.st_mtime_ns}
+
+            snapshot_id = self._new_id(version)
+            os.makedirs(self.snapshots_folder, exist_ok=True)
+            tmp_path = self._snapshot_path(snapshot_id) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"id": snapshot_id, "created": time.time(), "version": version, "files": files}, f)
+            os.replace(tmp_path, self._snapshot_path(snapshot_id))
+
+            logger.info(f"Snapshot {snapshot_id} creado: {len(files)} archivos, {copied} copiados al almacén.")
+            self.prune()
+            return snapshot_id
+
+        except Exception as e:
+            logger.error(f"Error creando snapshot: {e}")
+            return None
+
+    def restore(self, snapshot_id: str, target_folder: str) -> bool:
+        """
+        Restaura un snapshot sobre la carpeta indicada.
+        Solo se reescriben los archivos que difieren del snapshot y se eliminan los
+        que no forman parte de él: el snapshot recoge el árbol completo, así que
+        cualquier otro archivo lo añadió después una instalación (quizá a medias y
+        sin manifiesto). 'Data' y los temporales en curso no se modifican.
+        """
+        try:
+            data = self._load(snapshot_id)
+            if not data:
+                logger.warning(f"Snapshot no encontrado: {snapshot_id}")
+                return False
+
+            installed_path = os.path.join(target_folder, INSTALLED_MANIFEST_NAME)
+            target = Manifest(data.get("version", ""), data["files"])
+            plan = target.diff(target_folder, Manifest.load(installed_path))
+
+            for path in plan.to_write:
+                destination = os.path.join(target_folder, *path.split("/"))
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                tmp_path = destination + ".tmp_restore"
+                shutil.copy2(self._object_path(data["files"][path]["sha256"]), tmp_path)
+                os.replace(tmp_path, destination)
+
+            deleted = self._remove_extra(target_folder, data["files"])
+
+            # Registrar el estado restaurado como manifiesto instalado
+            files = {}
+            for path, entry in data["files"].items():
+                stat = os.stat(os.path.join(target_folder, *path.split("/")))
+                files[path] = {"size": entry["size"], "sha256": entry["sha256"], "mtime_ns": stat.st_mtime_ns}
+            Manifest(target.version, files).save(installed_path)
+
+            logger.info(f"Snapshot {snapshot_id} restaurado: {len(plan.to_write)} archivos escritos, "
+                        f"{deleted} eliminados.")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error restaurando snapshot {snapshot_id}: {e}")
+            return False
+
+    @staticmethod
+    def _remove_extra(target_folder: str, files: Dict[str, Dict]) -> int:
+        """
+        Elimina los archivos de la carpeta que no están en el snapshot (sin tocar 'Data',
+        el manifiesto instalado ni los temporales) y las carpetas que quedan vacías por ello.
+        Retorna la cantidad de archivos eliminados.
+        """
+        root = os.path.normpath(target_folder)
+        deleted, touched = 0, set()
+        for folder, dirs, names in os.walk(root):
+            relative_folder = os.path.relpath(folder, root)
+            if relative_folder == ".":
+                dirs[:] = [d for d in dirs if not is_protected(d)]
+
+            for name in names:
+                path = normalize_path(os.path.normpath(os.path.join(relative_folder, name)))
+                if path in files or path == INSTALLED_MANIFEST_NAME or name.endswith(TEMP_SUFFIXES):
+                    continue
+                os.remove(os.path.join(folder, name))
+                deleted += 1
+                touched.add(folder)
+
+        # Carpetas vaciadas por la limpieza, de la más profunda hacia la raíz
+        for folder in sorted(touched, key=len, reverse=True):
+            while folder != root and os.path.isdir(folder) and not os.listdir(folder):
+                os.rmdir(folder)
+                folder = os.path.dirname(folder)
+        return deleted
+
+    def get_version(self, snapshot_id: str) -> str:
+        """
+        Retorna la versión registrada en un snapshot o cadena vacía si no existe.
+        """
+        data = self._load(snapshot_id)
+        return data.get("version", "") if data else ""
+
+    def prune(self) -> None:
+        """
+        Aplica la política de retención: elimina los snapshots más antiguos
+        y los objetos que ya no son referenciados por ningún snapshot.
+        """
+        snapshots = self.list_snapshots()
+        for snapshot in snapshots[:-self.retention]:
+            os.remove(self._snapshot_path(snapshot["id"]))
+            logger.info(f"Snapshot eliminado por retención: {snapshot['id']}")
+
+        referenced = set()
+        for snapshot in snapshots[-self.retention:]:
+            referenced.update(entry["sha256"] for entry in self._load(snapshot["id"])["files"].values())
+
+        if not os.path.isdir(self.objects_folder):
+            return
+        for prefix in os.listdir(self.objects_folder):
+            prefix_folder = os.path.join(self.objects_folder, prefix)
+            for name in os.listdir(prefix_folder):
+                if name not in referenced:
+                    os.remove(os.path.join(prefix_folder, name))
+            if not os.listdir(prefix_folder):
+                os.rmdir(prefix_folder)
@@ -1,21 +1,42 @@
 # core/updater.py
 
 import os
+import json
+from typing import Dict, Optional
+
 import requests
 
+from lib.filelock import FileLock
+from lib.http_session import get_session
+from lib.semver import parse_version
+from lib.logger import get_logger
+
+logger = get_logger("Updater")
+
 
 class Updater:
     """
     Clase encargada de manejar la detección de actualizaciones de la aplicación ERP.
     Se conecta a un servidor remoto para comparar versiones y determinar si hay una nueva disponible.
+    - La versión remota se consulta una sola vez por ejecución (memoizada).
+    - Las consultas son condicionales (ETag / If-Modified-Since): si el servidor
+      responde 304 se reutiliza la última respuesta guardada en disco.
     """
 
-    def __init__(self, remote_version_url: str, version_file: str):
+    def __init__(self, remote_version_url: str, version_file: str,
+                 session: Optional[requests.Session] = None, http_cache_file: Optional[str] = None):
         """
-        Inicializa el Updater con la URL remota de versión y el archivo local de versión.
+        Inicializa el Updater con:
+        - remote_version_url: URL remota de versión.
+        - version_file: archivo local de versión.
+        - session: sesión HTTP a utilizar; por defecto la sesión compartida del proceso.
+        - http_cache_file: archivo JSON donde persistir ETag/Last-Modified y la última respuesta.
         """
         self.remote_version_url = remote_version_url
         self.version_file = version_file
+        self.session = session or get_session()
+        self.http_cache_file = http_cache_file
+        self._remote_version: Optional[str] = None
 
     def get_local_version(self) -> str:
         """
@@ -24,54 +45,149 @@ class Updater:
         """
         try:
             if not os.path.isfile(self.version_file):
-                print(f"[Updater] Archivo de versión local no encontrado: {self.version_file}")
+                logger.warning(f"Archivo de versión local no encontrado: {self.version_file}")
                 return "0.0.0"
 
             with open(self.version_file, 'r', encoding='utf-8') as f:
                 version = f.read().strip()
-                print(f"[Updater] Versión local detectada: {version}")
+                logger.info(f"Versión local detectada: {version}")
                 return version
 
         except Exception as e:
-            print(f"[Updater] Error leyendo versión local: {e}")
+            logger.error(f"Error leyendo versión local: {e}")
             return "0.0.0"
 
     def get_remote_version(self) -> str:
         """
         Obtiene la versión más reciente disponible desde el servidor remoto.
+        El resultado se memoiza para el resto de la ejecución.
         Retorna '0.0.0' si hay errores de conexión o de formato.
         """
+        if self._remote_version is None:
+            version = self._fetch_remote_version()
+            if version == "0.0.0":
+                return version
+            self._remote_version = version
+        return self._remote_version
+
+    def refresh(self) -> None:
+        """
+        Descarta la versión remota memoizada (para consultas periódicas).
+        """
+        self._remote_version = None
+
+    def _fetch_remote_version(self) -> str:
         try:
-            response = requests.get(self.remote_version_url, timeout=10)
-            response.raise_for_status()
-            version = response.text.strip()
-            print(f"[Updater] Versión remota detectada: {version}")
+            body = self._conditional_get(self.remote_version_url)
+            version = body.strip()
+            logger.info(f"Versión remota detectada: {version}")
             return version
 
         except requests.RequestException as e:
-            print(f"[Updater] Error de conexión al servidor de actualizaciones: {e}")
+            logger.error(f"Error de conexión al servidor de actualizaciones: {e}")
             return "0.0.0"
         except Exception as e:
-            print(f"[Updater] Error inesperado obteniendo versión remota: {e}")
+            logger.error(f"Error inesperado obteniendo versión remota: {e}")
             return "0.0.0"
 
+    def get_component_manifest(self, url: str) -> Optional[Dict]:
+        """
+        Obtiene el manifiesto de componentes (JSON) publicado en 'url', con la misma
+        consulta condicional que la versión remota.
+        Retorna None si hay errores de conexión o el contenido no es JSON.
+        """
+        try:
+            data = json.loads(self._conditional_get(url))
+            if not isinstance(data, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            logger.info(f"Manifiesto de componentes obtenido: {len(data.get('components') or [])} componentes.")
+            return data
+
+        except requests.RequestException as e:
+            logger.error(f"Error de conexión obteniendo el manifiesto de componentes: {e}")
+            return None
+        except ValueError as e:
+            logger.error(f"Manifiesto de componentes inválido en {url}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error inesperado obteniendo el manifiesto de componentes: {e}")
+            return None
+
+    def _conditional_get(self, url: str) -> str:
+        """
+        Realiza un GET condicional usando el ETag / Last-Modified guardados.
+        Ante un 304 retorna el cuerpo almacenado de la respuesta anterior.
+        """
+        cached = self._load_http_cache().get(url, {})
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=10)
+        if response.status_code == 304 and "body" in cached:
+            logger.info("Versión remota sin cambios (304), usando respuesta en caché.")
+            return cached["body"]
+        response.raise_for_status()
+
+        etag = response.headers.get("ETag", "")
+        last_modified = response.headers.get("Last-Modified", "")
+        if self.http_cache_file and (etag or last_modified):
+            self._save_http_cache(url, {"etag": etag, "last_modified": last_modified, "body": response.text})
+        return response.text
+
+    def _load_http_cache(self) -> Dict:
+        if not self.http_cache_file or not os.path.isfile(self.http_cache_file):
+            return {}
+        try:
+            with open(self.http_cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_http_cache(self, url: str, entry: Dict) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.http_cache_file) or ".", exist_ok=True)
+            with FileLock(self.http_cache_file + ".lock"):
+                data = self._load_http_cache()
+                data[url] = entry
+                tmp_path = self.http_cache_file + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.http_cache_file)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la caché HTTP: {e}")
+
     def is_update_available(self) -> bool:
         """
-        Compara la versión local y la remota.
+        Compara la versión local y la remota como versiones semánticas (1.10.0 > 1.9.0).
         Retorna True si la versión remota es mayor (hay actualización disponible).
         """
         local_version = self.get_local_version()
         remote_version = self.get_remote_version()
 
         if remote_version == "0.0.0":
-            print("[Updater] No se pudo determinar la versión remota, abortando comparación.")
+            logger.warning("No se pudo determinar la versión remota, abortando comparación.")
             return False
 
-        if remote_version > local_version:
-            print("[Updater] ¡Nueva actualización disponible!")
+        try:
+            remote = parse_version(remote_version)
+        except ValueError as e:
+            logger.error(f"La versión remota no es una versión válida, abortando comparación: {e}")
+            return False
+        try:
+            newer = remote > parse_version(local_version)
+        except ValueError:
+            # Una instalación con versión ilegible se reinstala con la versión publicada
+            logger.warning(f"Versión local no reconocida ({local_version!r}), se instalará la versión remota.")
+            newer = True
+
+        if newer:
+            logger.info("¡Nueva actualización disponible!")
             return True
         else:
-            print("[Updater] No hay actualizaciones disponibles.")
+            logger.info("No hay actualizaciones disponibles.")
             return False
 
 
@@ -2,15 +2,33 @@
 
 import os
 import json
-import socket
-from typing import Optional
-from pydantic import BaseModel, ValidationError
+import hashlib
+import dataclasses
+from typing import Any, Dict, List, Optional, Tuple
 
+from core.preflight import CheckResult, Preflight
+from lib.filelock import FileLock
+from lib.logger import get_logger
+from lib.utils import parse_window
 
-class Settings(BaseModel):
+logger = get_logger("Validator")
+
+# Caché de la configuración ya validada, junto al archivo de configuración
+SETTINGS_CACHE_NAME = ".settings_cache.json"
+
+# Configuraciones validadas en este proceso: ruta -> (mtime_ns, sha256, Settings)
+_settings_memo: Dict[str, Tuple[int, str, "Settings"]] = {}
+
+# Validador pydantic de Settings, creado la primera vez que se valida una configuración
+_settings_adapter = None
+
+
+@dataclasses.dataclass
+class Settings:
     """
     Modelo de datos para la configuración cargada desde settings.json.
-    Utiliza pydantic para validación automática.
+    Se valida con pydantic (ver validate_settings), que solo se importa cuando
+    hay que validar: una configuración ya validada se carga sin él.
     """
     version_file: str
     remote_version_url: str
@@ -18,6 +36,101 @@ class Settings(BaseModel):
     download_folder: str
     deploy_folder: str
     notify_type: str
+    backup_folder: Optional[str] = None
+    backup_retention: int = 3
+    download_connections: int = 4
+    download_segment_size: int = 8 * 1024 * 1024
+    download_retries: int = 5
+    download_backoff: float = 1.0
+    checksum_url_template: Optional[str] = None
+    require_checksum: bool = False
+    delta_url_template: Optional[str] = None
+    cache_folder: Optional[str] = None
+    cache_max_bytes: int = 10 * 1024 ** 3
+    http_cache_file: Optional[str] = None
+    poll_interval: int = 3600
+    poll_jitter: float = 0.1
+    poll_max_backoff: int = 6 * 3600
+    maintenance_window: Optional[str] = None
+    extract_workers: int = 4
+    stream_install: bool = False
+    swap_install: bool = True
+    metrics_folder: Optional[str] = None
+    preflight_timeout: float = 15.0
+    preflight_ttl: float = 60.0
+    download_rate_limit: Optional[str] = None
+    download_rate_profiles: Optional[Dict[str, str]] = None
+    components_url: Optional[str] = None
+    verify_index_file: Optional[str] = None
+    download_mirrors: Optional[List[str]] = None
+    mirror_health_file: Optional[str] = None
+    mirror_probe_ttl: float = 900.0
+    checksum_from_mirrors: bool = False
+    notify_webhook_url: Optional[str] = None
+    notify_json_file: Optional[str] = None
+    notify_syslog_address: Optional[str] = None
+    notify_coalesce_seconds: float = 2.0
+    notify_shutdown_timeout: float = 5.0
+
+    def get_http_cache_file(self) -> str:
+        """
+        Archivo de caché HTTP (ETag / Last-Modified); por defecto dentro de la carpeta de descarga.
+        """
+        return self.http_cache_file or os.path.join(self.download_folder, ".http_cache.json")
+
+    def get_verify_index_file(self) -> str:
+        """
+        Índice de hashes de la verificación de integridad; por defecto dentro de la carpeta de descarga.
+        """
+        return self.verify_index_file or os.path.join(self.download_folder, ".verify_index.json")
+
+    def get_mirror_health_file(self) -> str:
+        """
+        Salud de los espejos de descarga (latencia, caudal, fallos); por defecto dentro de la carpeta de descarga.
+        """
+        return self.mirror_health_file or os.path.join(self.download_folder, ".mirror_health.json")
+
+    def get_notify_json_file(self) -> str:
+        """
+        Archivo JSON de notificaciones (una línea por aviso); por defecto dentro de la carpeta de descarga.
+        """
+        return self.notify_json_file or os.path.join(self.download_folder, "notifications.jsonl")
+
+    def get_backup_folder(self) -> str:
+        """
+        Carpeta del almacén de respaldos; por defecto junto a la carpeta de despliegue.
+        """
+        if self.backup_folder:
+            return self.backup_folder
+        return os.path.normpath(self.deploy_folder) + "_Backup"
+
+
+def validate_settings(data: Dict[str, Any]) -> Settings:
+    """
+    Valida y convierte un diccionario de configuración en Settings (las claves
+    desconocidas se ignoran). Lanza ValueError (ValidationError de pydantic) si no es válido.
+    """
+    global _settings_adapter
+    if _settings_adapter is None:
+        from pydantic import TypeAdapter
+        _settings_adapter = TypeAdapter(Settings)
+    settings = _settings_adapter.validate_python(data)
+    check_settings(settings)
+    return settings
+
+
+def check_settings(settings: Settings) -> None:
+    """
+    Comprobaciones de valores que el modelo no puede expresar (formatos de límites
+    y ventanas horarias), para que un error se detecte al cargar la configuración y
+    no en mitad de una actualización. Lanza ValueError si algún valor no es válido.
+    """
+    from lib.ratelimit import build_schedule
+    build_schedule(settings.download_rate_limit, settings.download_rate_profiles)
+    try:
+        parse_window(settings.maintenance_window)
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f"Ventana de mantenimiento inválida: {e}")
 
 
 class Validator:
@@ -26,13 +139,18 @@ class Validator:
     antes de ejecutar cualquier operación en el sistema.
     """
 
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, use_cache: bool = True):
         """
-        Inicializa el validador con la ruta al archivo de configuración.
+        Inicializa el validador con:
+        - config_path: ruta al archivo de configuración.
+        - use_cache: reutilizar la configuración validada anteriormente si el archivo
+          no cambió (mismo mtime y mismo hash de contenido).
         """
         self.config_path = config_path
+        self.use_cache = use_cache
         self.settings: Optional[Settings] = None
-        print(f"[Validator] Inicializando con configuración en: {self.config_path}")
+        self.preflight: List[CheckResult] = []
+        logger.info(f"Inicializando con configuración en: {self.config_path}")
 
     def load_settings(self) -> bool:
         """
@@ -41,23 +159,90 @@ class Validator:
         """
         try:
             if not os.path.isfile(self.config_path):
-                print(f"[Validator] Archivo de configuración no encontrado: {self.config_path}")
+                logger.error(f"Archivo de configuración no encontrado: {self.config_path}")
                 return False
 
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(self.config_path, 'rb') as f:
+                raw = f.read()
+            mtime_ns = os.stat(self.config_path).st_mtime_ns
+            sha256 = hashlib.sha256(raw).hexdigest()
 
-            self.settings = Settings(**data)
-            print("[Validator] Configuración cargada correctamente.")
+            cached = self._cached_settings(mtime_ns, sha256) if self.use_cache else None
+            if cached is not None:
+                self.settings = cached
+                logger.info("Configuración cargada desde la caché de configuración validada.")
+                return True
+
+            self.settings = validate_settings(json.loads(raw.decode('utf-8')))
+            if self.use_cache:
+                self._store_settings(mtime_ns, sha256)
+            logger.info("Configuración cargada correctamente.")
             return True
 
-        except (FileNotFoundError, json.JSONDecodeError, ValidationError) as e:
-            print(f"[Validator] Error cargando o validando configuración: {e}")
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"Error cargando o validando configuración: {e}")
             return False
         except Exception as e:
-            print(f"[Validator] Error inesperado al cargar configuración: {e}")
+            logger.error(f"Error inesperado al cargar configuración: {e}")
             return False
 
+    @property
+    def settings_cache_path(self) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(self.config_path)), SETTINGS_CACHE_NAME)
+
+    @staticmethod
+    def _schema_key() -> str:
+        # Una versión del agente con otros campos no debe reutilizar la caché anterior
+        return ",".join(sorted(field.name for field in dataclasses.fields(Settings)))
+
+    def _cached_settings(self, mtime_ns: int, sha256: str) -> Optional[Settings]:
+        """
+        Configuración validada anteriormente para este mismo contenido, sin volver a validar.
+        Primero se consulta la memoria del proceso y luego la caché en disco.
+        """
+        key = os.path.abspath(self.config_path)
+        memo = _settings_memo.get(key)
+        if memo and memo[0] == mtime_ns and memo[1] == sha256:
+            return memo[2]
+
+        try:
+            with open(self.settings_cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            entry = cache.get(key)
+            if (not entry or entry["mtime_ns"] != mtime_ns or entry["sha256"] != sha256
+                    or entry["schema"] != self._schema_key()):
+                return None
+            settings = Settings(**entry["settings"])
+            check_settings(settings)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        _settings_memo[key] = (mtime_ns, sha256, settings)
+        return settings
+
+    def _store_settings(self, mtime_ns: int, sha256: str) -> None:
+        """
+        Guarda la configuración recién validada. Si la carpeta no admite escritura
+        simplemente no hay caché en la próxima ejecución.
+        """
+        key = os.path.abspath(self.config_path)
+        _settings_memo[key] = (mtime_ns, sha256, self.settings)
+        try:
+            with FileLock(self.settings_cache_path + ".lock", timeout=5):
+                try:
+                    with open(self.settings_cache_path, 'r', encoding='utf-8') as f:
+                        cache = json.load(f)
+                except (OSError, ValueError):
+                    cache = {}
+                cache[key] = {"mtime_ns": mtime_ns, "sha256": sha256, "schema": self._schema_key(),
+                              "settings": dataclasses.asdict(self.settings)}
+                tmp_path = self.settings_cache_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, self.settings_cache_path)
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"No se pudo guardar la caché de configuración: {e}")
+
     def check_folders(self) -> bool:
         """
         Verifica la existencia de las carpetas necesarias (descarga y despliegue).
@@ -74,56 +259,70 @@ class Validator:
 
             for folder in folders:
                 if not os.path.exists(folder):
-                    print(f"[Validator] Carpeta no encontrada, creando: {folder}")
+                    logger.warning(f"Carpeta no encontrada, creando: {folder}")
                     os.makedirs(folder, exist_ok=True)
 
-            print("[Validator] Carpetas verificadas/correctas.")
+            logger.info("Carpetas verificadas/correctas.")
             return True
 
         except Exception as e:
-            print(f"[Validator] Error verificando o creando carpetas: {e}")
+            logger.error(f"Error verificando o creando carpetas: {e}")
             return False
 
-    def check_server_connectivity(self) -> bool:
+    def run_preflight(self, kinds: Optional[Tuple[str, ...]] = None) -> bool:
         """
-        Verifica que haya conectividad al servidor de actualizaciones (resuelve DNS).
+        Ejecuta a la vez las comprobaciones previas (DNS, conexión, permisos, espacio
+        y servidor de versiones) con el plazo total de la configuración.
+        Los resultados quedan en self.preflight con el motivo de cada fallo.
         """
         try:
             if not self.settings:
                 raise ValueError("Configuración no cargada.")
 
-            # Extraer el hostname del URL remoto
-            host = self.settings.remote_version_url.replace('https://', '').replace('http://', '').split('/')[0]
-            socket.gethostbyname(host)
-            print(f"[Validator] Conexión exitosa a {host}")
-            return True
+            self.preflight = Preflight(self.settings).run(kinds)
+            return all(check.ok for check in self.preflight)
 
-        except socket.gaierror:
-            print(f"[Validator] Error: No se puede resolver el nombre del servidor.")
-            return False
         except Exception as e:
-            print(f"[Validator] Error verificando conectividad: {e}")
+            logger.error(f"Error en las comprobaciones previas: {e}")
+            return False
+
+    def check_server_connectivity(self) -> bool:
+        """
+        Verifica que haya conectividad a los servidores de actualizaciones
+        (resolución DNS y conexión TCP/TLS), dentro del plazo de comprobaciones previas.
+        """
+        return self.run_preflight(("dns", "connect"))
+
+    def validate_environment(self) -> bool:
+        """
+        Verifica el entorno para una configuración ya cargada:
+        - Verificar carpetas necesarias
+        - Comprobaciones previas concurrentes (conectividad, permisos, espacio, servidor de versiones)
+        """
+        if not self.check_folders():
             return False
 
+        if not self.run_preflight():
+            return False
+
+        return True
+
     def validate_all(self) -> bool:
         """
         Ejecuta la validación completa del sistema:
         - Cargar configuración
         - Verificar carpetas necesarias
-        - Verificar conectividad con servidor
+        - Comprobaciones previas concurrentes (conectividad, permisos, espacio, servidor de versiones)
         """
-        print("[Validator] Iniciando validación completa...")
+        logger.info("Iniciando validación completa...")
 
         if not self.load_settings():
             return False
 
-        if not self.check_folders():
-            return False
-
-        if not self.check_server_connectivity():
+        if not self.validate_environment():
             return False
 
-        print("[Validator] Validación completa exitosa.")
+        logger.info("Validación completa exitosa.")
         return True
 
 
@@ -0,0 +1,343 @@
+# core/verifier.py
+
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from core.components import COMPONENTS_INDEX_NAME, ComponentIndex, download_filename
+from core.manifest import INSTALLED_MANIFEST_NAME, TEMP_SUFFIXES, Manifest, normalize_path, is_protected
+from core.snapshots import SnapshotStore
+from lib.archive import ArchiveError, iter_package_stream
+from lib.filelock import FileLock
+from lib.utils import calculate_sha256
+from lib.zipstream import ZipStreamError
+from lib.logger import get_logger
+
+if TYPE_CHECKING:
+    from core.downloader import Downloader
+
+logger = get_logger("Verifier")
+
+
+class VerifyReport:
+    """
+    Resultado de verificar la carpeta de despliegue contra el manifiesto instalado:
+    - modified: archivos cuyo contenido no coincide con el instalado.
+    - missing: archivos instalados que ya no existen.
+    - extra: archivos presentes que no forman parte de la instalación (solo se informan).
+    """
+
+    def __init__(self):
+        self.modified: List[str] = []
+        self.missing: List[str] = []
+        self.extra: List[str] = []
+        self.files = 0
+        self.hashed = 0
+        self.hashed_bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def damaged(self) -> List[str]:
+        return sorted(self.modified + self.missing)
+
+    @property
+    def ok(self) -> bool:
+        return not self.modified and not self.missing
+
+    def to_dict(self) -> Dict:
+        return {
+            "ok": self.ok,
+            "files": self.files,
+            "hashed": self.hashed,
+            "hashed_bytes": self.hashed_bytes,
+            "seconds": round(self.seconds, 3),
+            "modified": sorted(self.modified),
+            "missing": sorted(self.missing),
+            "extra": sorted(self.extra),
+        }
+
+
+class Verifier:
+    """
+    Verifica la integridad de la carpeta de despliegue entre actualizaciones:
+    - Mantiene un índice persistente (ruta -> tamaño, mtime y SHA-256) y solo vuelve a
+      calcular el hash de los archivos cuyo tamaño o mtime cambió desde la última pasada.
+    - Los hashes pendientes se calculan en paralelo (bloques grandes o mmap).
+    - Compara contra el manifiesto instalado (o los de cada componente) y repara solo
+      los archivos modificados o ausentes, desde el almacén de snapshots o el paquete
+      de la versión instalada. 'Data' nunca se verifica ni se modifica.
+    """
+
+    def __init__(self, deploy_folder: str, index_file: str, workers: int = 4):
+        """
+        Inicializa el verificador con:
+        - deploy_folder: carpeta donde se encuentra el ERP instalado.
+        - index_file: archivo JSON del índice de hashes (fuera de la carpeta de despliegue).
+        - workers: hilos usados para calcular hashes en paralelo.
+        """
+        self.deploy_folder = deploy_folder
+        self.index_file = index_file
+        self.workers = max(1, workers)
+        # Ruta -> entrada del manifiesto instalado y origen de cada archivo (prefijo de componente)
+        self.expected: Dict[str, Dict] = {}
+        self.owners: Dict[str, str] = {}
+        # Prefijo ("" o "<carpeta>/") -> {"version": ..., "url": ...} para reparar desde el paquete
+        self.sources: Dict[str, Dict] = {}
+        self._index: Dict[str, Dict] = {}
+
+    def _local_path(self, path: str) -> str:
+        return os.path.join(self.deploy_folder, *path.split("/"))
+
+    def _load_expected(self) -> None:
+        """
+        Archivos de la instalación actual según el manifiesto instalado y, con
+        componentes, los manifiestos de cada subcarpeta.
+        """
+        self.expected, self.owners, self.sources = {}, {}, {}
+        components = ComponentIndex.load(os.path.join(self.deploy_folder, COMPONENTS_INDEX_NAME)).components
+        # Sin 'path' explícito, un componente se instala en la carpeta con su nombre
+        prefixes = {name: component.get("path", name) + "/" for name, component in components.items()}
+
+        root = Manifest.load(os.path.join(self.deploy_folder, INSTALLED_MANIFEST_NAME))
+        if root:
+            self.sources[""] = {"version": root.version}
+            for path, entry in root.files.items():
+                if not any(path.startswith(prefix) for prefix in prefixes.values()):
+                    self.expected[path] = entry
+                    self.owners[path] = ""
+
+        for name, component in components.items():
+            prefix = prefixes[name]
+            manifest = Manifest.load(self._local_path(prefix + INSTALLED_MANIFEST_NAME))
+            if not manifest:
+                logger.warning(f"Componente {name} sin manifiesto instalado, no se verifica.")
+                continue
+            self.sources[prefix] = {"name": name, "version": component.get("version", ""),
+                                    "url": component.get("url", ""), "sha256": component.get("sha256", "")}
+            for path, entry in manifest.files.items():
+                self.expected[prefix + path] = entry
+                self.owners[prefix + path] = prefix
+
+        for path in [path for path in self.expected if self._ignored(path)]:
+            del self.expected[path]
+
+    @staticmethod
+    def _ignored(path: str) -> bool:
+        name = path.rsplit("/", 1)[-1]
+        return (is_protected(path) or name == INSTALLED_MANIFEST_NAME or path == COMPONENTS_INDEX_NAME
+                or name.endswith(TEMP_SUFFIXES))
+
+    def _load_index(self) -> None:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Un índice de otra carpeta de despliegue no sirve para esta
+            same_folder = data.get("deploy_folder") == os.path.abspath(self.deploy_folder)
+            self._index = data.get("files", {}) if same_folder else {}
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _save_index(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+            with FileLock(self.index_file + ".lock", timeout=30):
+                tmp_path = self.index_file + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"deploy_folder": os.path.abspath(self.deploy_folder), "files": self._index}, f)
+                os.replace(tmp_path, self.index_file)
+        except (OSError, TimeoutError) as e:
+            logger.warning(f"No se pudo guardar el índice de verificación: {e}")
+
+    def _walk(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for folder, dirs, names in os.walk(self.deploy_folder):
+            relative_folder = os.path.relpath(folder, self.deploy_folder)
+            if relative_folder != "." and is_protected(normalize_path(relative_folder)):
+                dirs[:] = []
+                continue
+            for name in names:
+                path = normalize_path(os.path.normpath(os.path.join(relative_folder, name)))
+                if self._ignored(path):
+                    continue
+                try:
+                    found[path] = os.stat(os.path.join(folder, name))
+                except OSError as e:
+                    # Eliminado o renombrado durante el recorrido, o enlace roto: se informa como ausente
+                    logger.warning(f"No se pudo leer {path}: {e}")
+        return found
+
+    def scan(self, full: bool = False) -> VerifyReport:
+        """
+        Recorre la carpeta de despliegue y la compara con la instalación registrada.
+        - full: volver a calcular el hash de todos los archivos, aunque su tamaño
+          y mtime no hayan cambiado (detecta también corrupción silenciosa).
+        """
+        started = time.monotonic()
+        report = VerifyReport()
+        self._load_expected()
+        self._load_index()
+        if not self.expected:
+            logger.warning(f"No hay manifiesto instalado en {self.deploy_folder}; solo se indexará la carpeta.")
+
+        found = self._walk()
+        report.files = len(found)
+        hashes: Dict[str, str] = {}
+        to_hash: List[str] = []
+        for path, stat in found.items():
+            expected = self.expected.get(path)
+            if expected is None and self.expected:
+                report.extra.append(path)
+                continue
+            if expected is not None and stat.st_size != expected["size"]:
+                report.modified.append(path)
+                continue
+            known = self._index.get(path)
+            if (not full and known and known["size"] == stat.st_size
+                    and known["mtime_ns"] == stat.st_mtime_ns):
+                hashes[path] = known["sha256"]
+            else:
+                to_hash.append(path)
+
+        if to_hash:
+            logger.info(f"Calculando hash de {len(to_hash)} archivos con {self.workers} hilos...")
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="verify-hash") as pool:
+                for path, sha256 in zip(to_hash, pool.map(lambda path: calculate_sha256(self._local_path(path)),
+                                                          to_hash)):
+                    hashes[path] = sha256
+                    report.hashed += 1
+                    report.hashed_bytes += found[path].st_size
+
+        index = {}
+        for path, sha256 in hashes.items():
+            if sha256:
+                stat = found[path]
+                index[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+            expected = self.expected.get(path)
+            if expected is not None and sha256 != expected["sha256"]:
+                report.modified.append(path)
+        self._index = index
+        self._save_index()
+
+        report.missing = [path for path in self.expected if path not in found]
+        report.seconds = time.monotonic() - started
+        logger.info(f"Verificación: {report.files} archivos, {report.hashed} con hash recalculado "
+                    f"({report.hashed_bytes / (1024 * 1024):.1f} MiB), {len(report.modified)} modificados, "
+                    f"{len(report.missing)} ausentes, {len(report.extra)} adicionales en {report.seconds:.1f} s.")
+        return report
+
+    def _restore_file(self, path: str, source, expected_sha256: str) -> bool:
+        """
+        Escribe un archivo desde un flujo de bloques y solo lo reemplaza si su hash coincide.
+        El temporal se elimina ante cualquier error, también si falla la lectura del
+        flujo (p. ej. un paquete dañado), que se propaga a quien lo recorre.
+        """
+        destination = self._local_path(path)
+        tmp_path = destination + ".tmp_repair"
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        sha256 = hashlib.sha256()
+        replaced = False
+        try:
+            with open(tmp_path, 'wb') as target:
+                for chunk in source:
+                    target.write(chunk)
+                    sha256.update(chunk)
+            if sha256.hexdigest() != expected_sha256:
+                logger.warning(f"El contenido obtenido para {path} no coincide con el instalado.")
+                return False
+            os.replace(tmp_path, destination)
+            replaced = True
+        except OSError as e:
+            logger.error(f"Error reparando {path}: {e}")
+            return False
+        finally:
+            if not replaced and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        stat = os.stat(destination)
+        self._index[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": expected_sha256}
+        return True
+
+    @staticmethod
+    def _file_chunks(path: str):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                yield block
+
+    def _repair_from_package(self, package_path: str, prefix: str, paths: List[str]) -> List[str]:
+        """
+        Extrae del paquete solo los archivos indicados. Retorna los que no pudo reparar.
+        """
+        wanted = set(paths)
+        try:
+            with open(package_path, 'rb') as f:
+                for entry in iter_package_stream(f):
+                    path = prefix + normalize_path(entry.name)
+                    if path not in wanted or entry.is_dir or entry.is_special:
+                        entry.skip()
+                        continue
+                    if self._restore_file(path, entry.chunks(), self.expected[path]["sha256"]):
+                        wanted.discard(path)
+                    if not wanted:
+                        break
+        except (ArchiveError, ZipStreamError, ValueError, OSError) as e:
+            logger.error(f"Error leyendo el paquete {package_path}: {e}")
+        return sorted(wanted)
+
+    def repair(self, report: VerifyReport, backup_folder: Optional[str] = None,
+               downloader: Optional["Downloader"] = None) -> List[str]:
+        """
+        Repara únicamente los archivos modificados o ausentes del informe:
+        1. Desde el almacén de snapshots, si guarda ese mismo contenido.
+        2. Desde el paquete de la versión instalada (o del componente), descargado
+           con 'downloader' y del que solo se extraen los archivos afectados.
+        Los archivos adicionales no se eliminan. Retorna las rutas que no se pudieron reparar.
+        """
+        remaining = [path for path in report.damaged if path in self.expected]
+        if backup_folder and remaining and os.path.isdir(backup_folder):
+            store = SnapshotStore(backup_folder)
+            pending = []
+            for path in remaining:
+                sha256 = self.expected[path]["sha256"]
+                source = store.object_for(sha256)
+                if not source or not self._restore_file(path, self._file_chunks(source), sha256):
+                    pending.append(path)
+            if len(pending) < len(remaining):
+                logger.info(f"{len(remaining) - len(pending)} archivos reparados desde el almacén de snapshots.")
+            remaining = pending
+
+        if remaining and downloader:
+            by_source: Dict[str, List[str]] = {}
+            for path in remaining:
+                by_source.setdefault(self.owners[path], []).append(path)
+            remaining = []
+            for prefix, paths in sorted(by_source.items()):
+                package_path, source = "", self.sources.get(prefix, {})
+                if source.get("url"):
+                    digests = {"sha256": source["sha256"]} if source.get("sha256") else None
+                    package_path = downloader.download_url(
+                        source["url"], digests, source.get("version", ""),
+                        download_filename(source["name"], source.get("version", ""), source["url"]))
+                elif source.get("version"):
+                    package_path = downloader.download_package(source["version"])
+                if not package_path:
+                    logger.warning(f"No se pudo obtener el paquete para reparar: {prefix or 'instalación principal'}")
+                    remaining.extend(paths)
+                    continue
+                remaining.extend(self._repair_from_package(package_path, prefix, paths))
+
+        self._save_index()
+        repaired = len(report.damaged) - len(remaining)
+        logger.info(f"Reparación: {repaired} archivos reparados, {len(remaining)} sin reparar.")
+        return remaining
+
+
+if __name__ == "__main__":
+    # Prueba manual: verificar una carpeta de despliegue
+    import sys
+
+    verifier = Verifier(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "verify_index.json")
+    result = verifier.scan()
+    print(f"[Verifier] {json.dumps(result.to_dict(), indent=2)}")
@@ -0,0 +1,256 @@
+# lib/archive.py
+
+import io
+import lzma
+import gzip
+import queue
+import tarfile
+import threading
+from typing import BinaryIO, Iterator, Optional, Union
+
+from lib.zipstream import ZipStreamEntry, iter_zip_stream
+
+# Formatos de paquete admitidos (detectados por su cabecera, no por la extensión)
+FORMAT_ZIP = "zip"
+FORMAT_TAR = "tar"
+FORMAT_TAR_GZ = "tar.gz"
+FORMAT_TAR_XZ = "tar.xz"
+FORMAT_TAR_ZST = "tar.zst"
+
+# Bytes necesarios para reconocer cualquier formato (la firma 'ustar' de tar está en el byte 257)
+HEADER_SIZE = 512
+
+# Tamaño de cada bloque descomprimido por adelantado y bloques que pueden esperar en cola
+READ_AHEAD_SIZE = 1024 * 1024
+READ_AHEAD_DEPTH = 8
+
+_MAGICS = (
+    (b"PK\x03\x04", FORMAT_ZIP),
+    (b"PK\x05\x06", FORMAT_ZIP),
+    (b"\x28\xb5\x2f\xfd", FORMAT_TAR_ZST),
+    (b"\xfd7zXZ\x00", FORMAT_TAR_XZ),
+    (b"\x1f\x8b", FORMAT_TAR_GZ),
+)
+
+
+class ArchiveError(Exception):
+    """
+    El paquete tiene un formato no reconocido o no puede leerse.
+    """
+
+
+def detect_format(header: bytes) -> str:
+    """
+    Identifica el formato de un paquete por sus primeros bytes.
+    Lanza ArchiveError si no es ningún formato admitido.
+    """
+    for magic, name in _MAGICS:
+        if header.startswith(magic):
+            return name
+    if header[257:262] == b"ustar":
+        return FORMAT_TAR
+    raise ArchiveError("Formato de paquete no reconocido (se admite ZIP, tar, tar.gz, tar.xz y tar.zst).")
+
+
+def detect_file_format(path: str) -> str:
+    with open(path, 'rb') as f:
+        return detect_format(f.read(HEADER_SIZE))
+
+
+class _HeaderReader:
+    """
+    Lector secuencial que vuelve a entregar los bytes leídos para detectar el formato.
+    """
+
+    def __init__(self, stream: BinaryIO, header: bytes):
+        self.stream = stream
+        self.header = header
+
+    def read(self, size: int = -1) -> bytes:
+        if self.header:
+            if size is None or size < 0:
+                data, self.header = self.header + self.stream.read(), b""
+                return data
+            data, self.header = self.header[:size], self.header[size:]
+            if len(data) < size:
+                data += self.stream.read(size - len(data)) or b""
+            return data
+        return self.stream.read(size)
+
+
+class ReadAheadReader(io.RawIOBase):
+    """
+    Descomprime en un hilo de fondo y entrega los bloques ya listos, de modo que la
+    descompresión (que libera el GIL) avanza mientras el hilo que lee calcula
+    hashes y escribe a disco. Los errores del hilo de fondo se relanzan al leer.
+    """
+
+    def __init__(self, source: BinaryIO, block_size: int = READ_AHEAD_SIZE, depth: int = READ_AHEAD_DEPTH):
+        super().__init__()
+        self.source = source
+        self.block_size = block_size
+        self._blocks: queue.Queue = queue.Queue(depth)
+        self._buffer = memoryview(b"")
+        self._stop = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._fill, name="archive-read-ahead", daemon=True)
+        self._thread.start()
+
+    def _fill(self) -> None:
+        try:
+            while not self._stop.is_set():
+                block = self.source.read(self.block_size)
+                if not block:
+                    break
+                self._put(block)
+            self._put(b"")
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item: Union[bytes, BaseException]) -> None:
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        if not self._buffer:
+            if self._finished:
+                return 0
+            item = self._blocks.get()
+            if isinstance(item, BaseException):
+                self._finished = True
+                raise ArchiveError(f"Error descomprimiendo el paquete: {item}") from item
+            if not item:
+                self._finished = True
+                return 0
+            self._buffer = memoryview(item)
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self) -> None:
+        self._stop.set()
+        super().close()
+
+
+def _decompressed(stream: BinaryIO, fmt: str) -> BinaryIO:
+    """
+    Flujo descomprimido del tar. zstandard es una dependencia opcional que solo
+    se importa al abrir un paquete .tar.zst.
+    """
+    if fmt == FORMAT_TAR:
+        return stream
+    if fmt == FORMAT_TAR_ZST:
+        try:
+            import zstandard
+        except ImportError:
+            raise ArchiveError("El paquete es tar.zst y el módulo 'zstandard' no está instalado.")
+        source = zstandard.ZstdDecompressor().stream_reader(stream, read_size=READ_AHEAD_SIZE,
+                                                             read_across_frames=True)
+    elif fmt == FORMAT_TAR_XZ:
+        source = lzma.LZMAFile(stream)
+    else:
+        source = gzip.GzipFile(fileobj=stream)
+    return io.BufferedReader(ReadAheadReader(source), READ_AHEAD_SIZE)
+
+
+class TarStreamEntry:
+    """
+    Miembro de un tar leído desde el flujo, con la misma interfaz que ZipStreamEntry.
+    Sus datos deben consumirse (o descartarse) antes de pasar al siguiente miembro.
+    """
+
+    def __init__(self, archive: tarfile.TarFile, info: tarfile.TarInfo):
+        self._archive = archive
+        self._info = info
+        name = info.name
+        while name.startswith("./"):
+            name = name[2:]
+        self.name = name + ("/" if info.isdir() and not name.endswith("/") else "")
+        self.file_size: Optional[int] = info.size if info.isfile() else 0
+        self.consumed = False
+
+    @property
+    def is_dir(self) -> bool:
+        return self._info.isdir()
+
+    @property
+    def is_special(self) -> bool:
+        """
+        Enlaces, dispositivos y demás miembros que no son archivos regulares ni carpetas.
+        """
+        return not self._info.isfile() and not self._info.isdir()
+
+    def chunks(self) -> Iterator[bytes]:
+        if self.consumed or not self._info.isfile():
+            self.consumed = True
+            return
+        self.consumed = True
+        member = self._archive.extractfile(self._info)
+        remaining = self._info.size
+        while remaining:
+            try:
+                chunk = member.read(min(READ_AHEAD_SIZE, remaining))
+            except (tarfile.TarError, EOFError) as e:
+                raise ArchiveError(f"Paquete tar inválido en {self.name}: {e}")
+            if not chunk:
+                raise ArchiveError(f"Fin inesperado del paquete en: {self.name}")
+            remaining -= len(chunk)
+            yield chunk
+
+    def skip(self) -> None:
+        # En modo flujo tarfile descarta los datos pendientes al pasar al siguiente miembro
+        self.consumed = True
+
+
+def iter_tar_stream(stream: BinaryIO, fmt: str = FORMAT_TAR) -> Iterator[TarStreamEntry]:
+    """
+    Recorre un tar (comprimido o no) de forma secuencial, sin acceso aleatorio al paquete.
+    """
+    source = _decompressed(stream, fmt)
+    try:
+        with tarfile.open(fileobj=source, mode="r|") as archive:
+            for info in archive:
+                yield TarStreamEntry(archive, info)
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Paquete tar inválido: {e}")
+    finally:
+        if source is not stream:
+            source.close()
+
+
+def iter_package_stream(stream: BinaryIO) -> Iterator[Union[ZipStreamEntry, TarStreamEntry]]:
+    """
+    Recorre un paquete de cualquier formato admitido, detectado por su cabecera.
+    """
+    header = b""
+    while len(header) < HEADER_SIZE:
+        chunk = stream.read(HEADER_SIZE - len(header))
+        if not chunk:
+            break
+        header += chunk
+
+    fmt = detect_format(header)
+    reader = _HeaderReader(stream, header)
+    if fmt == FORMAT_ZIP:
+        return iter_zip_stream(reader)
+    return iter_tar_stream(reader, fmt)
+
+
+if __name__ == "__main__":
+    # Prueba manual: listar los miembros de un paquete de cualquier formato
+    import sys
+
+    with open(sys.argv[1], 'rb') as f:
+        print(f"[Archive] Formato: {detect_format(f.read(HEADER_SIZE))}")
+        f.seek(0)
+        for entry in iter_package_stream(f):
+            size = sum(len(chunk) for chunk in entry.chunks())
+            print(f"[Archive] {entry.name} ({size} bytes)")
@@ -0,0 +1,83 @@
+# lib/filelock.py
+
+import os
+import time
+import threading
+from typing import Dict
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Candados por ruta para serializar también los hilos del mismo proceso
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+class FileLock:
+    """
+    Candado exclusivo basado en archivo, válido entre procesos (y entre agentes
+    que comparten una carpeta en red) y entre hilos del mismo proceso.
+    Usa msvcrt en Windows y fcntl en el resto de plataformas.
+    """
+
+    def __init__(self, path: str, timeout: float = 300.0):
+        """
+        Inicializa el candado con:
+        - path: archivo usado como candado (se crea si no existe).
+        - timeout: segundos máximos de espera antes de lanzar TimeoutError.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+        key = os.path.normcase(os.path.abspath(path))
+        with _THREAD_LOCKS_GUARD:
+            self._thread_lock = _THREAD_LOCKS.setdefault(key, threading.Lock())
+
+    def acquire(self) -> None:
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No se pudo obtener el candado: {self.path}")
+
+        deadline = time.monotonic() + self.timeout
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, 'a+b')
+        try:
+            while True:
+                try:
+                    if os.name == "nt":
+                        self._file.seek(0)
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                    else:
+                        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"No se pudo obtener el candado: {self.path}")
+                    time.sleep(0.05)
+        except BaseException:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+            raise
+
+    def release(self) -> None:
+        if not self._file:
+            return
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -0,0 +1,42 @@
+# lib/http_session.py
+
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Conexiones keep-alive que se mantienen abiertas por host
+POOL_SIZE = 32
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Retorna la sesión HTTP compartida del proceso.
+    Reutiliza conexiones TCP/TLS (keep-alive) entre Updater, Downloader y
+    los distintos hilos de descarga, evitando un handshake por petición.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "ERP-Update-Agent"
+            _session = session
+        return _session
+
+
+def close_session() -> None:
+    """
+    Cierra la sesión compartida y sus conexiones (p. ej. al recargar la configuración).
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
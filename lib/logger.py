@@ -1,21 +1,200 @@
 # lib/logger.py
 
-import logging
 import os
-from logging.handlers import RotatingFileHandler
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+# Logger raíz del agente; cada módulo usa un hijo con el nombre de su componente
+ROOT_LOGGER_NAME = "ERPUpdateAgent"
+
+# Atributos estándar de LogRecord (el resto se considera contexto adicional del registro)
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "run_id", "component",
+                                                             "exception"}
+
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_run_id = uuid.uuid4().hex[:12]
+
+
+def get_run_id() -> str:
+    return _run_id
+
+
+def set_run_id(run_id: Optional[str] = None) -> str:
+    """
+    Cambia el identificador de ejecución que se adjunta a los registros
+    (p. ej. en cada consulta del modo servicio). Retorna el nuevo identificador.
+    """
+    global _run_id
+    _run_id = run_id or uuid.uuid4().hex[:12]
+    return _run_id
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Adjunta el identificador de ejecución y el componente en el hilo que registra,
+    antes de que el registro pase a la cola.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _run_id
+        record.component = "Agent" if record.name == ROOT_LOGGER_NAME else record.name.rsplit(".", 1)[-1]
+        return True
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler que conserva la excepción aparte del mensaje. El prepare() estándar
+    la une al texto del mensaje y borra exc_info, con lo que el archivo JSON perdería
+    el campo 'exception'; aquí se formatea antes de encolar en el atributo 'exception'.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exception = _exception_formatter.formatException(record.exc_info)
+        elif record.exc_text:
+            record.exception = record.exc_text
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
+class _ConsoleFormatter(logging.Formatter):
+    """
+    Texto legible para la consola; añade la traza de la excepción tras el mensaje.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        exception = getattr(record, "exception", None)
+        return f"{text}\n{exception}" if exception else text
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Una línea JSON por registro: fecha UTC, nivel, componente, run_id, mensaje y
+    cualquier campo adicional pasado con 'extra'.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "component": getattr(record, "component", record.name),
+            "run_id": getattr(record, "run_id", ""),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        if getattr(record, "exception", None):
+            data["exception"] = record.exception
+        elif record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(log_folder: str = "logs", log_name: str = "agent.log", console: bool = True,
+                  level: int = logging.DEBUG, run_id: Optional[str] = None) -> logging.Logger:
+    """
+    Configura el logging del proceso una única vez (las llamadas posteriores solo
+    retornan el logger ya configurado):
+    - Los módulos solo encolan registros (QueueHandler); un hilo de fondo los escribe,
+      de modo que el disco o la consola nunca bloquean una descarga o una instalación.
+    - Archivo rotativo en JSON estructurado y consola en texto legible.
+    """
+    global _listener
+    logger = logging.getLogger(ROOT_LOGGER_NAME)
+
+    with _lock:
+        if run_id:
+            set_run_id(run_id)
+        if _listener is not None:
+            return logger
 
-class Logger:
-    def __init__(self, log_folder: str = "logs", log_name: str = "agent.log"):
         os.makedirs(log_folder, exist_ok=True)
-        log_path = os.path.join(log_folder, log_name)
+        file_handler = RotatingFileHandler(os.path.join(log_folder, log_name), maxBytes=5 * 1024 * 1024,
+                                           backupCount=3, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(logging.INFO)
+            console_handler.setFormatter(_ConsoleFormatter("%(asctime)s %(levelname)s [%(component)s] %(message)s"))
+            handlers.append(console_handler)
+
+        records: queue.Queue = queue.Queue(-1)
+        queue_handler = _StructuredQueueHandler(records)
+        queue_handler.addFilter(_ContextFilter())
+
+        logger.setLevel(level)
+        logger.propagate = False
+        logger.handlers = [queue_handler]
 
-        self.logger = logging.getLogger("ERPUpdateAgent")
-        self.logger.setLevel(logging.DEBUG)
+        _listener = QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return logger
 
-        handler = RotatingFileHandler(log_path, maxBytes=5*1024*1024, backupCount=3)
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+
+def shutdown_logging() -> None:
+    """
+    Vacía la cola y detiene el hilo escritor (se llama automáticamente al salir).
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+            logging.getLogger(ROOT_LOGGER_NAME).handlers = []
+
+
+def get_logger(component: Optional[str] = None) -> logging.Logger:
+    """
+    Logger de un componente ('Installer', 'Downloader'...). Los registros se emiten
+    a través de la configuración del proceso; sin setup_logging() solo se muestran
+    las advertencias y errores por la salida de error estándar.
+    """
+    if not component:
+        return logging.getLogger(ROOT_LOGGER_NAME)
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{component}")
+
+
+class Logger:
+    """
+    Acceso compatible al logger del agente: configura el logging del proceso
+    la primera vez y reutiliza la misma configuración en las siguientes.
+    """
+
+    def __init__(self, log_folder: str = "logs", log_name: str = "agent.log"):
+        self.logger = setup_logging(log_folder, log_name)
 
     def get_logger(self):
         return self.logger
+
+
+if __name__ == "__main__":
+    # Prueba manual: varios Logger() no duplican la salida
+    log = Logger().get_logger()
+    Logger().get_logger()
+    log.info("[Main] Mensaje de prueba")
+    get_logger("Installer").warning("Advertencia de prueba", extra={"files": 3})
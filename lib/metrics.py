@@ -0,0 +1,160 @@
+# lib/metrics.py
+
+import os
+import re
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union
+
+from lib.filelock import FileLock
+from lib.logger import get_logger, get_run_id
+
+logger = get_logger("Metrics")
+
+# Registro de ejecuciones (una línea JSON por ejecución) dentro de la carpeta de métricas
+RUNS_FILE_NAME = "runs.jsonl"
+
+# Prefijo de las métricas exportadas al textfile collector de Prometheus
+PROMETHEUS_PREFIX = "erp_update"
+
+Number = Union[int, float]
+
+
+def _metric_name(value: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", value).strip("_").lower()
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RunMetrics:
+    """
+    Métricas de una ejecución del agente sobre un destino:
+    - Duración de cada fase (validación, versión, respaldo, descarga, hash, instalación).
+    - Contadores por fase (bytes, reintentos, archivos escritos u omitidos...).
+    Medir es siempre barato (un par de lecturas de reloj por fase); solo se escribe
+    a disco si se llama a write() con una carpeta de métricas configurada.
+    """
+
+    def __init__(self, target: str = "Main", run_id: Optional[str] = None):
+        """
+        Inicializa las métricas con:
+        - target: nombre del destino (etiqueta 'target' en Prometheus).
+        - run_id: identificador de la ejecución; por defecto el de los registros de log.
+        """
+        self.target = target
+        self.run_id = run_id or get_run_id()
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self.duration = 0.0
+        self.status = ""
+        self.version = ""
+        self.phases: Dict[str, Dict[str, Number]] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Mide la duración de un bloque. Si la fase se repite, los tiempos se acumulan.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {})
+            entry["seconds"] = entry.get("seconds", 0.0) + time.perf_counter() - started
+
+    def add(self, name: str, **values: Number) -> None:
+        """
+        Suma contadores a una fase (p. ej. bytes=..., retries=...).
+        """
+        entry = self.phases.setdefault(name, {})
+        for key, value in values.items():
+            entry[key] = entry.get(key, 0) + value
+
+    def finish(self, status: str, version: str = "") -> None:
+        self.duration = time.perf_counter() - self._clock
+        self.status = status
+        self.version = version
+
+    def record(self) -> Dict:
+        """
+        Registro JSON de la ejecución.
+        """
+        return {
+            "run_id": self.run_id,
+            "target": self.target,
+            "started": round(self.started, 3),
+            "duration_s": round(self.duration, 6),
+            "status": self.status,
+            "version": self.version,
+            "phases": {
+                name: {key: round(value, 6) if isinstance(value, float) else value
+                       for key, value in values.items()}
+                for name, values in self.phases.items()
+            },
+        }
+
+    def prometheus(self) -> str:
+        """
+        Métricas de la última ejecución en formato de exposición de Prometheus.
+        """
+        target = _label(self.target)
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_last_run_timestamp_seconds Inicio de la última ejecución.",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge",
+            f'{PROMETHEUS_PREFIX}_last_run_timestamp_seconds{{target="{target}"}} {self.started:.3f}',
+            f"# HELP {PROMETHEUS_PREFIX}_last_run_duration_seconds Duración total de la última ejecución.",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_duration_seconds gauge",
+            f'{PROMETHEUS_PREFIX}_last_run_duration_seconds{{target="{target}"}} {self.duration:.6f}',
+            f"# HELP {PROMETHEUS_PREFIX}_last_run_success 1 si la última ejecución no falló.",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_success gauge",
+            f'{PROMETHEUS_PREFIX}_last_run_success{{target="{target}",status="{_label(self.status)}",'
+            f'version="{_label(self.version)}"}} {0 if self.status == "failed" else 1}',
+        ]
+
+        # Una familia por contador; la fase va como etiqueta
+        families: Dict[str, list] = {}
+        for phase, values in self.phases.items():
+            for key, value in values.items():
+                families.setdefault(_metric_name(key), []).append(
+                    (phase, round(value, 6) if isinstance(value, float) else value))
+        for key, samples in sorted(families.items()):
+            name = f"{PROMETHEUS_PREFIX}_phase_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            for phase, value in samples:
+                lines.append(f'{name}{{target="{target}",phase="{_label(phase)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, folder: str) -> None:
+        """
+        Agrega el registro de la ejecución a 'runs.jsonl' y reemplaza de forma atómica
+        el archivo '<prefijo>_<destino>.prom' leído por el textfile collector.
+        """
+        try:
+            os.makedirs(folder, exist_ok=True)
+            runs_path = os.path.join(folder, RUNS_FILE_NAME)
+            with FileLock(runs_path + ".lock"):
+                with open(runs_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.record(), sort_keys=True) + "\n")
+
+            prom_path = os.path.join(folder, f"{PROMETHEUS_PREFIX}_{_metric_name(self.target) or 'main'}.prom")
+            tmp_path = prom_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+            os.replace(tmp_path, prom_path)
+
+        except Exception as e:
+            logger.error(f"Error escribiendo métricas en {folder}: {e}")
+
+
+if __name__ == "__main__":
+    # Prueba manual: medir dos fases y mostrar los formatos de salida
+    metrics = RunMetrics("Prueba")
+    with metrics.phase("download"):
+        time.sleep(0.05)
+    metrics.add("download", bytes=1024 * 1024, retries=1)
+    metrics.finish("updated", "1.2.3")
+    print(json.dumps(metrics.record(), indent=2))
+    print(metrics.prometheus())
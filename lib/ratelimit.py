@@ -0,0 +1,261 @@
+# lib/ratelimit.py
+
+import re
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from lib.utils import in_window, parse_window
+from lib.logger import get_logger
+
+logger = get_logger("RateLimit")
+
+# Cada cuántos segundos se vuelve a evaluar el perfil horario vigente
+PROFILE_CHECK_INTERVAL = 30.0
+
+# Ráfaga mínima del cubo de fichas (un bloque de lectura HTTP entra siempre completo)
+MIN_BURST_BYTES = 256 * 1024
+
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+Rate = Union[int, float, str, None]
+
+
+def parse_rate(value: Rate) -> float:
+    """
+    Convierte un límite de ancho de banda en bytes por segundo.
+    Admite números (bytes/s) o textos como "512K", "2MB", "1.5M/s" (unidades binarias).
+    Vacío, None o 0 significan sin límite. Lanza ValueError si el formato no es válido.
+    """
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        rate = float(value)
+    else:
+        if not value.strip():
+            return 0.0
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?(?:/s)?\s*", value.lower())
+        if not match:
+            raise ValueError(f"Límite de ancho de banda inválido: {value!r}")
+        rate = float(match.group(1)) * _UNITS[match.group(2)]
+    if rate < 0:
+        raise ValueError(f"Límite de ancho de banda inválido: {value!r}")
+    return rate
+
+
+class RateSchedule:
+    """
+    Límite de ancho de banda según la hora del día:
+    - profiles: ventana "HH:MM-HH:MM" -> límite (p. ej. {"08:00-18:00": "512K"}).
+    - default: límite fuera de todas las ventanas (0 = sin límite).
+    Gana la primera ventana que contiene la hora consultada.
+    """
+
+    def __init__(self, default: Rate = None, profiles: Optional[Dict[str, Rate]] = None):
+        self.default = parse_rate(default)
+        self.profiles: List[Tuple[Tuple[int, int], float]] = [
+            (parse_window(window), parse_rate(rate)) for window, rate in (profiles or {}).items()
+        ]
+
+    def rate_at(self, moment: datetime) -> float:
+        for window, rate in self.profiles:
+            if in_window(window, moment):
+                return rate
+        return self.default
+
+    @property
+    def unlimited(self) -> bool:
+        return not self.default and not any(rate for _, rate in self.profiles)
+
+
+class TokenBucket:
+    """
+    Cubo de fichas seguro entre hilos: se llena a 'rate' bytes por segundo hasta 'burst'.
+    Cada consumidor reserva sus bytes (el saldo puede quedar negativo) y espera fuera
+    del bloqueo el tiempo que tarda en saldarse, de modo que varias descargas
+    concurrentes se reparten el límite en el orden en que piden.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.burst = 0.0
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate, burst)
+        # El cubo arranca lleno: la primera ráfaga no espera
+        self.tokens = self.burst
+
+    def set_rate(self, rate: float, burst: Optional[float] = None) -> None:
+        """
+        Cambia el límite (0 = sin límite). La ráfaga por defecto equivale a un segundo.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(0.0, rate)
+            self.burst = max(MIN_BURST_BYTES, burst if burst is not None else self.rate)
+            self.tokens = min(self.tokens, self.burst) if self.rate else self.burst
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: int) -> float:
+        """
+        Reserva 'amount' bytes y retorna los segundos que hay que esperar antes de usarlos.
+        """
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill()
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def consume(self, amount: int) -> float:
+        """
+        Espera hasta poder usar 'amount' bytes. Retorna los segundos esperados.
+        """
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """
+    Limitador de ancho de banda de las descargas, compartido por todas las
+    conexiones de una actualización (o del proceso, ver get_rate_limiter()).
+    - El límite vigente sale de un RateSchedule y se reevalúa periódicamente,
+      así una descarga larga pasa al límite nocturno sin reiniciarse.
+    - Acumula bytes, tiempo y esperas para informar del caudal efectivo.
+    """
+
+    def __init__(self, schedule: Optional[RateSchedule] = None):
+        self.bucket = TokenBucket()
+        self._lock = threading.Lock()
+        self.schedule = schedule or RateSchedule()
+        self._checked = 0.0
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self.bytes = 0
+        self.throttled_seconds = 0.0
+        self.started = time.monotonic()
+
+    def configure(self, schedule: RateSchedule) -> None:
+        """
+        Reemplaza el perfil de límites (p. ej. al recargar la configuración).
+        """
+        with self._lock:
+            self.schedule = schedule
+            self._checked = 0.0
+        self._apply_schedule()
+
+    def _apply_schedule(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._checked and now - self._checked < PROFILE_CHECK_INTERVAL:
+                return
+            self._checked = now
+            rate = self.schedule.rate_at(datetime.now())
+        if rate != self.bucket.rate:
+            self.bucket.set_rate(rate)
+            if rate:
+                logger.info(f"Límite de ancho de banda de descarga: {rate / 1024:.0f} KiB/s.")
+            else:
+                logger.info("Descarga sin límite de ancho de banda.")
+
+    @property
+    def unlimited(self) -> bool:
+        return self.schedule.unlimited
+
+    @property
+    def rate(self) -> float:
+        self._apply_schedule()
+        return self.bucket.rate
+
+    def throttle(self, amount: int) -> float:
+        """
+        Registra 'amount' bytes recibidos y espera lo necesario para respetar el límite.
+        Retorna los segundos esperados.
+        """
+        self._apply_schedule()
+        delay = self.bucket.consume(amount)
+        with self._lock:
+            self.bytes += amount
+            self.throttled_seconds += delay
+        return delay
+
+    def stats(self, reset: bool = False) -> Dict[str, float]:
+        """
+        Caudal efectivo desde el último reinicio: bytes, segundos, bytes por segundo,
+        segundos de espera impuestos por el límite y límite vigente (0 = sin límite).
+        """
+        with self._lock:
+            seconds = time.monotonic() - self.started
+            stats = {
+                "bytes": self.bytes,
+                "seconds": round(seconds, 3),
+                "bytes_per_second": round(self.bytes / seconds, 1) if seconds > 0 else 0.0,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "rate_limit": self.bucket.rate,
+            }
+            if reset:
+                self._reset_counters()
+        return stats
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Retorna el limitador compartido del proceso (sin límite hasta que se configure).
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def build_schedule(default: Rate = None, profiles: Optional[Dict[str, Rate]] = None) -> RateSchedule:
+    """
+    Perfil de límites a partir de la configuración.
+    Lanza ValueError si algún límite o ventana no es válido.
+    """
+    try:
+        return RateSchedule(default, profiles)
+    except (ValueError, AttributeError, TypeError) as e:
+        raise ValueError(f"Configuración de ancho de banda inválida: {e}")
+
+
+def configure_rate_limiter(default: Rate = None, profiles: Optional[Dict[str, Rate]] = None) -> RateLimiter:
+    """
+    Configura el limitador compartido con un límite por defecto y perfiles horarios.
+    Afecta a todas las descargas del proceso: debe llamarse una sola vez desde el punto
+    de entrada. Lanza ValueError si algún límite o ventana no es válido.
+    """
+    limiter = get_rate_limiter()
+    limiter.configure(build_schedule(default, profiles))
+    return limiter
+
+
+if __name__ == "__main__":
+    # Prueba manual: cuatro hilos comparten un límite de 1 MiB/s (~1 s tras la ráfaga inicial)
+    limiter = configure_rate_limiter("1M", {"08:00-18:00": "512K"})
+
+    def worker() -> None:
+        for _ in range(8):
+            limiter.throttle(64 * 1024)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"[RateLimit] {limiter.stats()}")
@@ -0,0 +1,99 @@
+# lib/semver.py
+
+import re
+from functools import total_ordering
+from typing import Tuple, Union
+
+_VERSION_PATTERN = re.compile(
+    r"^\s*v?(?P<release>\d+(?:\.\d+)*)"
+    r"(?:-(?P<prerelease>[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?"
+    r"(?:\+(?P<build>[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?\s*$"
+)
+
+Identifier = Union[int, str]
+
+
+@total_ordering
+class Version:
+    """
+    Versión semántica (MAJOR.MINOR.PATCH[-prerelease][+build]) con el orden de SemVer 2.0:
+    - Las partes numéricas se comparan como números (1.10.0 > 1.9.0).
+    - Una versión preliminar es menor que la final (1.0.0-rc.1 < 1.0.0).
+    - Los metadatos de compilación (+build) no intervienen en el orden.
+    Por compatibilidad con las versiones ya publicadas del ERP se admiten una 'v'
+    inicial y cualquier cantidad de partes numéricas ("2024.3", "1.2.3.4"); las que
+    faltan cuentan como 0.
+    """
+
+    def __init__(self, release: Tuple[int, ...], prerelease: Tuple[Identifier, ...] = (), build: str = ""):
+        self.release = release
+        self.prerelease = prerelease
+        self.build = build
+
+    @classmethod
+    def parse(cls, text: str) -> "Version":
+        """
+        Interpreta una versión. Lanza ValueError si el texto no es una versión válida.
+        """
+        match = _VERSION_PATTERN.match(text or "")
+        if not match:
+            raise ValueError(f"Versión inválida: {text!r}")
+        release = tuple(int(part) for part in match.group("release").split("."))
+        prerelease = tuple(int(part) if part.isdigit() else part
+                           for part in (match.group("prerelease") or "").split(".") if part)
+        return cls(release, prerelease, match.group("build") or "")
+
+    def _release_key(self, length: int) -> Tuple[int, ...]:
+        return self.release + (0,) * (length - len(self.release))
+
+    def _key(self, length: int):
+        # Identificadores numéricos antes que alfanuméricos; sin prerelease, después de todos
+        prerelease = tuple((0, part, "") if isinstance(part, int) else (1, 0, part) for part in self.prerelease)
+        return self._release_key(length), not self.prerelease, prerelease
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Version):
+            return NotImplemented
+        length = max(len(self.release), len(other.release))
+        return self._key(length) == other._key(length)
+
+    def __lt__(self, other) -> bool:
+        if not isinstance(other, Version):
+            return NotImplemented
+        length = max(len(self.release), len(other.release))
+        return self._key(length) < other._key(length)
+
+    def __hash__(self) -> int:
+        release = self.release
+        while len(release) > 1 and release[-1] == 0:
+            release = release[:-1]
+        return hash((release, self.prerelease))
+
+    def __str__(self) -> str:
+        text = ".".join(str(part) for part in self.release)
+        if self.prerelease:
+            text += "-" + ".".join(str(part) for part in self.prerelease)
+        if self.build:
+            text += "+" + self.build
+        return text
+
+    def __repr__(self) -> str:
+        return f"Version({str(self)!r})"
+
+
+def parse_version(text: str) -> Version:
+    return Version.parse(text)
+
+
+def is_newer(candidate: str, current: str) -> bool:
+    """
+    Indica si 'candidate' es una versión posterior a 'current'.
+    Lanza ValueError si alguna de las dos no es una versión válida.
+    """
+    return Version.parse(candidate) > Version.parse(current)
+
+
+if __name__ == "__main__":
+    # Prueba manual: orden de versiones que la comparación de textos resolvía mal
+    versions = ["1.9.0", "1.10.0", "1.10.0-rc.1", "1.10.0-beta", "1.10.0-rc.10", "1.10.0-rc.2", "v2", "1.2.3.4"]
+    print("[SemVer] " + " < ".join(str(v) for v in sorted(Version.parse(text) for text in versions)))
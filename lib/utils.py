@@ -1,14 +1,151 @@
 # lib/utils.py
 
+import os
+import mmap
 import hashlib
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
-def calculate_sha256(file_path: str) -> str:
-    sha256 = hashlib.sha256()
+from lib.logger import get_logger
+
+logger = get_logger("Utils")
+
+# Tamaño de lectura por defecto para el cálculo de hashes
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# A partir de este tamaño se usa mmap en lugar de lecturas por bloques
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+
+def calculate_hashes(file_path: str, algorithms: Iterable[str] = ("sha256",),
+                     buffer_size: int = HASH_BUFFER_SIZE,
+                     progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, str]:
+    """
+    Calcula uno o varios digests de un archivo en una única pasada.
+    Los archivos grandes se recorren mediante mmap; el resto con lecturas de 'buffer_size'.
+    progress_callback(bytes_procesados, bytes_totales) se invoca tras cada bloque.
+    Retorna un diccionario algoritmo -> hexdigest, o un diccionario vacío si falla.
+    """
+    hashers = {name: hashlib.new(name) for name in algorithms}
     try:
+        total = os.path.getsize(file_path)
+        done = 0
         with open(file_path, "rb") as f:
-            for block in iter(lambda: f.read(4096), b""):
-                sha256.update(block)
-        return sha256.hexdigest()
+            if total >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        while done < total:
+                            with view[done:done + buffer_size] as block:
+                                for hasher in hashers.values():
+                                    hasher.update(block)
+                                done += len(block)
+                            if progress_callback:
+                                progress_callback(done, total)
+                    finally:
+                        view.release()
+            else:
+                for block in iter(lambda: f.read(buffer_size), b""):
+                    for hasher in hashers.values():
+                        hasher.update(block)
+                    done += len(block)
+                    if progress_callback:
+                        progress_callback(done, total)
+        return {name: hasher.hexdigest() for name, hasher in hashers.items()}
     except Exception as e:
-        print(f"[Utils] Error calculando checksum: {e}")
-        return ""
+        logger.error(f"Error calculando checksum: {e}")
+        return {}
+
+
+def calculate_sha256(file_path: str, buffer_size: int = HASH_BUFFER_SIZE,
+                     progress_callback: Optional[Callable[[int, int], None]] = None) -> str:
+    return calculate_hashes(file_path, ("sha256",), buffer_size, progress_callback).get("sha256", "")
+
+
+def parse_window(window: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Convierte una ventana "HH:MM-HH:MM" en minutos desde medianoche (inicio, fin).
+    La ventana puede cruzar la medianoche, e.g., "22:00-05:00"; "24:00" indica el fin del día.
+    Lanza ValueError si el formato o alguna hora no es válida.
+    """
+    if not window:
+        return None
+
+    try:
+        bounds = [tuple(int(part) for part in value.strip().split(":")) for value in window.split("-")]
+        (start_hours, start_minutes), (end_hours, end_minutes) = bounds
+    except ValueError:
+        raise ValueError(f"Ventana inválida {window!r}; se espera 'HH:MM-HH:MM'")
+
+    for hours, minutes in bounds:
+        if not (0 <= hours <= 23 and 0 <= minutes <= 59) and (hours, minutes) != (24, 0):
+            raise ValueError(f"Hora inválida en la ventana {window!r}: {hours:02d}:{minutes:02d}")
+    return start_hours * 60 + start_minutes, end_hours * 60 + end_minutes
+
+
+def in_window(window: Optional[Tuple[int, int]], moment: datetime) -> bool:
+    if window is None:
+        return True
+    start, end = window
+    minute = moment.hour * 60 + moment.minute
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+class InlineDigest:
+    """
+    Calcula digests mientras los bytes se escriben a disco.
+    Los bloques que llegan en orden se procesan directamente desde memoria;
+    los que llegan fuera de orden (descargas segmentadas o reanudadas) se
+    completan después leyendo el archivo con catch_up().
+    """
+
+    def __init__(self, algorithms: Iterable[str] = ("sha256",)):
+        self.algorithms = tuple(algorithms)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Descarta el estado acumulado (por ejemplo, si la descarga se reinicia desde cero).
+        """
+        with self._lock:
+            self.hashers = {name: hashlib.new(name) for name in self.algorithms}
+            self.offset = 0
+
+    def feed(self, position: int, data: bytes) -> bool:
+        """
+        Procesa 'data' si comienza exactamente en la posición ya digerida.
+        Retorna True si el bloque fue consumido.
+        """
+        with self._lock:
+            if position != self.offset:
+                return False
+            for hasher in self.hashers.values():
+                hasher.update(data)
+            self.offset += len(data)
+            return True
+
+    def catch_up(self, file_path: str, end: int, buffer_size: int = HASH_BUFFER_SIZE) -> None:
+        """
+        Avanza el digest leyendo desde disco hasta la posición 'end'
+        (que debe estar completamente escrita).
+        """
+        with self._lock:
+            if self.offset >= end:
+                return
+            with open(file_path, "rb") as f:
+                f.seek(self.offset)
+                while self.offset < end:
+                    block = f.read(min(buffer_size, end - self.offset))
+                    if not block:
+                        raise IOError(f"Archivo más corto de lo esperado al calcular el digest: {file_path}")
+                    for hasher in self.hashers.values():
+                        hasher.update(block)
+                    self.offset += len(block)
+
+    def hexdigests(self) -> Dict[str, str]:
+        with self._lock:
+            return {name: hasher.hexdigest() for name, hasher in self.hashers.items()}
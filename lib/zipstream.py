@@ -0,0 +1,214 @@
+# lib/zipstream.py
+
+import struct
+import zlib
+from typing import BinaryIO, Iterator, Optional
+
+# Firmas de los registros del formato ZIP
+LOCAL_FILE_HEADER = 0x04034b50
+DATA_DESCRIPTOR = 0x08074b50
+CENTRAL_DIRECTORY = 0x02014b50
+
+# Métodos de compresión soportados en modo streaming
+STORED = 0
+DEFLATED = 8
+
+READ_SIZE = 256 * 1024
+
+
+class ZipStreamError(Exception):
+    """
+    El flujo no es un ZIP válido o usa una característica no soportada en streaming.
+    """
+
+
+class _PushbackReader:
+    """
+    Lector secuencial que permite devolver bytes leídos de más (necesario al
+    descomprimir deflate sin conocer de antemano el tamaño comprimido).
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.buffer = b""
+
+    def read(self, size: int) -> bytes:
+        if self.buffer:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+            if len(data) < size:
+                data += self.stream.read(size - len(data)) or b""
+            return data
+        return self.stream.read(size) or b""
+
+    def read_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.read(size - len(data))
+            if not chunk:
+                raise ZipStreamError("Fin inesperado del flujo ZIP")
+            data += chunk
+        return data
+
+    def unread(self, data: bytes) -> None:
+        self.buffer = data + self.buffer
+
+
+class ZipStreamEntry:
+    """
+    Miembro del ZIP leído desde el flujo. Sus datos deben consumirse con
+    chunks() (o descartarse con skip()) antes de pasar al siguiente miembro.
+    """
+
+    def __init__(self, reader: _PushbackReader, name: str, flags: int, method: int, crc: int,
+                 compressed_size: Optional[int], file_size: Optional[int]):
+        self._reader = reader
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.file_size = file_size
+        self.consumed = False
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+    @property
+    def is_special(self) -> bool:
+        return False
+
+    @property
+    def has_descriptor(self) -> bool:
+        return bool(self.flags & 0x08)
+
+    def chunks(self) -> Iterator[bytes]:
+        """
+        Entrega los datos descomprimidos del miembro y verifica su CRC32.
+        """
+        if self.consumed:
+            return
+        self.consumed = True
+
+        if self.method == STORED:
+            if self.compressed_size is None:
+                raise ZipStreamError(f"Miembro sin comprimir con tamaño diferido, no soportado: {self.name}")
+            generator = self._stored()
+        elif self.method == DEFLATED:
+            generator = self._deflated()
+        else:
+            raise ZipStreamError(f"Método de compresión no soportado ({self.method}): {self.name}")
+
+        crc = 0
+        for chunk in generator:
+            crc = zlib.crc32(chunk, crc)
+            yield chunk
+
+        if self.has_descriptor:
+            self._read_descriptor()
+        if crc != self.crc:
+            raise ZipStreamError(f"CRC incorrecto en: {self.name}")
+
+    def skip(self) -> None:
+        for _ in self.chunks():
+            pass
+
+    def _stored(self) -> Iterator[bytes]:
+        remaining = self.compressed_size
+        while remaining:
+            chunk = self._reader.read(min(READ_SIZE, remaining))
+            if not chunk:
+                raise ZipStreamError(f"Fin inesperado del flujo en: {self.name}")
+            remaining -= len(chunk)
+            yield chunk
+
+    def _deflated(self) -> Iterator[bytes]:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        remaining = self.compressed_size
+        while not decompressor.eof:
+            size = READ_SIZE if remaining is None else min(READ_SIZE, remaining)
+            chunk = self._reader.read(size) if size else b""
+            if not chunk:
+                raise ZipStreamError(f"Fin inesperado del flujo en: {self.name}")
+            if remaining is not None:
+                remaining -= len(chunk)
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        if decompressor.unused_data:
+            self._reader.unread(decompressor.unused_data)
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def _read_descriptor(self) -> None:
+        """
+        Lee el 'data descriptor' posterior a los datos (firma opcional, CRC y tamaños).
+        """
+        head = self._reader.read_exact(4)
+        if struct.unpack("<I", head)[0] == DATA_DESCRIPTOR:
+            head = self._reader.read_exact(4)
+        self.crc = struct.unpack("<I", head)[0]
+        # Tamaños de 4 u 8 bytes (ZIP64); se infiere por la firma siguiente
+        sizes = self._reader.read_exact(8)
+        peek = self._reader.read(4)
+        if peek and struct.unpack("<I", peek.ljust(4, b"\0"))[0] not in (LOCAL_FILE_HEADER, CENTRAL_DIRECTORY):
+            peek += self._reader.read_exact(8)
+            sizes += peek[:8]
+            peek = peek[8:]
+        self._reader.unread(peek)
+
+
+def iter_zip_stream(stream: BinaryIO) -> Iterator[ZipStreamEntry]:
+    """
+    Recorre un ZIP de forma secuencial a partir de sus cabeceras locales,
+    sin necesidad de tener el archivo completo (ni su directorio central) en disco.
+    """
+    reader = _PushbackReader(stream)
+    previous: Optional[ZipStreamEntry] = None
+
+    while True:
+        if previous is not None and not previous.consumed:
+            previous.skip()
+
+        signature = reader.read(4)
+        if len(signature) < 4:
+            return
+        signature = struct.unpack("<I", signature)[0]
+        if signature != LOCAL_FILE_HEADER:
+            # Directorio central o fin del archivo: no hay más miembros
+            return
+
+        (_, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = struct.unpack("<HHHHHIIIHH", reader.read_exact(26))
+        raw_name = reader.read_exact(name_length)
+        extra = reader.read_exact(extra_length)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+
+        if compressed_size == 0xFFFFFFFF or file_size == 0xFFFFFFFF:
+            file_size, compressed_size = _zip64_sizes(extra, file_size, compressed_size)
+
+        if flags & 0x01:
+            raise ZipStreamError(f"Miembro cifrado no soportado: {name}")
+        if flags & 0x08:
+            compressed_size = None if compressed_size == 0 else compressed_size
+            file_size = None if file_size == 0 else file_size
+
+        previous = ZipStreamEntry(reader, name, flags, method, crc, compressed_size, file_size)
+        yield previous
+
+
+def _zip64_sizes(extra: bytes, file_size: int, compressed_size: int):
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[position:position + 4])
+        data = extra[position + 4:position + 4 + size]
+        if header_id == 0x0001:
+            values = [struct.unpack("<Q", data[i:i + 8])[0] for i in range(0, len(data) - 7, 8)]
+            if file_size == 0xFFFFFFFF and values:
+                file_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF and values:
+                compressed_size = values.pop(0)
+            break
+        position += 4 + size
+    return file_size, compressed_size
@@ -1,69 +1,285 @@
-import os
 import sys
-import shutil
+import time
+import argparse
+from typing import List, Optional
 
 from core.validator import Validator
-from core.updater import Updater
-from core.downloader import Downloader
 from core.notifier import Notifier
 from lib.logger import Logger
 
+# Los módulos de cada subcomando se importan dentro de su función: un arranque
+# que solo consulta la versión no carga la descarga, la instalación ni la flota.
+
 # Ruta del archivo de configuración
 CONFIG_PATH = "config/settings.json"
 
-def main() -> None:
+
+def configure_downloads(settings):
+    """
+    Configura una sola vez el limitador de ancho de banda del proceso con la configuración
+    principal. Retorna el limitador a compartir entre todas las descargas (None = sin límite).
+    """
+    from lib.ratelimit import configure_rate_limiter
+
+    limiter = configure_rate_limiter(settings.download_rate_limit, settings.download_rate_profiles)
+    return None if limiter.unlimited else limiter
+
+
+def run_update() -> None:
     """
     Orquesta el proceso de actualización del ERP:
     - Valida entorno
     - Detecta actualizaciones
     - Realiza backup de instalación actual
-    - Descarga nueva versión (carpeta, exe, zip, etc)
+    - Descarga nueva versión (delta desde la versión instalada o paquete completo)
+    - Instala de forma incremental solo los archivos modificados
     - Notifica resultados
+    - Registra la duración y los contadores de cada fase (si hay carpeta de métricas)
     """
+    from core.agent import UpdateAgent, UpdateResult
+    from lib.metrics import RunMetrics
+
     logger = Logger().get_logger()
     notifier = Notifier()
+    metrics = RunMetrics("Main")
 
     validator = Validator(CONFIG_PATH)
-    if not validator.validate_all():
+    with metrics.phase("validation"):
+        valid = validator.validate_all()
+    if validator.settings:
+        notifier.configure(validator.settings)
+    if not valid:
         logger.error("[Main] Falló la validación inicial. Abortando.")
         notifier.send_notification("ERP Update", "Falló la validación de configuración.")
+        if validator.settings and validator.settings.metrics_folder:
+            metrics.finish(UpdateResult.FAILED)
+            metrics.write(validator.settings.metrics_folder)
+        sys.exit(1)
+
+    result = UpdateAgent(validator.settings, logger, notifier, metrics=metrics,
+                         rate_limiter=configure_downloads(validator.settings)).run()
+    if not result.ok:
+        sys.exit(1)
+
+
+def run_fleet(config_paths: List[str], workers: int, report_path: Optional[str]) -> None:
+    """
+    Actualiza varios destinos en paralelo y muestra el resumen de la ejecución.
+    El límite de ancho de banda sale de la configuración principal (si existe) y lo
+    comparten todos los destinos.
+    """
+    import os
+    from core.fleet import FleetRunner
+
+    logger = Logger().get_logger()
+    notifier = Notifier()
+
+    rate_limiter = None
+    if os.path.exists(CONFIG_PATH):
+        rate_limiter = configure_downloads(load_settings())
+
+    results = FleetRunner(config_paths, logger, workers, rate_limiter=rate_limiter).run()
+    report = FleetRunner.summary(results, report_path)
+
+    logger.info(f"[Fleet] {report['updated']} actualizados, {report['up_to_date']} sin cambios, "
+                f"{report['failed']} fallidos.")
+    if report["updated"] or report["failed"]:
+        notifier.send_notification("ERP Update", f"Flota: {report['updated']} actualizados, "
+                                                 f"{report['failed']} fallidos de {report['total']}.")
+    if report["failed"]:
         sys.exit(1)
 
-    settings = validator.settings
 
-    try:
-        updater = Updater(settings.remote_version_url, settings.version_file)
+def load_settings():
+    """
+    Carga y valida la configuración sin ejecutar el resto de las verificaciones de entorno.
+    """
+    validator = Validator(CONFIG_PATH)
+    if not validator.load_settings():
+        sys.exit(1)
+    return validator.settings
 
-        if not updater.is_update_available():
-            logger.info("[Main] No hay actualizaciones disponibles.")
-            notifier.send_notification("ERP Update", "No hay actualizaciones disponibles.")
-            return
 
-        new_version = updater.get_remote_version()
-        logger.info(f"[Main] Nueva versión detectada: {new_version}")
+def list_snapshots() -> None:
+    """
+    Muestra los snapshots disponibles en el almacén de respaldos.
+    """
+    from core.snapshots import SnapshotStore
+
+    settings = load_settings()
+    store = SnapshotStore(settings.get_backup_folder(), settings.backup_retention)
+    snapshots = store.list_snapshots()
+    if not snapshots:
+        print("[Main] No hay snapshots disponibles.")
+        return
 
-        # Realizar respaldo de la carpeta de despliegue actual
-        if os.path.exists(settings.backup_folder):
-            shutil.rmtree(settings.backup_folder)
-        shutil.copytree(settings.deploy_folder, settings.backup_folder)
-        logger.info(f"[Main] Respaldo exitoso en: {settings.backup_folder}")
+    for snapshot in snapshots:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["created"]))
+        print(f"{snapshot['id']}\t{created}\tversión {snapshot['version'] or '?'}\t"
+              f"{snapshot['files']} archivos\t{snapshot['bytes']} bytes")
 
-        # Descargar nuevo paquete
-        downloader = Downloader(settings.download_url_template, settings.download_folder)
-        package_path = downloader.download_package(new_version)
 
-        if not package_path:
-            logger.error("[Main] Descarga fallida. Abortando proceso.")
-            notifier.send_notification("ERP Update", "Error al descargar el paquete de actualización.")
-            sys.exit(1)
+def restore_snapshot(snapshot_id: str) -> None:
+    """
+    Restaura un snapshot concreto sobre la carpeta de despliegue.
+    """
+    from core.installer import Installer
 
-        logger.info(f"[Main] Paquete descargado en: {package_path}")
-        notifier.send_notification("ERP Update", f"Actualización {new_version} descargada correctamente.")
+    logger = Logger().get_logger()
+    settings = load_settings()
+    installer = Installer(settings.deploy_folder, settings.version_file)
 
-    except Exception as e:
-        logger.exception(f"[Main] Error inesperado durante la actualización: {e}")
-        notifier.send_notification("ERP Update", "Fallo inesperado en la actualización.")
+    if not installer.restore_snapshot(settings.get_backup_folder(), snapshot_id):
+        logger.error(f"[Main] Falló la restauración del snapshot {snapshot_id}.")
         sys.exit(1)
+    logger.info(f"[Main] Snapshot {snapshot_id} restaurado correctamente.")
+
+
+def rollback(snapshot_id: Optional[str]) -> None:
+    """
+    Vuelve a la versión instalada antes de la última actualización.
+    """
+    from core.installer import Installer
+
+    logger = Logger().get_logger()
+    settings = load_settings()
+    installer = Installer(settings.deploy_folder, settings.version_file)
+
+    if not installer.rollback(settings.get_backup_folder(), snapshot_id):
+        logger.error("[Main] No se pudo volver a la versión anterior.")
+        sys.exit(1)
+    logger.info("[Main] Versión anterior restaurada correctamente.")
+
+
+def run_daemon() -> None:
+    """
+    Ejecuta el agente como servicio residente que consulta actualizaciones periódicamente.
+    """
+    from core.daemon import UpdateDaemon
+    from lib.ratelimit import get_rate_limiter
+
+    logger = Logger().get_logger()
+    UpdateDaemon(CONFIG_PATH, logger, Notifier(), rate_limiter=get_rate_limiter()).run()
+
+
+def show_cache_stats() -> None:
+    """
+    Muestra los contadores de la caché de paquetes para dimensionarla.
+    """
+    from core.cache import PackageCache
+
+    settings = load_settings()
+    if not settings.cache_folder:
+        print("[Main] La caché de paquetes no está configurada (cache_folder).")
+        return
+
+    stats = PackageCache(settings.cache_folder, settings.cache_max_bytes).stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_ratio = stats["hits"] / lookups * 100 if lookups else 0.0
+    print(f"Entradas: {stats['entries']}  Uso: {stats['bytes']} / {stats['max_bytes']} bytes")
+    print(f"Aciertos: {stats['hits']}  Fallos: {stats['misses']}  Expulsiones: {stats['evictions']}  "
+          f"Tasa de acierto: {hit_ratio:.1f}%")
+
+
+def run_verify(full: bool, repair: bool, report_path: Optional[str]) -> None:
+    """
+    Verifica la integridad de la carpeta de despliegue y, si se indica, repara
+    solo los archivos modificados o ausentes.
+    """
+    import json
+    from core.verifier import Verifier
+
+    logger = Logger().get_logger()
+    settings = load_settings()
+    verifier = Verifier(settings.deploy_folder, settings.get_verify_index_file(), settings.extract_workers)
+    report = verifier.scan(full)
+
+    for label, paths in (("Modificado", report.modified), ("Ausente", report.missing), ("Adicional", report.extra)):
+        for path in sorted(paths):
+            print(f"{label}\t{path}")
+    print(f"[Main] {report.files} archivos verificados: {len(report.modified)} modificados, "
+          f"{len(report.missing)} ausentes, {len(report.extra)} adicionales.")
+
+    remaining = report.damaged
+    if repair and remaining:
+        from core.downloader import Downloader
+        from core.mirrors import MirrorSet
+
+        mirrors = None
+        if settings.download_mirrors:
+            mirrors = MirrorSet(settings.download_mirrors, settings.get_mirror_health_file(),
+                                settings.mirror_probe_ttl)
+        downloader = Downloader(settings.download_url_template, settings.download_folder,
+                                connections=settings.download_connections,
+                                retries=settings.download_retries,
+                                backoff_base=settings.download_backoff,
+                                checksum_url_template=settings.checksum_url_template,
+                                require_checksum=settings.require_checksum, mirrors=mirrors,
+                                checksum_from_mirrors=settings.checksum_from_mirrors)
+        remaining = verifier.repair(report, settings.get_backup_folder(), downloader)
+        if remaining:
+            logger.error(f"[Main] No se pudieron reparar {len(remaining)} archivos.")
+        else:
+            logger.info("[Main] Todos los archivos dañados fueron reparados.")
+
+    if report_path:
+        data = dict(report.to_dict(), unrepaired=remaining if repair else None)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+    if remaining:
+        sys.exit(1)
+
+
+def main(argv=None) -> None:
+    """
+    Punto de entrada de línea de comandos:
+    - update (por defecto): ejecuta el proceso de actualización.
+    - snapshots: lista los snapshots del almacén de respaldos.
+    - restore <id>: restaura un snapshot concreto.
+    - rollback: vuelve a la versión anterior a la última actualización.
+    - fleet <configs...>: actualiza varios destinos en paralelo.
+    - daemon: ejecuta el agente como servicio con consultas periódicas.
+    - cache: muestra las estadísticas de la caché de paquetes.
+    - verify: verifica la integridad de la instalación (y la repara con --repair).
+    """
+    parser = argparse.ArgumentParser(description="Agente de actualización del ERP")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("update", help="Buscar e instalar actualizaciones (por defecto)")
+    commands.add_parser("snapshots", help="Listar los snapshots de respaldo")
+    restore_parser = commands.add_parser("restore", help="Restaurar un snapshot de respaldo")
+    restore_parser.add_argument("snapshot_id")
+    rollback_parser = commands.add_parser("rollback", help="Volver a la versión anterior")
+    rollback_parser.add_argument("--snapshot", help="Snapshot concreto a restaurar (por defecto, la versión anterior)")
+    commands.add_parser("daemon", help="Ejecutar como servicio con consultas periódicas")
+    commands.add_parser("cache", help="Mostrar estadísticas de la caché de paquetes")
+    verify_parser = commands.add_parser("verify", help="Verificar la integridad de la instalación")
+    verify_parser.add_argument("--full", action="store_true",
+                               help="Recalcular el hash de todos los archivos, aunque no cambiaran tamaño ni fecha")
+    verify_parser.add_argument("--repair", action="store_true",
+                               help="Reparar solo los archivos modificados o ausentes")
+    verify_parser.add_argument("--report", help="Ruta del informe JSON de la verificación")
+    fleet_parser = commands.add_parser("fleet", help="Actualizar varios destinos en paralelo")
+    fleet_parser.add_argument("configs", nargs="+", help="Archivos de configuración (o con sección 'targets')")
+    fleet_parser.add_argument("--workers", type=int, default=4, help="Destinos procesados a la vez")
+    fleet_parser.add_argument("--report", help="Ruta del informe JSON de la ejecución")
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshots":
+        list_snapshots()
+    elif args.command == "restore":
+        restore_snapshot(args.snapshot_id)
+    elif args.command == "rollback":
+        rollback(args.snapshot)
+    elif args.command == "daemon":
+        run_daemon()
+    elif args.command == "cache":
+        show_cache_stats()
+    elif args.command == "verify":
+        run_verify(args.full, args.repair, args.report)
+    elif args.command == "fleet":
+        run_fleet(args.configs, args.workers, args.report)
+    else:
+        run_update()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+# tests/test_cache.py
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+from core.cache import PackageCache
+from lib.filelock import FileLock
+
+
+def _package(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path), hashlib.sha256(data).hexdigest()
+
+
+def test_hit_by_key_and_by_hash(tmp_path):
+    cache = PackageCache(str(tmp_path / "cache"))
+    path, sha256 = _package(tmp_path, "erp_1.0.zip", b"paquete 1.0")
+    cache.store("https://srv/erp_1.0.zip", path, sha256, "1.0")
+
+    destination = str(tmp_path / "out" / "a.zip")
+    assert cache.fetch("https://srv/erp_1.0.zip", destination) == sha256
+    assert open(destination, "rb").read() == b"paquete 1.0"
+    # Por hash se encuentra aunque la URL sea otra (p. ej. un espejo)
+    assert cache.fetch("https://espejo/erp_1.0.zip", str(tmp_path / "out" / "b.zip"), sha256) == sha256
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 0, 1)
+
+
+def test_miss_and_rebuilt_package(tmp_path):
+    cache = PackageCache(str(tmp_path / "cache"))
+    path, sha256 = _package(tmp_path, "erp.zip", b"original")
+    cache.store("https://srv/erp.zip", path, sha256)
+
+    assert cache.fetch("https://srv/otro.zip", str(tmp_path / "x.zip")) is None
+    # Paquete publicado de nuevo con la misma URL: el checksum esperado manda
+    rebuilt = hashlib.sha256(b"reconstruido").hexdigest()
+    assert cache.fetch("https://srv/erp.zip", str(tmp_path / "y.zip"), rebuilt) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_corrupt_object_is_evicted(tmp_path):
+    cache = PackageCache(str(tmp_path / "cache"))
+    path, sha256 = _package(tmp_path, "erp.zip", b"contenido correcto")
+    cache.store("https://srv/erp.zip", path, sha256)
+    with open(cache._object_path(sha256), "wb") as f:
+        f.write(b"contenido alterado")
+
+    destination = tmp_path / "out.zip"
+    assert cache.fetch("https://srv/erp.zip", str(destination)) is None
+    assert not destination.exists()
+    assert not os.path.exists(cache._object_path(sha256))
+    stats = cache.stats()
+    assert stats["entries"] == 0 and stats["misses"] == 1
+
+
+def test_lru_eviction(tmp_path):
+    cache = PackageCache(str(tmp_path / "cache"), max_bytes=25)
+    packages = [_package(tmp_path, f"p{i}.zip", bytes([65 + i]) * 10) for i in range(3)]
+    cache.store("k0", *packages[0])
+    cache.store("k1", *packages[1])
+    # Usar k0 lo convierte en el más reciente: el expulsado al añadir k2 es k1
+    assert cache.fetch("k0", str(tmp_path / "hit.zip"))
+    cache.store("k2", *packages[2])
+
+    assert cache.fetch("k1", str(tmp_path / "miss.zip")) is None
+    assert cache.fetch("k0", str(tmp_path / "k0.zip"))
+    assert cache.fetch("k2", str(tmp_path / "k2.zip"))
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 2 and stats["bytes"] == 20
+
+
+def test_package_larger_than_cache_is_kept(tmp_path):
+    cache = PackageCache(str(tmp_path / "cache"), max_bytes=5)
+    path, sha256 = _package(tmp_path, "big.zip", b"x" * 50)
+    cache.store("big", path, sha256)
+    assert cache.fetch("big", str(tmp_path / "big-out.zip")) == sha256
+
+
+def test_concurrent_agents_keep_index_consistent(tmp_path):
+    root = str(tmp_path / "cache")
+    path, sha256 = _package(tmp_path, "erp.zip", b"compartido")
+    PackageCache(root).store("https://srv/erp.zip", path, sha256)
+
+    errors = []
+
+    def agent(number):
+        try:
+            cache = PackageCache(root)
+            for attempt in range(5):
+                destination = str(tmp_path / f"agent{number}" / f"{attempt}.zip")
+                if cache.fetch("https://srv/erp.zip", destination) != sha256:
+                    errors.append(number)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=agent, args=(number,)) for number in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Cada acierto quedó registrado: ninguna actualización del índice se perdió
+    assert PackageCache(root).stats()["hits"] == 30
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / ".lock")
+    with FileLock(path):
+        with pytest.raises(TimeoutError):
+            FileLock(path, timeout=0.1).acquire()
+    with FileLock(path, timeout=0.1):
+        pass
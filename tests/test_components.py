@@ -0,0 +1,106 @@
+# tests/test_components.py
+
+import pytest
+
+from core.components import ComponentIndex, ComponentManifest, download_filename, plan_updates
+
+
+def _manifest(*components):
+    return ComponentManifest.from_dict({"version": "2024.3", "components": [
+        {"name": name, "version": version, "url": f"https://srv/{name}/package.tar.zst", **extra}
+        for name, version, extra in components
+    ]})
+
+
+def _index(tmp_path, **installed):
+    index = ComponentIndex(str(tmp_path / "index.json"))
+    for name, entry in installed.items():
+        index.components[name] = dict({"path": name}, **entry)
+    return index
+
+
+def _names(plan):
+    return [component.name for component in plan]
+
+
+def test_plan_installs_missing_components(tmp_path):
+    manifest = _manifest(("core", "1.0.0", {}), ("ui", "2.0.0", {}))
+    assert _names(plan_updates(manifest, _index(tmp_path))) == ["core", "ui"]
+
+
+def test_plan_only_newer_versions(tmp_path):
+    manifest = _manifest(("core", "1.10.0", {}), ("ui", "2.0.0", {}), ("reports", "3.0.0-rc.1", {}))
+    index = _index(tmp_path, core={"version": "1.9.0"}, ui={"version": "2.0.0"},
+                   reports={"version": "3.0.0-beta"})
+    assert _names(plan_updates(manifest, index)) == ["core", "reports"]
+
+
+def test_plan_never_downgrades(tmp_path):
+    manifest = _manifest(("core", "1.0.0", {}))
+    assert plan_updates(manifest, _index(tmp_path, core={"version": "1.1.0"})) == []
+
+
+def test_plan_reinstalls_moved_component(tmp_path):
+    manifest = _manifest(("core", "1.0.0", {"path": "Core"}))
+    assert _names(plan_updates(manifest, _index(tmp_path, core={"version": "1.0.0", "path": "core"}))) == ["core"]
+
+
+def test_plan_unreadable_installed_version(tmp_path):
+    manifest = _manifest(("core", "1.0.0", {}))
+    assert _names(plan_updates(manifest, _index(tmp_path, core={"version": "dev"}))) == ["core"]
+
+
+def test_plan_keeps_removed_components(tmp_path):
+    manifest = _manifest(("core", "1.0.0", {}))
+    index = _index(tmp_path, core={"version": "1.0.0"}, legacy={"version": "0.1"})
+    assert plan_updates(manifest, index) == []
+
+
+def test_index_round_trip(tmp_path):
+    manifest = _manifest(("core", "1.0.0", {"sha256": "AB" * 32}))
+    index = _index(tmp_path)
+    index.record(manifest.components[0])
+    index.save()
+    loaded = ComponentIndex.load(index.path)
+    assert loaded.version_of("core") == "1.0.0"
+    assert loaded.components["core"]["sha256"] == "ab" * 32
+    assert plan_updates(manifest, loaded) == []
+
+
+@pytest.mark.parametrize("components", [
+    [("core", "1.0.0", {}), ("core", "1.1.0", {})],
+    [("core", "1.0.0", {"path": "App"}), ("ui", "1.0.0", {"path": "App/UI"})],
+    [("core", "1.0.0", {"path": "../outside"})],
+    [("core", "1.0.0", {"path": "Data"})],
+    [("core", "1.0.0", {"path": ""})],
+    [("core", "1.0.0", {"path": "./"})],
+    [("core", "1.0.0", {"path": "App/.."})],
+    [("core", "1.0.0", {"path": "App/"}), ("ui", "1.0.0", {"path": "./App/UI"})],
+    [("core", "1.0.0", {"path": "Core"}), ("ui", "1.0.0", {"path": "core"})],
+    [("core", "not-a-version", {})],
+])
+def test_manifest_rejects_invalid_components(components):
+    with pytest.raises(ValueError):
+        _manifest(*components)
+
+
+def test_component_paths_are_normalized():
+    manifest = _manifest(("core", "1.0.0", {"path": "./App//Core/"}), ("ui", "1.0.0", {"path": "App\\UI"}))
+    assert [component.path for component in manifest.components] == ["App/Core", "App/UI"]
+
+
+def test_file_version_without_published_version():
+    manifest = ComponentManifest.from_dict({"components": [
+        {"name": "core", "version": "1.10.0", "url": "https://srv/core.zip"},
+        {"name": "ui", "version": "1.9.3", "url": "https://srv/ui.zip"},
+    ]})
+    assert manifest.label == "core=1.10.0,ui=1.9.3"
+    assert manifest.file_version == "1.10.0"
+    assert _manifest(("core", "1.0.0", {})).file_version == "2024.3"
+
+
+def test_download_filenames_are_distinct():
+    manifest = _manifest(("core", "1.0.0", {}), ("ui", "1.0.0", {}))
+    names = [component.filename for component in manifest.components]
+    assert names == ["core-1.0.0-package.tar.zst", "ui-1.0.0-package.tar.zst"]
+    assert download_filename("a b", "1.0+x/y", "https://srv/p.zip?token=1") == "a_b-1.0_x_y-p.zip"
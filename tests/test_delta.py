@@ -0,0 +1,91 @@
+# tests/test_delta.py
+
+import hashlib
+import json
+import zipfile
+
+import pytest
+
+from core.delta import DELTA_INDEX_NAME, DeltaError, DeltaPackage
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _delta(tmp_path, index, members=None):
+    path = tmp_path / "delta.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        if index is not None:
+            zf.writestr(DELTA_INDEX_NAME, json.dumps(index))
+        for name, data in (members or {}).items():
+            zf.writestr(name, data)
+    return zipfile.ZipFile(path)
+
+
+def test_index_is_parsed_and_paths_normalized(tmp_path):
+    index = {"from": "1.2.2", "to": "1.2.3",
+             "manifest": {"files": {"bin\\app.exe": {"size": 3, "sha256": _sha256(b"new")}}},
+             "patches": {"bin\\app.exe": {"source_sha256": _sha256(b"old"), "member": "patches/app.bsdiff"}},
+             "files": {"lib\\new.dll": "files/new.dll"}}
+    with _delta(tmp_path, index) as zf:
+        delta = DeltaPackage(zf)
+        assert (delta.from_version, delta.to_version) == ("1.2.2", "1.2.3")
+        assert delta.manifest.version == "1.2.3"
+        assert list(delta.manifest.files) == ["bin/app.exe"]
+        assert list(delta.patches) == ["bin/app.exe"]
+        assert delta.files == {"lib/new.dll": "files/new.dll"}
+
+
+def test_missing_index(tmp_path):
+    with _delta(tmp_path, None) as zf, pytest.raises(DeltaError):
+        DeltaPackage(zf)
+
+
+def test_build_full_file(tmp_path):
+    index = {"to": "2", "manifest": {"files": {"a.txt": {"size": 3, "sha256": _sha256(b"new")}}},
+             "files": {"a.txt": "files/a.txt"}}
+    destination = tmp_path / "a.txt.tmp"
+    with _delta(tmp_path, index, {"files/a.txt": b"new"}) as zf:
+        DeltaPackage(zf).build_file("a.txt", str(tmp_path / "a.txt"), str(destination))
+    assert destination.read_bytes() == b"new"
+
+
+def test_build_rejects_hash_mismatch(tmp_path):
+    index = {"to": "2", "manifest": {"files": {"a.txt": {"size": 3, "sha256": _sha256(b"new")}}},
+             "files": {"a.txt": "files/a.txt"}}
+    destination = tmp_path / "a.txt.tmp"
+    with _delta(tmp_path, index, {"files/a.txt": b"bad"}) as zf, pytest.raises(DeltaError):
+        DeltaPackage(zf).build_file("a.txt", str(tmp_path / "a.txt"), str(destination))
+    assert not destination.exists()
+
+
+def test_build_without_data(tmp_path):
+    index = {"to": "2", "manifest": {"files": {"a.txt": {"size": 3, "sha256": _sha256(b"new")}}}}
+    with _delta(tmp_path, index) as zf, pytest.raises(DeltaError):
+        DeltaPackage(zf).build_file("a.txt", str(tmp_path / "a.txt"), str(tmp_path / "out"))
+
+
+def test_patch_requires_matching_base(tmp_path):
+    index = {"to": "2", "manifest": {"files": {"a.txt": {"size": 3, "sha256": _sha256(b"new")}}},
+             "patches": {"a.txt": {"source_sha256": _sha256(b"old"), "member": "patches/a.bsdiff"}}}
+    source = tmp_path / "a.txt"
+    with _delta(tmp_path, index, {"patches/a.bsdiff": b""}) as zf:
+        delta = DeltaPackage(zf)
+        with pytest.raises(DeltaError, match="ausente"):
+            delta.build_file("a.txt", str(source), str(tmp_path / "out"))
+        source.write_bytes(b"locally modified")
+        with pytest.raises(DeltaError, match="versión base"):
+            delta.build_file("a.txt", str(source), str(tmp_path / "out"))
+
+
+def test_apply_binary_patch(tmp_path):
+    bsdiff4 = pytest.importorskip("bsdiff4")
+    old, new = b"version 1 of the file" * 50, b"version 2 of the file" * 50
+    index = {"to": "2", "manifest": {"files": {"a.bin": {"size": len(new), "sha256": _sha256(new)}}},
+             "patches": {"a.bin": {"source_sha256": _sha256(old), "member": "patches/a.bsdiff"}}}
+    source, destination = tmp_path / "a.bin", tmp_path / "a.bin.tmp"
+    source.write_bytes(old)
+    with _delta(tmp_path, index, {"patches/a.bsdiff": bsdiff4.diff(old, new)}) as zf:
+        DeltaPackage(zf).build_file("a.bin", str(source), str(destination))
+    assert destination.read_bytes() == new
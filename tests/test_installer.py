@@ -0,0 +1,37 @@
+# tests/test_installer.py
+
+import os
+import zipfile
+
+from core.installer import Installer
+
+
+def _package(path, files):
+    with zipfile.ZipFile(path, "w") as zip_ref:
+        for name, data in files.items():
+            zip_ref.writestr(name, data)
+    return str(path)
+
+
+def test_swap_does_not_share_mutable_files_with_previous(tmp_path):
+    deploy = tmp_path / "deploy"
+    installer = Installer(str(deploy), str(deploy / "version.txt"), swap=True)
+    assert installer.install_update(_package(tmp_path / "v1.zip", {"app.exe": b"1", "erp.ini": b"cfg=1",
+                                                                   "lib.dll": b"dll"}), "1.0")
+    assert installer.install_update(_package(tmp_path / "v2.zip", {"app.exe": b"2", "erp.ini": b"cfg=1",
+                                                                   "lib.dll": b"dll"}), "2.0")
+
+    # Una edición en el sitio de la configuración no alcanza a la versión anterior
+    with open(deploy / "erp.ini", "r+b") as f:
+        f.write(b"XXX")
+    assert (tmp_path / "deploy.previous" / "erp.ini").read_bytes() == b"cfg=1"
+
+    assert (deploy / "app.exe").read_bytes() == b"2"
+    assert (deploy / "version.txt").read_text().strip() == "2.0"
+    if os.name != "nt":
+        assert os.stat(deploy / "erp.ini").st_nlink == 1
+
+    # La vuelta atrás recupera la versión anterior intacta
+    assert installer.rollback(str(tmp_path / "backups"))
+    assert (deploy / "app.exe").read_bytes() == b"1"
+    assert (deploy / "erp.ini").read_bytes() == b"cfg=1"
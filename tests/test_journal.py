@@ -0,0 +1,80 @@
+# tests/test_journal.py
+
+from core.journal import TransferJournal
+
+
+def _journal(tmp_path, size=100, etag='"v1"', last_modified=""):
+    journal = TransferJournal(str(tmp_path / "package.zip.part.json"))
+    journal.reset("https://srv/package.zip", size, etag, last_modified)
+    return journal
+
+
+def test_ranges_merge_and_gaps(tmp_path):
+    journal = _journal(tmp_path)
+    journal.add_range(40, 60)
+    journal.add_range(0, 10)
+    journal.add_range(10, 20)
+    journal.add_range(55, 70)
+    journal.add_range(5, 5)
+    assert journal.ranges == [[0, 20], [40, 70]]
+    assert journal.missing() == [(20, 40), (70, 100)]
+    assert journal.prefix_end() == 20
+    assert journal.completed_bytes() == 50
+
+
+def test_complete_transfer_has_no_gaps(tmp_path):
+    journal = _journal(tmp_path)
+    journal.add_range(50, 100)
+    assert journal.prefix_end() == 0
+    journal.add_range(0, 50)
+    assert journal.missing() == []
+    assert journal.prefix_end() == 100
+
+
+def test_unknown_size_has_no_missing_ranges(tmp_path):
+    assert _journal(tmp_path, size=None).missing() == []
+
+
+def test_save_and_load(tmp_path):
+    journal = _journal(tmp_path, last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    journal.add_range(0, 30)
+    journal.save()
+    loaded = TransferJournal.load(journal.path)
+    assert (loaded.url, loaded.size, loaded.etag, loaded.last_modified) == \
+        ("https://srv/package.zip", 100, '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    assert loaded.ranges == [[0, 30]]
+    journal.delete()
+    assert TransferJournal.load(journal.path).ranges == []
+
+
+def test_corrupt_journal_is_discarded(tmp_path):
+    path = tmp_path / "package.zip.part.json"
+    path.write_text("{not json", encoding="utf-8")
+    journal = TransferJournal.load(str(path))
+    assert journal.url == "" and journal.ranges == []
+
+
+def test_matches_requires_same_resource_and_validator(tmp_path):
+    journal = _journal(tmp_path)
+    url = "https://srv/package.zip"
+    assert journal.matches(url, 100, '"v1"', "")
+    assert not journal.matches(url, 100, '"v2"', "")
+    assert not journal.matches(url, 101, '"v1"', "")
+    assert not journal.matches("https://srv/other.zip", 100, '"v1"', "")
+
+    by_date = _journal(tmp_path, etag="", last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    assert by_date.matches(url, 100, "", "Mon, 01 Jan 2024 00:00:00 GMT")
+    assert not by_date.matches(url, 100, "", "Tue, 02 Jan 2024 00:00:00 GMT")
+
+    # Sin validador no es seguro reanudar
+    unvalidated = _journal(tmp_path, etag="")
+    assert not unvalidated.matches(url, 100, "", "")
+
+
+def test_rebind_keeps_ranges(tmp_path):
+    journal = _journal(tmp_path)
+    journal.add_range(0, 40)
+    journal.rebind('"mirror"', "")
+    loaded = TransferJournal.load(journal.path)
+    assert loaded.etag == '"mirror"'
+    assert loaded.ranges == [[0, 40]]
@@ -0,0 +1,130 @@
+# tests/test_manifest.py
+
+import hashlib
+import json
+import os
+import zipfile
+
+import pytest
+
+from core.installer import Installer
+from core.manifest import INSTALLED_MANIFEST_NAME, PACKAGE_MANIFEST_NAME, Manifest, is_protected, is_safe_path
+
+
+def _entry(data):
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def _tree(folder, files):
+    for path, data in files.items():
+        local_path = folder / path
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        local_path.write_bytes(data)
+
+
+def _package(path, files, manifest=None):
+    with zipfile.ZipFile(path, "w") as zip_ref:
+        for name, data in files.items():
+            zip_ref.writestr(name, data)
+        if manifest is not None:
+            zip_ref.writestr(PACKAGE_MANIFEST_NAME, json.dumps(manifest))
+    return str(path)
+
+
+# La barra inicial se descarta al normalizar: "/etc/passwd" queda dentro del despliegue
+@pytest.mark.parametrize("path, safe", [
+    ("app/erp.exe", True), ("a\\b.dll", True), ("/etc/passwd", True), ("../x", False),
+    ("C:/x", False), ("a/../../b", False), ("", False),
+])
+def test_is_safe_path(path, safe):
+    assert is_safe_path(path) is safe
+
+
+def test_is_protected():
+    assert is_protected("Data") and is_protected("Data/db.dat") and is_protected("\\Data\\x")
+    assert not is_protected("DataFiles/x") and not is_protected("app/Data")
+
+
+def test_diff_classifies_files(tmp_path):
+    _tree(tmp_path, {"same.dll": b"igual", "changed.exe": b"viejo", "resized.ini": b"a=1", "gone.txt": b"x",
+                     "Data/db.dat": b"datos"})
+    installed = Manifest("1.0", {path: _entry(data) for path, data in
+                                 {"same.dll": b"igual", "changed.exe": b"viejo", "resized.ini": b"a=1",
+                                  "gone.txt": b"x"}.items()})
+    target = Manifest("2.0", {"same.dll": _entry(b"igual"), "changed.exe": _entry(b"nuevo"),
+                              "resized.ini": _entry(b"a=10"), "added.bpl": _entry(b"+"),
+                              "Data/db.dat": _entry(b"otros")})
+
+    plan = target.diff(str(tmp_path), installed)
+    assert sorted(plan.to_write) == ["added.bpl", "changed.exe", "resized.ini"]
+    assert plan.unchanged == ["same.dll"]
+    assert plan.to_delete == ["gone.txt"]
+
+
+def test_diff_trusts_recorded_mtime(tmp_path):
+    _tree(tmp_path, {"app.exe": b"local"})
+    stat = os.stat(tmp_path / "app.exe")
+    target = Manifest("2.0", {"app.exe": _entry(b"nuevo")})
+
+    # Mismo tamaño y mtime que el manifiesto instalado: se confía en su hash sin leer el archivo
+    installed = Manifest("1.0", {"app.exe": dict(_entry(b"nuevo"), mtime_ns=stat.st_mtime_ns)})
+    assert target.diff(str(tmp_path), installed).unchanged == ["app.exe"]
+    # Sin mtime registrado se calcula el hash real
+    assert target.diff(str(tmp_path), Manifest("1.0", {"app.exe": _entry(b"nuevo")})).to_write == ["app.exe"]
+
+
+def test_from_zip_uses_packaged_manifest_or_derives_it(tmp_path):
+    files = {"app.exe": b"programa", "lib/a.dll": b"libreria"}
+    with zipfile.ZipFile(_package(tmp_path / "derived.zip", files)) as zip_ref:
+        manifest = Manifest.from_zip(zip_ref, "1.0")
+    assert manifest.version == "1.0"
+    assert manifest.files == {path: _entry(data) for path, data in files.items()}
+
+    packaged = {"version": "0.9", "files": {"\\app.exe": _entry(b"programa")}}
+    with zipfile.ZipFile(_package(tmp_path / "packaged.zip", files, packaged)) as zip_ref:
+        manifest = Manifest.from_zip(zip_ref, "1.0")
+    assert manifest.version == "1.0"
+    assert list(manifest.files) == ["app.exe"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "sub" / INSTALLED_MANIFEST_NAME)
+    Manifest("1.0", {"a\\b.dll": _entry(b"x")}).save(path)
+    loaded = Manifest.load(path)
+    assert loaded.version == "1.0" and list(loaded.files) == ["a/b.dll"]
+    assert Manifest.load(str(tmp_path / "missing.json")) is None
+
+
+def test_incremental_install_only_writes_changes(tmp_path):
+    deploy = tmp_path / "deploy"
+    installer = Installer(str(deploy), str(deploy / "version.txt"))
+    v1 = {"app.exe": b"programa 1", "lib/a.dll": b"libreria", "old.txt": b"retirado", "Data/seed.dat": b"semilla"}
+    assert installer.install_update(_package(tmp_path / "v1.zip", v1), "1.0")
+    # 'Data' nunca se escribe desde el paquete
+    assert not (deploy / "Data" / "seed.dat").exists()
+
+    _tree(deploy, {"Data/db.dat": b"datos del cliente"})
+    untouched = os.stat(deploy / "lib" / "a.dll").st_mtime_ns
+
+    v2 = {"app.exe": b"programa 2", "lib/a.dll": b"libreria", "new.bpl": b"nuevo"}
+    installer = Installer(str(deploy), str(deploy / "version.txt"))
+    assert installer.install_update(_package(tmp_path / "v2.zip", v2), "2.0")
+
+    assert installer.last_stats["bytes_written"] == len(b"programa 2") + len(b"nuevo")
+    assert os.stat(deploy / "lib" / "a.dll").st_mtime_ns == untouched
+    assert (deploy / "app.exe").read_bytes() == b"programa 2"
+    assert (deploy / "new.bpl").exists()
+    assert not (deploy / "old.txt").exists()
+    assert (deploy / "Data" / "db.dat").read_bytes() == b"datos del cliente"
+    assert (deploy / "version.txt").read_text().strip() == "2.0"
+
+    installed = Manifest.load(str(deploy / INSTALLED_MANIFEST_NAME))
+    assert installed.version == "2.0" and sorted(installed.files) == ["app.exe", "lib/a.dll", "new.bpl"]
+
+
+def test_install_rejects_manifest_with_missing_member(tmp_path):
+    deploy = tmp_path / "deploy"
+    package = _package(tmp_path / "bad.zip", {"app.exe": b"x"},
+                       {"files": {"app.exe": _entry(b"x"), "lib/a.dll": _entry(b"y")}})
+    assert not Installer(str(deploy), str(deploy / "version.txt")).install_update(package, "1.0")
+    assert not (deploy / "version.txt").exists()
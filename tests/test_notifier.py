@@ -0,0 +1,120 @@
+# tests/test_notifier.py
+
+import sys
+import types
+
+import pytest
+
+from core.notifier import (DesktopSink, JsonFileSink, NotificationSink, Notifier, SINK_FACTORIES,
+                           build_sinks, coalesce, register_sink)
+from core.validator import validate_settings
+
+
+class RecordingSink(NotificationSink):
+    name = "recording"
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, title, message, events):
+        self.sent.append((title, message, len(events)))
+
+
+def _settings(tmp_path, notify_type, **overrides):
+    data = {
+        "version_file": str(tmp_path / "version.txt"),
+        "remote_version_url": "http://updates.invalid/version.txt",
+        "download_url_template": "http://updates.invalid/erp_{}.zip",
+        "download_folder": str(tmp_path / "downloads"),
+        "deploy_folder": str(tmp_path / "deploy"),
+        "notify_type": notify_type,
+    }
+    data.update(overrides)
+    return validate_settings(data)
+
+
+def test_coalesce_merges_without_repeating():
+    events = [{"title": "ERP Update", "message": "Descarga completada."},
+              {"title": "ERP Update", "message": "Descarga completada."},
+              {"title": "ERP Update", "message": "Instalación completada."}]
+    assert coalesce(events) == ("ERP Update", "Descarga completada.\nInstalación completada.")
+
+    title, _ = coalesce([{"title": "A", "message": "x"}, {"title": "B", "message": "y"}])
+    assert title == "ERP Update"
+
+
+def test_burst_is_sent_as_one_message():
+    sink = RecordingSink()
+    notifier = Notifier(sinks=[sink], coalesce_seconds=0.5)
+    for step in ("Descarga completada.", "Instalación completada.", "Actualización Exitosa."):
+        assert notifier.send_notification("ERP Update", step)
+    assert notifier.close(timeout=5)
+    assert sink.sent == [("ERP Update", "Descarga completada.\nInstalación completada.\nActualización Exitosa.", 3)]
+    # Tras cerrar ya no se encola nada
+    assert not notifier.send_notification("ERP Update", "tarde")
+
+
+def test_without_sinks_nothing_is_queued():
+    assert not Notifier(sinks=[]).send_notification("ERP Update", "mensaje")
+
+
+def test_build_sinks_selection(tmp_path):
+    sinks = build_sinks(_settings(tmp_path, "desktop, JSON"), "app")
+    assert [sink.name for sink in sinks] == ["desktop", "json"]
+    assert isinstance(sinks[1], JsonFileSink)
+    assert sinks[1].path == str(tmp_path / "downloads" / "notifications.jsonl")
+
+    assert build_sinks(_settings(tmp_path, "none"), "app") == []
+    assert build_sinks(_settings(tmp_path, ""), "app") == []
+
+
+def test_build_sinks_legacy_and_incomplete_types(tmp_path):
+    # Valores antiguos de notify_type se tratan como escritorio, sin duplicarlo
+    assert [sink.name for sink in build_sinks(_settings(tmp_path, "popup,desktop"), "app")] == ["desktop"]
+    # Un webhook sin URL se omite en lugar de fallar
+    assert [sink.name for sink in build_sinks(_settings(tmp_path, "webhook,json"), "app")] == ["json"]
+
+
+def test_register_sink(tmp_path, monkeypatch):
+    monkeypatch.setitem(SINK_FACTORIES, "recording", lambda settings, app_name: RecordingSink())
+    register_sink("recording", lambda settings, app_name: RecordingSink())
+    sinks = build_sinks(_settings(tmp_path, "recording"), "app")
+    assert len(sinks) == 1 and isinstance(sinks[0], RecordingSink)
+
+
+def test_json_sink_appends_lines(tmp_path):
+    sink = JsonFileSink(str(tmp_path / "out" / "notifications.jsonl"), "app")
+    sink.send("ERP Update", "uno", [{}])
+    sink.send("ERP Update", "dos", [{}, {}])
+    lines = (tmp_path / "out" / "notifications.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2 and '"dos"' in lines[1]
+
+
+def test_sink_base_is_abstract():
+    with pytest.raises(TypeError):
+        NotificationSink()
+
+
+def _fake_plyer(monkeypatch, error):
+    def notify(**kwargs):
+        raise error
+
+    module = types.ModuleType("plyer")
+    module.notification = types.SimpleNamespace(notify=notify)
+    monkeypatch.setitem(sys.modules, "plyer", module)
+
+
+def test_desktop_sink_disabled_without_backend(monkeypatch):
+    _fake_plyer(monkeypatch, NotImplementedError("sin backend"))
+    sink = DesktopSink("app")
+    with pytest.raises(NotImplementedError):
+        sink.send("t", "m", [{"timeout": 10}])
+    assert sink.disabled
+
+
+def test_desktop_sink_transient_error_keeps_it_enabled(monkeypatch):
+    _fake_plyer(monkeypatch, RuntimeError("dbus ocupado"))
+    sink = DesktopSink("app")
+    with pytest.raises(RuntimeError):
+        sink.send("t", "m", [{"timeout": 10}])
+    assert not sink.disabled
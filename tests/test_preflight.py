@@ -0,0 +1,129 @@
+# tests/test_preflight.py
+
+import time
+from collections import namedtuple
+
+import pytest
+
+import core.preflight as preflight
+from core.preflight import Preflight, clear_cache
+from core.validator import validate_settings
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def _settings(tmp_path, **overrides):
+    data = {
+        "version_file": str(tmp_path / "deploy" / "version.txt"),
+        "remote_version_url": "http://updates.invalid/version.txt",
+        "download_url_template": "http://updates.invalid/erp_{}.zip",
+        "download_folder": str(tmp_path / "downloads"),
+        "deploy_folder": str(tmp_path / "deploy"),
+        "notify_type": "desktop",
+    }
+    data.update(overrides)
+    (tmp_path / "deploy").mkdir(exist_ok=True)
+    return validate_settings(data)
+
+
+def _with_checks(checker, checks):
+    checker._checks = lambda: checks
+    return checker
+
+
+def test_deadline_reports_hanging_check(tmp_path):
+    checker = _with_checks(Preflight(_settings(tmp_path), timeout=0.2, ttl=0), [
+        ("fast", None, lambda: "ok"),
+        ("slow", None, lambda: time.sleep(5)),
+    ])
+    started = time.monotonic()
+    results = {result.name: result for result in checker.run()}
+    assert time.monotonic() - started < 2
+    assert results["fast"].ok
+    assert not results["slow"].ok
+    assert "plazo" in results["slow"].reason
+
+
+def test_failures_are_reported_with_reason(tmp_path):
+    def fail():
+        raise RuntimeError("sin red")
+
+    checker = _with_checks(Preflight(_settings(tmp_path), timeout=2, ttl=0), [("dns:srv", None, fail)])
+    result = checker.run()[0]
+    assert not result.ok and result.reason == "sin red"
+    assert result.kind == "dns"
+
+
+def test_passed_checks_are_reused_within_ttl(tmp_path):
+    calls = []
+
+    def check():
+        calls.append(1)
+        return "detalle"
+
+    settings = _settings(tmp_path)
+    for _ in range(2):
+        result = _with_checks(Preflight(settings, timeout=2, ttl=60), [("dns:srv", ("dns", "srv"), check)]).run()[0]
+        assert result.ok and result.reason == "detalle"
+    assert len(calls) == 1
+    assert result.cached
+
+    # Sin TTL, o tras vaciar la caché, se vuelve a comprobar
+    _with_checks(Preflight(settings, timeout=2, ttl=0), [("dns:srv", ("dns", "srv"), check)]).run()
+    clear_cache()
+    _with_checks(Preflight(settings, timeout=2, ttl=60), [("dns:srv", ("dns", "srv"), check)]).run()
+    assert len(calls) == 3
+
+
+def test_failed_checks_are_not_cached(tmp_path):
+    calls = []
+
+    def check():
+        calls.append(1)
+        raise RuntimeError("caído")
+
+    settings = _settings(tmp_path)
+    for _ in range(2):
+        _with_checks(Preflight(settings, timeout=2, ttl=60), [("dns:srv", ("dns", "srv"), check)]).run()
+    assert len(calls) == 2
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    settings = _settings(tmp_path)
+    checks = [("dns:srv", ("dns", "srv"), lambda: "ok")]
+    _with_checks(Preflight(settings, timeout=2, ttl=60), checks).run()
+
+    now = time.monotonic()
+    monkeypatch.setattr(preflight.time, "monotonic", lambda: now + 120)
+    assert not Preflight(settings, timeout=2, ttl=60)._cached(("dns", "srv"))
+
+
+DiskUsage = namedtuple("DiskUsage", "total used free")
+
+
+def _disk_checker(tmp_path, monkeypatch, local, remote):
+    settings = _settings(tmp_path)
+    (tmp_path / "deploy" / "version.txt").write_text(local)
+    (tmp_path / "deploy" / "erp.bin").write_bytes(b"x" * 1024)
+    monkeypatch.setattr(preflight.shutil, "disk_usage", lambda path: DiskUsage(0, 0, 1024))
+    checker = Preflight(settings, timeout=2, ttl=0)
+    checker.remote_version = remote
+    return checker
+
+
+def test_disk_space_skipped_without_pending_update(tmp_path, monkeypatch):
+    checker = _disk_checker(tmp_path, monkeypatch, "1.10.0", "1.9.0")
+    assert "sin actualización pendiente" in checker._check_disk_space()
+    checker = _disk_checker(tmp_path, monkeypatch, "1.10.0", "1.10.0")
+    assert "sin actualización pendiente" in checker._check_disk_space()
+
+
+def test_disk_space_required_for_pending_update(tmp_path, monkeypatch):
+    checker = _disk_checker(tmp_path, monkeypatch, "1.9.0", "1.10.0")
+    with pytest.raises(RuntimeError, match="espacio insuficiente"):
+        checker._check_disk_space()
@@ -0,0 +1,108 @@
+# tests/test_ratelimit.py
+
+from datetime import datetime
+
+import pytest
+
+import lib.ratelimit as ratelimit
+from lib.ratelimit import MIN_BURST_BYTES, RateLimiter, RateSchedule, TokenBucket, build_schedule, parse_rate
+
+
+def test_parse_rate_units():
+    assert parse_rate(None) == 0.0
+    assert parse_rate("") == 0.0
+    assert parse_rate(2048) == 2048.0
+    assert parse_rate("512K") == 512 * 1024
+    assert parse_rate("1.5M/s") == 1.5 * 1024 ** 2
+    assert parse_rate("2MB") == 2 * 1024 ** 2
+    with pytest.raises(ValueError):
+        parse_rate("rápido")
+
+
+def test_bucket_without_rate_never_waits():
+    bucket = TokenBucket()
+    assert bucket.reserve(10 * 1024 ** 3) == 0.0
+
+
+def test_bucket_burst_then_debt():
+    bucket = TokenBucket(rate=MIN_BURST_BYTES)
+    # La ráfaga inicial no espera; lo que la excede se salda al ritmo del límite
+    assert bucket.reserve(MIN_BURST_BYTES) == 0.0
+    delay = bucket.reserve(MIN_BURST_BYTES)
+    assert delay == pytest.approx(1.0, abs=0.05)
+    # Los consumidores siguientes esperan detrás de la deuda acumulada
+    assert bucket.reserve(MIN_BURST_BYTES) == pytest.approx(2.0, abs=0.05)
+
+
+def test_bucket_set_rate_keeps_debt_and_unlimited_clears_it():
+    bucket = TokenBucket(rate=MIN_BURST_BYTES)
+    bucket.reserve(2 * MIN_BURST_BYTES)
+    bucket.set_rate(2 * MIN_BURST_BYTES)
+    assert bucket.reserve(0) == pytest.approx(0.5, abs=0.05)
+    bucket.set_rate(0)
+    assert bucket.reserve(MIN_BURST_BYTES) == 0.0
+
+
+def test_schedule_picks_first_matching_window():
+    schedule = RateSchedule("1M", {"08:00-18:00": "256K", "12:00-13:00": "64K", "22:00-06:00": 0})
+    assert schedule.rate_at(datetime(2024, 1, 1, 9, 0)) == 256 * 1024
+    assert schedule.rate_at(datetime(2024, 1, 1, 12, 30)) == 256 * 1024
+    assert schedule.rate_at(datetime(2024, 1, 1, 20, 0)) == 1024 ** 2
+    assert schedule.rate_at(datetime(2024, 1, 1, 23, 0)) == 0.0
+    assert schedule.rate_at(datetime(2024, 1, 1, 3, 0)) == 0.0
+    assert not schedule.unlimited
+    assert RateSchedule(None, {"08:00-18:00": 0}).unlimited
+
+
+def test_build_schedule_rejects_invalid_values():
+    with pytest.raises(ValueError):
+        build_schedule("1M", {"25:00-26:00": "1M"})
+    with pytest.raises(ValueError):
+        build_schedule("mucho")
+
+
+class _Clock:
+    """
+    Sustituye a datetime en lib.ratelimit para fijar la hora consultada por el limitador.
+    """
+    moment = datetime(2024, 1, 1, 9, 0)
+
+    @classmethod
+    def now(cls):
+        return cls.moment
+
+
+def test_limiter_switches_profile_on_recheck(monkeypatch):
+    monkeypatch.setattr(ratelimit, "datetime", _Clock)
+    limiter = RateLimiter(RateSchedule("1M", {"08:00-18:00": "256K"}))
+    assert limiter.rate == 256 * 1024
+
+    # Dentro del intervalo de revisión se mantiene el límite aplicado
+    _Clock.moment = datetime(2024, 1, 1, 19, 0)
+    assert limiter.rate == 256 * 1024
+
+    monkeypatch.setattr(ratelimit, "PROFILE_CHECK_INTERVAL", 0.0)
+    limiter._checked = 1e-9
+    assert limiter.rate == 1024 ** 2
+
+
+def test_limiter_configure_applies_immediately():
+    limiter = RateLimiter()
+    assert limiter.unlimited and limiter.rate == 0.0
+    limiter.configure(build_schedule("512K"))
+    assert not limiter.unlimited
+    assert limiter.rate == 512 * 1024
+    assert limiter.throttle(1024) == 0.0
+    stats = limiter.stats(reset=True)
+    assert stats["bytes"] == 1024 and stats["rate_limit"] == 512 * 1024
+    assert limiter.stats()["bytes"] == 0
+
+
+def test_configure_rate_limiter_returns_process_instance():
+    first = ratelimit.configure_rate_limiter("1M")
+    second = ratelimit.configure_rate_limiter(None)
+    try:
+        assert first is second is ratelimit.get_rate_limiter()
+        assert second.unlimited
+    finally:
+        ratelimit.configure_rate_limiter(None)
@@ -0,0 +1,55 @@
+# tests/test_semver.py
+
+import pytest
+
+from lib.semver import Version, is_newer, parse_version
+
+
+@pytest.mark.parametrize("lower, higher", [
+    ("1.9.0", "1.10.0"),
+    ("1.0.0", "2.0.0"),
+    ("1.0.0-rc.1", "1.0.0"),
+    ("1.0.0-alpha", "1.0.0-alpha.1"),
+    ("1.0.0-alpha.1", "1.0.0-alpha.beta"),
+    ("1.0.0-alpha.beta", "1.0.0-beta"),
+    ("1.0.0-beta.2", "1.0.0-beta.11"),
+    ("1.0.0-rc.1", "1.0.0-rc.1.1"),
+    ("2024.3", "2024.10"),
+    ("1.2.3", "1.2.3.1"),
+])
+def test_order(lower, higher):
+    assert parse_version(lower) < parse_version(higher)
+    assert parse_version(higher) > parse_version(lower)
+    assert is_newer(higher, lower)
+    assert not is_newer(lower, higher)
+
+
+def test_missing_parts_count_as_zero():
+    assert parse_version("1.2") == parse_version("1.2.0")
+    assert hash(parse_version("1.2")) == hash(parse_version("1.2.0.0"))
+    assert not is_newer("1.2.0", "1.2")
+
+
+def test_build_metadata_does_not_affect_order():
+    assert parse_version("1.0.0+build.1") == parse_version("1.0.0+build.2")
+    assert not is_newer("1.0.0+build.2", "1.0.0+build.1")
+
+
+def test_leading_v_and_round_trip():
+    version = parse_version(" v1.2.3-rc.1+abc ")
+    assert version.release == (1, 2, 3)
+    assert version.prerelease == ("rc", 1)
+    assert version.build == "abc"
+    assert str(version) == "1.2.3-rc.1+abc"
+
+
+def test_sorting():
+    versions = ["1.0.0", "1.0.0-rc.1", "0.9", "1.10.0", "1.2.0", "1.0.0-alpha"]
+    assert [str(v) for v in sorted(map(parse_version, versions))] == \
+        ["0.9", "1.0.0-alpha", "1.0.0-rc.1", "1.0.0", "1.2.0", "1.10.0"]
+
+
+@pytest.mark.parametrize("text", ["", "abc", "1..2", "1.2.", "1.0.0-", "1.0.0+", "1.0.0-rc..1"])
+def test_invalid(text):
+    with pytest.raises(ValueError):
+        Version.parse(text)
@@ -0,0 +1,110 @@
+# tests/test_snapshots.py
+
+import hashlib
+import os
+
+from core.manifest import INSTALLED_MANIFEST_NAME
+from core.snapshots import SnapshotStore
+
+
+def _tree(folder, files):
+    for path, data in files.items():
+        local_path = folder / path
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        local_path.write_bytes(data)
+
+
+def test_restore_removes_files_added_by_partial_install(tmp_path):
+    deploy = tmp_path / "deploy"
+    _tree(deploy, {"app.exe": b"v1", "lib/a.dll": b"a", "Data/db.dat": b"datos"})
+    store = SnapshotStore(str(tmp_path / "backups"))
+    snapshot_id = store.create(str(deploy), "1.0")
+
+    # Instalación en el sitio interrumpida, sin manifiesto instalado
+    _tree(deploy, {"app.exe": b"v2", "lib/b.dll": b"b", "plugins/new/x.bin": b"x",
+                   "Data/nuevo.dat": b"usuario", "lib/c.dll.tmp_update": b"parcial"})
+    assert not (deploy / INSTALLED_MANIFEST_NAME).exists()
+
+    assert store.restore(snapshot_id, str(deploy))
+    assert (deploy / "app.exe").read_bytes() == b"v1"
+    assert (deploy / "lib" / "a.dll").exists()
+    assert not (deploy / "lib" / "b.dll").exists()
+    assert not (deploy / "plugins").exists()
+    # 'Data' y los temporales no se tocan
+    assert (deploy / "Data" / "nuevo.dat").read_bytes() == b"usuario"
+    assert (deploy / "lib" / "c.dll.tmp_update").exists()
+    assert (deploy / INSTALLED_MANIFEST_NAME).exists()
+    assert os.path.isdir(deploy / "lib")
+
+
+def _objects(store):
+    return sorted(name for _, _, names in os.walk(store.objects_folder) for name in names)
+
+
+def test_create_deduplicates_content(tmp_path):
+    deploy = tmp_path / "deploy"
+    _tree(deploy, {"a.dll": b"igual", "b.dll": b"igual", "app.exe": b"v1", "Data/db.dat": b"datos"})
+    store = SnapshotStore(str(tmp_path / "backups"))
+
+    first = store.create(str(deploy), "1.0")
+    assert len(_objects(store)) == 2
+    assert store.get_version(first) == "1.0"
+
+    # Solo el archivo modificado se copia al almacén
+    (deploy / "app.exe").write_bytes(b"v2")
+    second = store.create(str(deploy), "2.0")
+    assert len(_objects(store)) == 3
+
+    snapshots = store.list_snapshots()
+    assert [snapshot["id"] for snapshot in snapshots] == [first, second]
+    assert snapshots[-1]["files"] == 3 and snapshots[-1]["bytes"] == len(b"igual") * 2 + len(b"v2")
+    assert store.get_version("inexistente") == ""
+
+
+def test_create_missing_folder(tmp_path):
+    assert SnapshotStore(str(tmp_path / "backups")).create(str(tmp_path / "nada")) is None
+
+
+def test_restore_rewrites_only_differences(tmp_path):
+    deploy = tmp_path / "deploy"
+    _tree(deploy, {"app.exe": b"v1", "lib/a.dll": b"a"})
+    store = SnapshotStore(str(tmp_path / "backups"))
+    snapshot_id = store.create(str(deploy), "1.0")
+
+    (deploy / "app.exe").write_bytes(b"v2")
+    untouched = os.stat(deploy / "lib" / "a.dll").st_mtime_ns
+
+    assert store.restore(snapshot_id, str(deploy))
+    assert (deploy / "app.exe").read_bytes() == b"v1"
+    assert os.stat(deploy / "lib" / "a.dll").st_mtime_ns == untouched
+    assert not store.restore("inexistente", str(deploy))
+
+
+def test_prune_keeps_retention_and_referenced_objects(tmp_path):
+    deploy = tmp_path / "deploy"
+    _tree(deploy, {"common.dll": b"comun"})
+    store = SnapshotStore(str(tmp_path / "backups"), retention=2)
+    ids = []
+    for version in ("1.0", "2.0", "3.0"):
+        _tree(deploy, {"app.exe": version.encode()})
+        ids.append(store.create(str(deploy), version))
+
+    assert [snapshot["id"] for snapshot in store.list_snapshots()] == ids[1:]
+    # El contenido de 1.0 ya no lo referencia ningún snapshot
+    assert store.object_for(hashlib.sha256(b"1.0").hexdigest()) is None
+    assert store.object_for(hashlib.sha256(b"3.0").hexdigest())
+    assert store.object_for(hashlib.sha256(b"comun").hexdigest())
+    assert len(_objects(store)) == 3
+
+
+def test_pending_bytes(tmp_path):
+    deploy = tmp_path / "deploy"
+    _tree(deploy, {"a.dll": b"guardado"})
+    store = SnapshotStore(str(tmp_path / "backups"))
+    store.create(str(deploy))
+
+    stored = hashlib.sha256(b"guardado").hexdigest()
+    new = hashlib.sha256(b"nuevo").hexdigest()
+    files = {"a.dll": {"size": 8, "sha256": stored}, "b.dll": {"size": 5, "sha256": new},
+             "c.dll": {"size": 5, "sha256": new}, "d.dll": {"size": 7}, "e.dll": {"size": 3}}
+    assert store.pending_bytes(files) == 5 + 7 + 3
@@ -0,0 +1,146 @@
+# tests/test_verifier.py
+
+import hashlib
+import os
+import zipfile
+
+from core.components import COMPONENTS_INDEX_NAME, ComponentIndex
+from core.installer import Installer
+from core.manifest import INSTALLED_MANIFEST_NAME, Manifest
+from core.snapshots import SnapshotStore
+from core.verifier import Verifier
+
+FILES = {"app.exe": b"programa", "lib/a.dll": b"libreria", "conf/erp.ini": b"cfg=1"}
+
+
+class PackageDownloader:
+    """
+    Sustituye al Downloader: entrega un paquete local y registra las versiones pedidas.
+    """
+
+    def __init__(self, package_path):
+        self.package_path = package_path
+        self.requested = []
+
+    def download_package(self, version):
+        self.requested.append(version)
+        return self.package_path
+
+
+def _install(tmp_path, files=FILES):
+    package = tmp_path / "erp_1.0.zip"
+    with zipfile.ZipFile(package, "w") as zip_ref:
+        for name, data in files.items():
+            zip_ref.writestr(name, data)
+    deploy = tmp_path / "deploy"
+    assert Installer(str(deploy), str(tmp_path / "version.txt")).install_update(str(package), "1.0")
+    return deploy, str(package)
+
+
+def _verifier(tmp_path, deploy):
+    return Verifier(str(deploy), str(tmp_path / "index.json"), workers=2)
+
+
+def test_clean_install_verifies(tmp_path):
+    deploy, _ = _install(tmp_path)
+    report = _verifier(tmp_path, deploy).scan()
+    assert report.ok and report.files == 3 and report.hashed == 3
+
+    # La segunda pasada reutiliza el índice: no recalcula ningún hash
+    report = _verifier(tmp_path, deploy).scan()
+    assert report.ok and report.hashed == 0
+
+
+def test_detects_modified_missing_and_extra(tmp_path):
+    deploy, _ = _install(tmp_path)
+    _verifier(tmp_path, deploy).scan()
+
+    (deploy / "app.exe").write_bytes(b"PROGRAMA")
+    (deploy / "lib" / "a.dll").unlink()
+    (deploy / "notas.txt").write_bytes(b"local")
+    (deploy / "Data").mkdir()
+    (deploy / "Data" / "db.dat").write_bytes(b"datos")
+
+    report = _verifier(tmp_path, deploy).scan()
+    assert report.modified == ["app.exe"]
+    assert report.missing == ["lib/a.dll"]
+    assert report.extra == ["notas.txt"]
+    assert report.damaged == ["app.exe", "lib/a.dll"]
+
+
+def test_full_scan_detects_silent_corruption(tmp_path):
+    deploy, _ = _install(tmp_path)
+    _verifier(tmp_path, deploy).scan()
+
+    # Mismo tamaño y mtime: solo una pasada completa lo detecta
+    path = deploy / "conf" / "erp.ini"
+    stat = os.stat(path)
+    path.write_bytes(b"cfg=2")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert _verifier(tmp_path, deploy).scan().ok
+    assert _verifier(tmp_path, deploy).scan(full=True).modified == ["conf/erp.ini"]
+
+
+def test_repair_from_snapshot_store(tmp_path):
+    deploy, _ = _install(tmp_path)
+    backups = tmp_path / "backups"
+    assert SnapshotStore(str(backups)).create(str(deploy), "1.0")
+
+    (deploy / "app.exe").write_bytes(b"corrupto")
+    (deploy / "lib" / "a.dll").unlink()
+    verifier = _verifier(tmp_path, deploy)
+    remaining = verifier.repair(verifier.scan(), str(backups))
+
+    assert remaining == []
+    assert (deploy / "app.exe").read_bytes() == b"programa"
+    assert (deploy / "lib" / "a.dll").read_bytes() == b"libreria"
+    assert _verifier(tmp_path, deploy).scan().ok
+
+
+def test_repair_from_package_only_touches_damaged_files(tmp_path):
+    deploy, package = _install(tmp_path)
+    (deploy / "app.exe").write_bytes(b"corrupto")
+    (deploy / "notas.txt").write_bytes(b"local")
+    untouched = os.stat(deploy / "lib" / "a.dll").st_mtime_ns
+
+    verifier = _verifier(tmp_path, deploy)
+    downloader = PackageDownloader(package)
+    assert verifier.repair(verifier.scan(), str(tmp_path / "no-backups"), downloader) == []
+    assert downloader.requested == ["1.0"]
+    assert (deploy / "app.exe").read_bytes() == b"programa"
+    assert (deploy / "notas.txt").exists()
+    assert os.stat(deploy / "lib" / "a.dll").st_mtime_ns == untouched
+    assert not any(name.endswith(".tmp_repair") for name in os.listdir(deploy))
+
+
+def test_unrepairable_files_are_reported(tmp_path):
+    deploy, _ = _install(tmp_path)
+    (deploy / "app.exe").unlink()
+    verifier = _verifier(tmp_path, deploy)
+    assert verifier.repair(verifier.scan(), None, PackageDownloader("")) == ["app.exe"]
+
+
+def _entry(data):
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def test_components_without_explicit_path_use_their_name(tmp_path):
+    deploy = tmp_path / "deploy"
+    files = {"app.exe": b"principal", "core/old.dll": b"antiguo", "core/new.dll": b"nuevo"}
+    for path, data in files.items():
+        (deploy / path).parent.mkdir(parents=True, exist_ok=True)
+        (deploy / path).write_bytes(data)
+
+    # Manifiesto principal de una instalación anterior a los componentes
+    Manifest("1.0", {"app.exe": _entry(files["app.exe"]), "core/old.dll": _entry(files["core/old.dll"])}).save(
+        str(deploy / INSTALLED_MANIFEST_NAME))
+    Manifest("2.0.0", {"new.dll": _entry(files["core/new.dll"])}).save(str(deploy / "core" / INSTALLED_MANIFEST_NAME))
+    ComponentIndex(str(deploy / COMPONENTS_INDEX_NAME), "", {"core": {"version": "2.0.0"}}).save()
+
+    verifier = _verifier(tmp_path, deploy)
+    report = verifier.scan()
+    assert set(verifier.expected) == {"app.exe", "core/new.dll"}
+    assert verifier.owners["core/new.dll"] == "core/"
+    assert report.extra == ["core/old.dll"]
+    assert report.ok
@@ -0,0 +1,115 @@
+# tests/test_zipstream.py
+
+import io
+import os
+import zipfile
+
+import pytest
+
+from lib.zipstream import ZipStreamError, iter_zip_stream
+
+
+class _Unseekable(io.RawIOBase):
+    """
+    Destino sin posicionamiento: zipfile escribe entonces 'data descriptors' tras cada miembro.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+class _Trickle(io.RawIOBase):
+    """
+    Flujo que entrega pocos bytes por lectura, como una respuesta HTTP lenta.
+    """
+
+    def __init__(self, data: bytes, step: int = 7):
+        self.stream = io.BytesIO(data)
+        self.step = step
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.stream.read(self.step if size < 0 else min(size, self.step))
+
+
+FILES = {
+    "bin/app.exe": os.urandom(300 * 1024),
+    "config/settings.ini": b"[erp]\nmode=prod\n" * 500,
+    "empty.txt": b"",
+}
+
+
+def _zip(compression, seekable=True) -> bytes:
+    target = io.BytesIO() if seekable else _Unseekable()
+    with zipfile.ZipFile(target, "w", compression) as zf:
+        zf.writestr("bin/", b"")
+        for name, data in FILES.items():
+            zf.writestr(name, data)
+    return target.getvalue() if seekable else bytes(target.data)
+
+
+def _read_all(stream):
+    result = {}
+    for entry in iter_zip_stream(stream):
+        if entry.is_dir:
+            result[entry.name] = None
+        else:
+            result[entry.name] = b"".join(entry.chunks())
+    return result
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_reads_members(compression):
+    assert _read_all(io.BytesIO(_zip(compression))) == dict({"bin/": None}, **FILES)
+
+
+def test_reads_members_with_data_descriptors():
+    data = _zip(zipfile.ZIP_DEFLATED, seekable=False)
+    entries = list(iter_zip_stream(io.BytesIO(data)))
+    assert any(entry.has_descriptor for entry in entries)
+    assert _read_all(io.BytesIO(data)) == dict({"bin/": None}, **FILES)
+
+
+def test_reads_from_short_reads():
+    assert _read_all(_Trickle(_zip(zipfile.ZIP_DEFLATED, seekable=False))) == dict({"bin/": None}, **FILES)
+
+
+def test_unconsumed_members_are_skipped():
+    names = [entry.name for entry in iter_zip_stream(io.BytesIO(_zip(zipfile.ZIP_DEFLATED)))]
+    assert names == ["bin/", *FILES]
+
+
+def test_crc_mismatch_is_detected():
+    data = bytearray(_zip(zipfile.ZIP_STORED))
+    position = data.index(FILES["config/settings.ini"][:32])
+    data[position] ^= 0xFF
+    with pytest.raises(ZipStreamError, match="CRC"):
+        _read_all(io.BytesIO(bytes(data)))
+
+
+def test_truncated_stream():
+    data = _zip(zipfile.ZIP_DEFLATED)
+    with pytest.raises(ZipStreamError):
+        _read_all(io.BytesIO(data[:len(data) // 2]))
+
+
+def test_unsupported_method():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_BZIP2) as zf:
+        zf.writestr("a.txt", b"data" * 100)
+    with pytest.raises(ZipStreamError, match="no soportado"):
+        _read_all(io.BytesIO(data.getvalue()))
+
+
+def test_empty_or_foreign_stream_has_no_members():
+    assert list(iter_zip_stream(io.BytesIO(b""))) == []
+    assert list(iter_zip_stream(io.BytesIO(b"not a zip file at all"))) == []